@@ -0,0 +1,10 @@
+#!/bin/sh
+
+set -e
+
+PLAYGROUND_PATH=$(dirname "$(realpath "$0")")
+. $PLAYGROUND_PATH/env.sh
+
+exec $PYTHON -m opcut benchmark \
+    --output $PLAYGROUND_PATH/benchmark.json \
+    "$@"
@@ -1,10 +1,28 @@
 #include "opcut.h"
 #include <unistd.h>
 #include <math.h>
+#include <pthread.h>
+#include <stdint.h>
+#include <string.h>
+
+#ifdef OPCUT_DEBUG_FITNESS
+#include <stdio.h>
+#endif
+
+#ifdef _WIN32
+#include <windows.h>
+#else
+#include <time.h>
+#endif
 
 #define PAGE_SIZE 4096
 #define FITNESS_K 0.03
 
+#define TIMEOUT -1
+#define PENDING -2
+
+#define NO_INDEX SIZE_MAX
+
 
 typedef struct mem_header_t {
     struct mem_header_t *next;
@@ -16,6 +34,7 @@ typedef struct {
     size_t item_size;
     mem_header_t *blocks;
     mem_header_t *items;
+    size_t blocks_len;
 } mem_pool_t;
 
 struct opcut_allocator_t {
@@ -30,11 +49,106 @@ typedef struct {
     double fitness;
 } fitness_t;
 
+typedef struct {
+    double used_area;
+    double min_used_area;
+    double max_unused_area;
+    // max unused area after removal of single unused with max area
+    double next_max_unused_area;
+    double fitness;
+} panel_state_t;
+
+// areas of unused grouped by panel instance (used by greedy for updating
+// panel state without visiting unused of other panel instances)
+typedef struct panel_unused_t {
+    double area;
+    struct panel_unused_t *next;
+} panel_unused_t;
+
+typedef struct {
+    panel_unused_t **panels;
+    panel_unused_t *nodes;
+    panel_unused_t *free;
+} panels_unused_t;
+
 typedef struct {
     opcut_used_t *used;
     opcut_unused_t *unused;
 } result_t;
 
+typedef struct {
+    double width;
+    double height;
+} rect_t;
+
+typedef struct {
+    opcut_unused_t *unused;
+    bool rotate;
+    bool vertical;
+    int status;
+    fitness_t fitness;
+
+    // forward greedy cache
+    uint64_t hash;
+    size_t source;
+} candidate_t;
+
+typedef struct {
+    uint64_t hash;
+    int status;
+    fitness_t fitness;
+    size_t source;
+    size_t bucket_next;
+    size_t lru_prev;
+    size_t lru_next;
+} cache_entry_t;
+
+typedef struct {
+    cache_entry_t *entries;
+    size_t entries_len;
+    size_t size;
+    size_t *buckets;
+    size_t buckets_len;
+    size_t lru_first;
+    size_t lru_last;
+} cache_t;
+
+typedef struct {
+    result_t *state;
+    candidate_t candidate;
+} beam_candidate_t;
+
+typedef struct {
+    size_t placed;
+    size_t evaluated;
+    double fitness;
+} progress_t;
+
+typedef struct {
+    opcut_allocator_t *a;
+    opcut_params_t *params;
+    result_t *result;
+    size_t *item_ids;
+    size_t item_ids_len;
+    double deadline;
+    candidate_t *candidates;
+    size_t candidates_len;
+    size_t offset;
+    size_t step;
+    opcut_stats_t stats;
+} evaluation_t;
+
+
+static double get_time() {
+#ifdef _WIN32
+    return GetTickCount64() / 1000.0;
+#else
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return ts.tv_sec + ts.tv_nsec / 1e9;
+#endif
+}
+
 
 static void mem_pool_add_block(mem_pool_t *pool) {
     size_t items_per_block = (PAGE_SIZE - sizeof(mem_header_t)) /
@@ -49,6 +163,7 @@ static void mem_pool_add_block(mem_pool_t *pool) {
         return;
     block->next = pool->blocks;
     pool->blocks = block;
+    pool->blocks_len += 1;
 
     for (size_t i = 0; i < items_per_block; ++i) {
         mem_header_t *header = (void *)block + sizeof(mem_header_t) +
@@ -73,6 +188,7 @@ static mem_pool_t *mem_pool_create(opcut_malloc_t malloc, opcut_free_t free,
     pool->item_size = item_size;
     pool->blocks = NULL;
     pool->items = NULL;
+    pool->blocks_len = 0;
 
     return pool;
 }
@@ -111,6 +227,24 @@ static void mem_pool_free(mem_pool_t *pool, void *item) {
 }
 
 
+static inline size_t get_pool_blocks_len(opcut_allocator_t *a) {
+    return a->used->blocks_len + a->unused->blocks_len;
+}
+
+
+static void add_stats(opcut_stats_t *stats, opcut_stats_t *other) {
+    stats->cache_hits += other->cache_hits;
+    stats->cache_misses += other->cache_misses;
+    stats->pruned_candidates += other->pruned_candidates;
+    stats->generated_candidates += other->generated_candidates;
+    stats->fitness_evaluations += other->fitness_evaluations;
+    stats->rollouts += other->rollouts;
+    stats->pool_blocks += other->pool_blocks;
+    if (other->peak_unused > stats->peak_unused)
+        stats->peak_unused = other->peak_unused;
+}
+
+
 static void free_used_until(opcut_allocator_t *a, opcut_used_t *used,
                             opcut_used_t *last_used) {
     while (used && used != last_used) {
@@ -133,7 +267,7 @@ static void free_unused_until(opcut_allocator_t *a, opcut_unused_t *unused,
 
 static inline double compare_item(opcut_params_t *params, size_t id1,
                                   size_t id2) {
-    return params->items[id1].area - params->items[id2].area;
+    return params->items[id1].order - params->items[id2].order;
 }
 
 
@@ -218,46 +352,80 @@ static void insert_unused(opcut_unused_t **list, opcut_unused_t *el) {
 
 static size_t *create_initial_item_ids(opcut_allocator_t *a,
                                        opcut_params_t *params) {
-    if (!params->items_len)
+    // items are sorted by type and each item id is repeated quantity times
+    if (!params->item_instances_len)
         return NULL;
 
-    size_t *item_ids = a->malloc(params->items_len * sizeof(size_t));
-    if (!item_ids)
+    size_t *item_ids = a->malloc(params->item_instances_len * sizeof(size_t));
+    size_t *type_ids = a->malloc(params->items_len * sizeof(size_t));
+    if (!item_ids || !type_ids) {
+        if (item_ids)
+            a->free(item_ids);
+        if (type_ids)
+            a->free(type_ids);
         return NULL;
+    }
 
     for (size_t item_id = 0; item_id < params->items_len; ++item_id)
-        item_ids[item_id] = item_id;
+        type_ids[item_id] = item_id;
 
-    sort_item_ids(params, item_ids, 0, params->items_len - 1);
+    sort_item_ids(params, type_ids, 0, params->items_len - 1);
 
+    size_t len = 0;
+    for (size_t i = 0; i < params->items_len; ++i) {
+        size_t item_id = type_ids[i];
+        for (size_t j = 0; j < params->items[item_id].quantity; ++j)
+            item_ids[len++] = item_id;
+    }
+
+    a->free(type_ids);
     return item_ids;
 }
 
 
+static opcut_unused_t *create_initial_unused_instance(opcut_allocator_t *a,
+                                                      opcut_params_t *params,
+                                                      size_t panel_id,
+                                                      size_t panel_index) {
+    opcut_panel_t *panel = params->panels + panel_id;
+
+    opcut_unused_t *unused = mem_pool_alloc(a->unused);
+    if (!unused)
+        return NULL;
+
+    *unused = (opcut_unused_t){.panel_id = panel_id,
+                               .panel_index = panel_index,
+                               .width = panel->width,
+                               .height = panel->height,
+                               .x = 0,
+                               .y = 0,
+                               .next = NULL,
+                               .area = panel->area,
+                               .initial = true};
+    return unused;
+}
+
+
 static opcut_unused_t *create_initial_unused(opcut_allocator_t *a,
                                              opcut_params_t *params) {
     if (!params->panels_len)
         return NULL;
 
+    // only first instance of each panel is available - next instance is
+    // added once previous instance is cut
     opcut_unused_t *unused = NULL;
     for (size_t panel_id = 0; panel_id < params->panels_len; ++panel_id) {
-        opcut_panel_t *panel = params->panels + panel_id;
+        if (!params->panels[panel_id].quantity)
+            continue;
 
-        opcut_unused_t *temp = mem_pool_alloc(a->unused);
+        opcut_unused_t *temp =
+            create_initial_unused_instance(a, params, panel_id, 0);
         if (!temp) {
             free_unused_until(a, unused, NULL);
             unused = NULL;
             break;
         }
 
-        *temp = (opcut_unused_t){.panel_id = panel_id,
-                                 .width = panel->width,
-                                 .height = panel->height,
-                                 .x = 0,
-                                 .y = 0,
-                                 .next = unused,
-                                 .area = panel->area,
-                                 .initial = true};
         insert_unused(&unused, temp);
     }
 
@@ -265,48 +433,105 @@ static opcut_unused_t *create_initial_unused(opcut_allocator_t *a,
 }
 
 
+static inline bool is_cancelled(opcut_params_t *params) {
+    return params->cancel && *(params->cancel);
+}
+
+
+static void report_progress(opcut_params_t *params, progress_t *progress,
+                            size_t placed, size_t evaluated,
+                            fitness_t *fitness) {
+    // progress is reported only by main calculation (not by rollouts)
+    if (!progress)
+        return;
+
+    progress->placed += placed;
+    progress->evaluated += evaluated;
+    if (fitness)
+        progress->fitness = fitness->fitness;
+
+    if (params->progress)
+        params->progress(params->progress_data, progress->placed,
+                         progress->evaluated, progress->fitness);
+}
+
+
+static inline size_t get_panel_instance(opcut_params_t *params,
+                                        size_t panel_id, size_t panel_index) {
+    return params->panels[panel_id].offset + panel_index;
+}
+
+
+#ifdef OPCUT_DEBUG_FITNESS
+
 static void calculate_fitness(opcut_params_t *params, result_t *result,
                               fitness_t *fitness) {
     fitness->fitness = 0;
+    fitness->unused_initial_count = 0;
 
     for (size_t panel_id = 0; panel_id < params->panels_len; ++panel_id) {
-        double min_used_area = 0;
-        double used_areas = 0;
-        for (opcut_used_t *used = result->used; used; used = used->next) {
-            if (used->panel_id != panel_id)
-                continue;
-            opcut_item_t *item = params->items + used->item_id;
-            if (min_used_area == 0 || item->area < min_used_area)
-                min_used_area = item->area;
-            used_areas = item->area;
-        }
+        opcut_panel_t *panel = params->panels + panel_id;
 
-        double max_unused_area = 0;
-        for (opcut_unused_t *unused = result->unused; unused;
-             unused = unused->next) {
-            if (unused->panel_id != panel_id)
-                continue;
-            if (max_unused_area == 0 || unused->area > max_unused_area)
-                max_unused_area = unused->area;
-        }
+        for (size_t panel_index = 0; panel_index < panel->quantity;
+             ++panel_index) {
+            bool available = false;
+            double min_used_area = 0;
+            double used_areas = 0;
+            for (opcut_used_t *used = result->used; used; used = used->next) {
+                if (used->panel_id != panel_id ||
+                    used->panel_index != panel_index)
+                    continue;
+                opcut_item_t *item = params->items + used->item_id;
+                if (min_used_area == 0 || item->area < min_used_area)
+                    min_used_area = item->area;
+                used_areas += item->area;
+                available = true;
+            }
 
-        opcut_panel_t *panel = params->panels + panel_id;
-        fitness->fitness += (panel->area - used_areas) / params->panels_area;
-        fitness->fitness -= FITNESS_K * min_used_area * max_unused_area /
-                            (params->panels_area * params->panels_area);
-    }
+            double max_unused_area = 0;
+            for (opcut_unused_t *unused = result->unused; unused;
+                 unused = unused->next) {
+                if (unused->panel_id != panel_id ||
+                    unused->panel_index != panel_index)
+                    continue;
+                if (max_unused_area == 0 || unused->area > max_unused_area)
+                    max_unused_area = unused->area;
+                if (params->min_initial_usage && unused->initial)
+                    fitness->unused_initial_count += 1;
+                available = true;
+            }
 
-    fitness->unused_initial_count = 0;
-    if (params->min_initial_usage) {
-        for (opcut_unused_t *unused = result->unused; unused;
-             unused = unused->next) {
-            if (unused->initial)
+            if (params->min_initial_usage && !available)
                 fitness->unused_initial_count += 1;
+
+            fitness->fitness +=
+                (panel->area - used_areas) / params->panels_area;
+            fitness->fitness -= FITNESS_K * min_used_area * max_unused_area /
+                                (params->panels_area * params->panels_area);
         }
     }
 }
 
 
+static int check_fitness(opcut_params_t *params, result_t *result,
+                         fitness_t *fitness) {
+    fitness_t expected;
+    calculate_fitness(params, result, &expected);
+
+    if (expected.unused_initial_count == fitness->unused_initial_count &&
+        fabs(expected.fitness - fitness->fitness) <= 1e-9)
+        return OPCUT_SUCCESS;
+
+    fprintf(stderr,
+            "fitness mismatch: expected (%zu, %.17g), got (%zu, %.17g)\n",
+            expected.unused_initial_count, expected.fitness,
+            fitness->unused_initial_count, fitness->fitness);
+    return OPCUT_ERROR;
+}
+
+#endif
+
+
 static inline bool item_fits_unused(opcut_item_t *item, opcut_unused_t *unused,
                                     bool rotate) {
     if (rotate && !item->can_rotate)
@@ -333,6 +558,7 @@ static int cut_item_from_unused(opcut_allocator_t *a, opcut_params_t *params,
     if (!used)
         return OPCUT_ERROR;
     *used = (opcut_used_t){.panel_id = unused->panel_id,
+                           .panel_index = unused->panel_index,
                            .item_id = item_id,
                            .x = unused->x,
                            .y = unused->y,
@@ -352,6 +578,7 @@ static int cut_item_from_unused(opcut_allocator_t *a, opcut_params_t *params,
             return OPCUT_ERROR;
         *new_unused =
             (opcut_unused_t){.panel_id = unused->panel_id,
+                             .panel_index = unused->panel_index,
                              .width = width,
                              .height = height,
                              .x = unused->x + item_width + params->cut_width,
@@ -370,6 +597,7 @@ static int cut_item_from_unused(opcut_allocator_t *a, opcut_params_t *params,
             return OPCUT_ERROR;
         *new_unused =
             (opcut_unused_t){.panel_id = unused->panel_id,
+                             .panel_index = unused->panel_index,
                              .width = width,
                              .height = height,
                              .x = unused->x,
@@ -380,102 +608,1187 @@ static int cut_item_from_unused(opcut_allocator_t *a, opcut_params_t *params,
         insert_unused(&(result->unused), new_unused);
     }
 
+    if (unused->initial &&
+        unused->panel_index + 1 < params->panels[unused->panel_id].quantity) {
+        opcut_unused_t *new_unused = create_initial_unused_instance(
+            a, params, unused->panel_id, unused->panel_index + 1);
+        if (!new_unused)
+            return OPCUT_ERROR;
+        insert_unused(&(result->unused), new_unused);
+    }
+
     return OPCUT_SUCCESS;
 }
 
 
+static inline double calculate_panel_fitness(opcut_params_t *params,
+                                             size_t panel_id,
+                                             double used_area,
+                                             double min_used_area,
+                                             double max_unused_area) {
+    opcut_panel_t *panel = params->panels + panel_id;
+    return (panel->area - used_area) / params->panels_area -
+           FITNESS_K * min_used_area * max_unused_area /
+               (params->panels_area * params->panels_area);
+}
+
+
+static inline void add_panel_used_area(panel_state_t *panel_state,
+                                       double area) {
+    panel_state->used_area += area;
+    if (panel_state->min_used_area == 0 || area < panel_state->min_used_area)
+        panel_state->min_used_area = area;
+}
+
+
+static inline void add_panel_unused_area(panel_state_t *panel_state,
+                                         double area) {
+    if (area > panel_state->max_unused_area) {
+        panel_state->next_max_unused_area = panel_state->max_unused_area;
+        panel_state->max_unused_area = area;
+
+    } else if (area > panel_state->next_max_unused_area) {
+        panel_state->next_max_unused_area = area;
+    }
+}
+
+
+static void init_panel_states(opcut_params_t *params, result_t *result,
+                              panel_state_t *panel_states,
+                              fitness_t *fitness) {
+    // panel states are indexed by panel instance
+    for (size_t i = 0; i < params->panel_instances_len; ++i)
+        panel_states[i] = (panel_state_t){.used_area = 0,
+                                          .min_used_area = 0,
+                                          .max_unused_area = 0,
+                                          .next_max_unused_area = 0,
+                                          .fitness = 0};
+
+    for (opcut_used_t *used = result->used; used; used = used->next)
+        add_panel_used_area(
+            panel_states +
+                get_panel_instance(params, used->panel_id, used->panel_index),
+            params->items[used->item_id].area);
+
+    fitness->unused_initial_count = 0;
+    for (opcut_unused_t *unused = result->unused; unused;
+         unused = unused->next) {
+        add_panel_unused_area(panel_states +
+                                  get_panel_instance(params, unused->panel_id,
+                                                     unused->panel_index),
+                              unused->area);
+        if (params->min_initial_usage && unused->initial)
+            fitness->unused_initial_count += 1;
+    }
+
+    fitness->fitness = 0;
+    for (size_t panel_id = 0; panel_id < params->panels_len; ++panel_id) {
+        opcut_panel_t *panel = params->panels + panel_id;
+        panel_state_t *panel_state = panel_states + panel->offset;
+
+        for (size_t i = 0; i < panel->quantity; ++i, ++panel_state) {
+            // panel instance without used and unused is not yet available
+            // (it is equivalent to initial unused)
+            if (panel_state->used_area == 0 &&
+                panel_state->max_unused_area == 0) {
+                panel_state->max_unused_area = panel->area;
+                if (params->min_initial_usage)
+                    fitness->unused_initial_count += 1;
+            }
+
+            panel_state->fitness = calculate_panel_fitness(
+                params, panel_id, panel_state->used_area,
+                panel_state->min_used_area, panel_state->max_unused_area);
+            fitness->fitness += panel_state->fitness;
+        }
+    }
+}
+
+
+static size_t get_cut_rects(opcut_params_t *params, size_t item_id,
+                            candidate_t *candidate, rect_t *rects) {
+    // same new unused dimensions as in cut_item_from_unused
+    opcut_item_t *item = params->items + item_id;
+    opcut_unused_t *unused = candidate->unused;
+    double item_width = (candidate->rotate ? item->height : item->width);
+    double item_height = (candidate->rotate ? item->width : item->height);
+    size_t rects_len = 0;
+
+    double width = unused->width - item_width - params->cut_width;
+    if (width > 0)
+        rects[rects_len++] = (rect_t){
+            .width = width,
+            .height = (candidate->vertical ? unused->height : item_height)};
+
+    double height = unused->height - item_height - params->cut_width;
+    if (height > 0)
+        rects[rects_len++] = (rect_t){
+            .width = (candidate->vertical ? item_width : unused->width),
+            .height = height};
+
+    return rects_len;
+}
+
+
+static int init_panels_unused(opcut_allocator_t *a, opcut_params_t *params,
+                              result_t *result, size_t max_unused_len,
+                              panels_unused_t *panels_unused) {
+    *panels_unused = (panels_unused_t){
+        .panels =
+            a->malloc(params->panel_instances_len * sizeof(panel_unused_t *)),
+        .nodes = a->malloc(max_unused_len * sizeof(panel_unused_t)),
+        .free = NULL};
+    if ((params->panel_instances_len && !panels_unused->panels) ||
+        (max_unused_len && !panels_unused->nodes))
+        return OPCUT_ERROR;
+
+    for (size_t i = 0; i < params->panel_instances_len; ++i)
+        panels_unused->panels[i] = NULL;
+
+    for (size_t i = 0; i < max_unused_len; ++i) {
+        panels_unused->nodes[i].next = panels_unused->free;
+        panels_unused->free = panels_unused->nodes + i;
+    }
+
+    for (opcut_unused_t *unused = result->unused; unused;
+         unused = unused->next) {
+        panel_unused_t **list =
+            panels_unused->panels +
+            get_panel_instance(params, unused->panel_id, unused->panel_index);
+        panel_unused_t *node = panels_unused->free;
+        panels_unused->free = node->next;
+        *node = (panel_unused_t){.area = unused->area, .next = *list};
+        *list = node;
+    }
+
+    return OPCUT_SUCCESS;
+}
+
+
+static void free_panels_unused(opcut_allocator_t *a,
+                               panels_unused_t *panels_unused) {
+    if (panels_unused->panels)
+        a->free(panels_unused->panels);
+
+    if (panels_unused->nodes)
+        a->free(panels_unused->nodes);
+}
+
+
+static void update_panel_state(opcut_params_t *params,
+                               panel_state_t *panel_states,
+                               panels_unused_t *panels_unused, size_t item_id,
+                               candidate_t *candidate) {
+    // called before candidate is applied - only unused of affected panel
+    // instance are visited
+    opcut_unused_t *unused = candidate->unused;
+    size_t panel_instance =
+        get_panel_instance(params, unused->panel_id, unused->panel_index);
+    panel_state_t *panel_state = panel_states + panel_instance;
+    panel_unused_t **list = panels_unused->panels + panel_instance;
+
+    add_panel_used_area(panel_state, params->items[item_id].area);
+
+    // initial unused of panel instance which was not available at
+    // initialization is not in list (list is empty)
+    for (panel_unused_t **i = list; *i; i = &((*i)->next)) {
+        if ((*i)->area != unused->area)
+            continue;
+
+        panel_unused_t *node = *i;
+        *i = node->next;
+        node->next = panels_unused->free;
+        panels_unused->free = node;
+        break;
+    }
+
+    rect_t rects[2];
+    size_t rects_len = get_cut_rects(params, item_id, candidate, rects);
+    for (size_t i = 0; i < rects_len; ++i) {
+        panel_unused_t *node = panels_unused->free;
+        panels_unused->free = node->next;
+        *node = (panel_unused_t){.area = rects[i].width * rects[i].height,
+                                 .next = *list};
+        *list = node;
+    }
+
+    panel_state->max_unused_area = 0;
+    panel_state->next_max_unused_area = 0;
+    for (panel_unused_t *i = *list; i; i = i->next)
+        add_panel_unused_area(panel_state, i->area);
+
+    panel_state->fitness = calculate_panel_fitness(
+        params, unused->panel_id, panel_state->used_area,
+        panel_state->min_used_area, panel_state->max_unused_area);
+}
+
+
+static void calculate_candidate_fitness(opcut_params_t *params,
+                                        panel_state_t *panel_states,
+                                        fitness_t *fitness, size_t item_id,
+                                        candidate_t *candidate) {
+    opcut_item_t *item = params->items + item_id;
+    opcut_unused_t *unused = candidate->unused;
+    panel_state_t *panel_state =
+        panel_states +
+        get_panel_instance(params, unused->panel_id, unused->panel_index);
+
+    panel_state_t new_panel_state = *panel_state;
+    add_panel_used_area(&new_panel_state, item->area);
+
+    if (unused->area >= panel_state->max_unused_area)
+        new_panel_state.max_unused_area = panel_state->next_max_unused_area;
+
+    rect_t rects[2];
+    size_t rects_len = get_cut_rects(params, item_id, candidate, rects);
+    for (size_t i = 0; i < rects_len; ++i) {
+        double area = rects[i].width * rects[i].height;
+        if (area > new_panel_state.max_unused_area)
+            new_panel_state.max_unused_area = area;
+    }
+
+    new_panel_state.fitness = calculate_panel_fitness(
+        params, unused->panel_id, new_panel_state.used_area,
+        new_panel_state.min_used_area, new_panel_state.max_unused_area);
+
+    candidate->fitness.fitness =
+        fitness->fitness - panel_state->fitness + new_panel_state.fitness;
+    candidate->fitness.unused_initial_count =
+        fitness->unused_initial_count -
+        (params->min_initial_usage && unused->initial ? 1 : 0);
+}
+
+
+static int create_candidate_result(opcut_allocator_t *a,
+                                   opcut_params_t *params, result_t *result,
+                                   size_t item_id, candidate_t *candidate,
+                                   result_t *candidate_result) {
+    *candidate_result = (result_t){.used = result->used, .unused = NULL};
+    if (copy_unused_without(a, candidate->unused, result->unused,
+                            &(candidate_result->unused)))
+        return OPCUT_ERROR;
+
+    if (cut_item_from_unused(a, params, candidate_result, item_id,
+                             candidate->unused, candidate->rotate,
+                             candidate->vertical)) {
+        free_used_until(a, candidate_result->used, result->used);
+        free_unused_until(a, candidate_result->unused, NULL);
+        return OPCUT_ERROR;
+    }
+
+    return OPCUT_SUCCESS;
+}
+
+
+static int apply_candidate(opcut_allocator_t *a, opcut_params_t *params,
+                           result_t *result, size_t item_id,
+                           candidate_t *candidate) {
+    result_t candidate_result;
+    if (create_candidate_result(a, params, result, item_id, candidate,
+                                &candidate_result))
+        return OPCUT_ERROR;
+
+    free_unused_until(a, result->unused, NULL);
+    *result = candidate_result;
+    return OPCUT_SUCCESS;
+}
+
+
+static inline bool is_unused_equivalent(opcut_params_t *params,
+                                        panel_state_t *panel_states,
+                                        opcut_unused_t *u1,
+                                        opcut_unused_t *u2) {
+    if (u1->width != u2->width || u1->height != u2->height)
+        return false;
+
+    if (u1->panel_id == u2->panel_id && u1->panel_index == u2->panel_index)
+        return true;
+
+    opcut_panel_t *p1 = params->panels + u1->panel_id;
+    opcut_panel_t *p2 = params->panels + u2->panel_id;
+    if (p1->width != p2->width || p1->height != p2->height)
+        return false;
+
+    panel_state_t *ps1 = panel_states + get_panel_instance(
+                                            params, u1->panel_id,
+                                            u1->panel_index);
+    panel_state_t *ps2 = panel_states + get_panel_instance(
+                                            params, u2->panel_id,
+                                            u2->panel_index);
+    return ps1->used_area == ps2->used_area &&
+           ps1->min_used_area == ps2->min_used_area &&
+           ps1->max_unused_area == ps2->max_unused_area &&
+           ps1->next_max_unused_area == ps2->next_max_unused_area;
+}
+
+
+static size_t create_candidates(opcut_params_t *params,
+                                panel_state_t *panel_states, size_t item_id,
+                                opcut_unused_t *unused,
+                                candidate_t *candidates,
+                                opcut_stats_t *stats) {
+    // candidate is pruned if equivalent candidate is already created -
+    // equivalent unused have same area so only preceding unused with same
+    // area (unused list is sorted by area) are checked
+    opcut_item_t *item = params->items + item_id;
+    size_t rotate_len = (item->width == item->height ? 1 : 2);
+    opcut_unused_t *same_area_unused = unused;
+    size_t candidates_len = 0;
+    size_t unused_len = 0;
+
+    for (; unused; unused = unused->next) {
+        unused_len += 1;
+        if (unused->area != same_area_unused->area)
+            same_area_unused = unused;
+
+        bool equivalent_unused = false;
+        for (opcut_unused_t *i = same_area_unused; i != unused; i = i->next) {
+            equivalent_unused =
+                is_unused_equivalent(params, panel_states, i, unused);
+            if (equivalent_unused)
+                break;
+        }
+
+        for (size_t rotate = 0; rotate < 2; ++rotate) {
+            if (!item_fits_unused(item, unused, rotate))
+                continue;
+
+            if (equivalent_unused || rotate >= rotate_len) {
+                stats->pruned_candidates += 2;
+                continue;
+            }
+
+            rect_t rects[2][2];
+            size_t rects_len[2];
+
+            for (size_t vertical = 0; vertical < 2; ++vertical) {
+                candidate_t candidate = {.unused = unused,
+                                         .rotate = rotate,
+                                         .vertical = vertical,
+                                         .status = OPCUT_ERROR,
+                                         .source = candidates_len};
+
+                rects_len[vertical] =
+                    get_cut_rects(params, item_id, &candidate, rects[vertical]);
+
+                if (vertical && rects_len[0] == rects_len[1] &&
+                    !memcmp(rects[0], rects[1],
+                            rects_len[0] * sizeof(rect_t))) {
+                    stats->pruned_candidates += 1;
+                    continue;
+                }
+
+                candidates[candidates_len++] = candidate;
+            }
+        }
+    }
+
+    stats->generated_candidates += candidates_len;
+    if (unused_len > stats->peak_unused)
+        stats->peak_unused = unused_len;
+
+    return candidates_len;
+}
+
+
+static size_t get_max_unused_len(result_t *result, size_t item_ids_len) {
+    // each placement increases number of unused by at most two (unused is
+    // replaced with two new unused and next panel instance)
+    size_t unused_len = 2 * item_ids_len;
+    for (opcut_unused_t *unused = result->unused; unused;
+         unused = unused->next)
+        unused_len += 1;
+
+    return unused_len;
+}
+
+
+static size_t get_max_candidates_len(result_t *result, size_t item_ids_len) {
+    return 4 * get_max_unused_len(result, item_ids_len);
+}
+
+
 static int calculate_greedy(opcut_allocator_t *a, opcut_params_t *params,
                             result_t *result, size_t *item_ids,
-                            size_t item_ids_len, bool forward_greedy) {
+                            size_t item_ids_len, double deadline,
+                            fitness_t *fitness, opcut_stats_t *stats,
+                            progress_t *progress) {
+    int ret = OPCUT_ERROR;
+    size_t max_unused_len = get_max_unused_len(result, item_ids_len);
+    panel_state_t *panel_states =
+        a->malloc(params->panel_instances_len * sizeof(panel_state_t));
+    candidate_t *candidates =
+        a->malloc(4 * max_unused_len * sizeof(candidate_t));
+    panels_unused_t panels_unused = {0};
+    if ((params->panel_instances_len && !panel_states) || !candidates)
+        goto cleanup;
+
+    if (init_panels_unused(a, params, result, max_unused_len, &panels_unused))
+        goto cleanup;
+
+    fitness_t result_fitness;
+    init_panel_states(params, result, panel_states, &result_fitness);
+
     for (size_t i = 0; i < item_ids_len; ++i) {
-        result_t best_result;
-        fitness_t best_fitness;
-        bool solvable = false;
         size_t item_id = item_ids[i];
-        opcut_item_t *item = params->items + item_id;
+        size_t candidates_len = create_candidates(
+            params, panel_states, item_id, result->unused, candidates, stats);
+
+        candidate_t *best_candidate = NULL;
+        for (size_t j = 0; j < candidates_len; ++j) {
+            if (is_cancelled(params)) {
+                ret = OPCUT_CANCELLED;
+                goto cleanup;
+            }
 
-        for (opcut_unused_t *unused = result->unused; unused;
-             unused = unused->next) {
-            for (size_t rotate = 0; rotate < 2; ++rotate) {
-                if (!item_fits_unused(item, unused, rotate))
-                    continue;
+            if (deadline && get_time() > deadline) {
+                ret = TIMEOUT;
+                goto cleanup;
+            }
 
-                for (size_t vertical = 0; vertical < 2; ++vertical) {
-                    result_t temp_result = {.used = result->used,
-                                            .unused = NULL};
-                    if (copy_unused_without(a, unused, result->unused,
-                                            &(temp_result.unused)))
-                        return OPCUT_ERROR;
-
-                    if (cut_item_from_unused(a, params, &temp_result, item_id,
-                                             unused, rotate, vertical))
-                        return OPCUT_ERROR;
-
-                    fitness_t temp_fitness;
-                    if (!forward_greedy) {
-                        calculate_fitness(params, &temp_result, &temp_fitness);
-
-                    } else {
-                        result_t greedy_result = {.used = temp_result.used,
-                                                  .unused = NULL};
-                        if (copy_unused_without(a, temp_result.unused,
-                                                temp_result.unused,
-                                                &(greedy_result.unused)))
-                            return OPCUT_ERROR;
-
-                        int err = calculate_greedy(a, params, &greedy_result,
-                                                   item_ids + i + 1,
-                                                   item_ids_len - i - 1, false);
-
-                        if (!err) {
-                            calculate_fitness(params, &greedy_result,
-                                              &temp_fitness);
-                            free_used_until(a, greedy_result.used,
-                                            temp_result.used);
-                            free_unused_until(a, greedy_result.unused, NULL);
-
-
-                        } else if (err == OPCUT_UNSOLVABLE) {
-                            free_used_until(a, greedy_result.used,
-                                            temp_result.used);
-                            free_used_until(a, temp_result.used, result->used);
-                            free_unused_until(a, greedy_result.unused, NULL);
-                            free_unused_until(a, temp_result.unused, NULL);
-                            continue;
-
-                        } else {
-                            return err;
-                        }
-                    }
-
-                    if (!solvable) {
-                        best_result = temp_result;
-                        best_fitness = temp_fitness;
-                        solvable = true;
-
-                    } else if (compare_fitness(&temp_fitness, &best_fitness) <
-                               0) {
-                        free_used_until(a, best_result.used, result->used);
-                        free_unused_until(a, best_result.unused, NULL);
-                        best_result = temp_result;
-                        best_fitness = temp_fitness;
-
-                    } else {
-                        free_used_until(a, temp_result.used, result->used);
-                        free_unused_until(a, temp_result.unused, NULL);
-                    }
-                }
+            candidate_t *candidate = candidates + j;
+            calculate_candidate_fitness(params, panel_states, &result_fitness,
+                                        item_id, candidate);
+            stats->fitness_evaluations += 1;
+
+            if (!best_candidate ||
+                compare_fitness(&(candidate->fitness),
+                                &(best_candidate->fitness)) < 0)
+                best_candidate = candidate;
+        }
+
+        if (!best_candidate) {
+            ret = OPCUT_UNSOLVABLE;
+            goto cleanup;
+        }
+
+        update_panel_state(params, panel_states, &panels_unused, item_id,
+                           best_candidate);
+
+        if (apply_candidate(a, params, result, item_id, best_candidate))
+            goto cleanup;
+
+        result_fitness = best_candidate->fitness;
+        report_progress(params, progress, 1, candidates_len, &result_fitness);
+
+#ifdef OPCUT_DEBUG_FITNESS
+        if (check_fitness(params, result, &result_fitness))
+            goto cleanup;
+#endif
+    }
+
+    if (fitness)
+        *fitness = result_fitness;
+
+    ret = OPCUT_SUCCESS;
+
+cleanup:
+    if (panel_states)
+        a->free(panel_states);
+
+    if (candidates)
+        a->free(candidates);
+
+    free_panels_unused(a, &panels_unused);
+
+    return ret;
+}
+
+
+static inline uint64_t hash_mix(uint64_t x) {
+    x ^= x >> 30;
+    x *= 0xbf58476d1ce4e5b9ULL;
+    x ^= x >> 27;
+    x *= 0x94d049bb133111ebULL;
+    x ^= x >> 31;
+    return x;
+}
+
+
+static inline uint64_t hash_double(uint64_t hash, double value) {
+    uint64_t bits;
+    memcpy(&bits, &value, sizeof(bits));
+    return hash_mix(hash ^ hash_mix(bits));
+}
+
+
+static inline uint64_t hash_rect(double width, double height) {
+    return hash_double(hash_double(0, width), height);
+}
+
+
+static inline uint64_t hash_panel(opcut_params_t *params, size_t panel_id,
+                                  panel_state_t *panel_state,
+                                  uint64_t rects_hash) {
+    // panels are identified only by their dimensions
+    opcut_panel_t *panel = params->panels + panel_id;
+    uint64_t hash = hash_double(0, panel->width);
+    hash = hash_double(hash, panel->height);
+    hash = hash_double(hash, panel_state->used_area);
+    hash = hash_double(hash, panel_state->min_used_area);
+    return hash_mix(hash ^ rects_hash);
+}
+
+
+static uint64_t init_state_hash(opcut_params_t *params, result_t *result,
+                                panel_state_t *panel_states,
+                                uint64_t *rects_hashes) {
+    // hash is sum of independent panel and rect hashes so that it does not
+    // depend on panel identifiers, unused ordering and positions
+    for (size_t i = 0; i < params->panel_instances_len; ++i)
+        rects_hashes[i] = 0;
+
+    for (opcut_unused_t *unused = result->unused; unused;
+         unused = unused->next)
+        rects_hashes[get_panel_instance(params, unused->panel_id,
+                                        unused->panel_index)] +=
+            hash_rect(unused->width, unused->height);
+
+    uint64_t hash = 0;
+    for (size_t panel_id = 0; panel_id < params->panels_len; ++panel_id) {
+        opcut_panel_t *panel = params->panels + panel_id;
+        for (size_t i = panel->offset; i < panel->offset + panel->quantity;
+             ++i)
+            hash += hash_panel(params, panel_id, panel_states + i,
+                               rects_hashes[i]);
+    }
+
+    return hash;
+}
+
+
+static uint64_t calculate_candidate_hash(opcut_params_t *params,
+                                         panel_state_t *panel_states,
+                                         uint64_t *rects_hashes,
+                                         uint64_t state_hash, size_t placed,
+                                         size_t item_id,
+                                         candidate_t *candidate) {
+    opcut_unused_t *unused = candidate->unused;
+    size_t panel_id = unused->panel_id;
+    size_t panel_instance =
+        get_panel_instance(params, panel_id, unused->panel_index);
+    panel_state_t *panel_state = panel_states + panel_instance;
+
+    panel_state_t new_panel_state = *panel_state;
+    add_panel_used_area(&new_panel_state, params->items[item_id].area);
+
+    uint64_t rects_hash = rects_hashes[panel_instance] -
+                          hash_rect(unused->width, unused->height);
+
+    rect_t rects[2];
+    size_t rects_len = get_cut_rects(params, item_id, candidate, rects);
+    for (size_t i = 0; i < rects_len; ++i)
+        rects_hash += hash_rect(rects[i].width, rects[i].height);
+
+    state_hash = state_hash -
+                 hash_panel(params, panel_id, panel_state,
+                            rects_hashes[panel_instance]) +
+                 hash_panel(params, panel_id, &new_panel_state, rects_hash);
+
+    return hash_mix(state_hash ^ hash_mix(placed));
+}
+
+
+static cache_t *cache_create(opcut_allocator_t *a, size_t size) {
+    cache_t *cache = a->malloc(sizeof(cache_t));
+    if (!cache)
+        return NULL;
+
+    size_t buckets_len = 1;
+    while (buckets_len < 2 * size)
+        buckets_len *= 2;
+
+    *cache = (cache_t){.entries = a->malloc(size * sizeof(cache_entry_t)),
+                       .entries_len = 0,
+                       .size = size,
+                       .buckets = a->malloc(buckets_len * sizeof(size_t)),
+                       .buckets_len = buckets_len,
+                       .lru_first = NO_INDEX,
+                       .lru_last = NO_INDEX};
+
+    if (!cache->entries || !cache->buckets) {
+        if (cache->entries)
+            a->free(cache->entries);
+        if (cache->buckets)
+            a->free(cache->buckets);
+        a->free(cache);
+        return NULL;
+    }
+
+    for (size_t i = 0; i < buckets_len; ++i)
+        cache->buckets[i] = NO_INDEX;
+
+    return cache;
+}
+
+
+static void cache_destroy(opcut_allocator_t *a, cache_t *cache) {
+    if (!cache)
+        return;
+
+    a->free(cache->entries);
+    a->free(cache->buckets);
+    a->free(cache);
+}
+
+
+static void cache_lru_remove(cache_t *cache, size_t index) {
+    cache_entry_t *entry = cache->entries + index;
+
+    if (entry->lru_prev != NO_INDEX) {
+        cache->entries[entry->lru_prev].lru_next = entry->lru_next;
+    } else {
+        cache->lru_first = entry->lru_next;
+    }
+
+    if (entry->lru_next != NO_INDEX) {
+        cache->entries[entry->lru_next].lru_prev = entry->lru_prev;
+    } else {
+        cache->lru_last = entry->lru_prev;
+    }
+}
+
+
+static void cache_lru_push(cache_t *cache, size_t index) {
+    cache_entry_t *entry = cache->entries + index;
+
+    entry->lru_prev = NO_INDEX;
+    entry->lru_next = cache->lru_first;
+
+    if (cache->lru_first != NO_INDEX)
+        cache->entries[cache->lru_first].lru_prev = index;
+
+    cache->lru_first = index;
+    if (cache->lru_last == NO_INDEX)
+        cache->lru_last = index;
+}
+
+
+static cache_entry_t *cache_get(cache_t *cache, uint64_t hash) {
+    size_t index = cache->buckets[hash & (cache->buckets_len - 1)];
+    while (index != NO_INDEX && cache->entries[index].hash != hash)
+        index = cache->entries[index].bucket_next;
+
+    if (index == NO_INDEX)
+        return NULL;
+
+    cache_lru_remove(cache, index);
+    cache_lru_push(cache, index);
+    return cache->entries + index;
+}
+
+
+static cache_entry_t *cache_put(cache_t *cache, uint64_t hash) {
+    cache_entry_t *entry = cache_get(cache, hash);
+    if (entry)
+        return entry;
+
+    size_t index;
+    if (cache->entries_len < cache->size) {
+        index = cache->entries_len++;
+
+    } else {
+        // reuse least recently used entry
+        index = cache->lru_last;
+        cache_lru_remove(cache, index);
+
+        size_t *bucket = cache->buckets + (cache->entries[index].hash &
+                                           (cache->buckets_len - 1));
+        while (*bucket != index)
+            bucket = &(cache->entries[*bucket].bucket_next);
+        *bucket = cache->entries[index].bucket_next;
+    }
+
+    size_t *bucket = cache->buckets + (hash & (cache->buckets_len - 1));
+    entry = cache->entries + index;
+    *entry = (cache_entry_t){.hash = hash,
+                             .status = PENDING,
+                             .source = NO_INDEX,
+                             .bucket_next = *bucket};
+    *bucket = index;
+    cache_lru_push(cache, index);
+
+    return entry;
+}
+
+
+static void lookup_candidates(opcut_params_t *params, result_t *result,
+                              size_t placed, size_t item_id,
+                              panel_state_t *panel_states,
+                              uint64_t *rects_hashes, cache_t *cache,
+                              candidate_t *candidates, size_t candidates_len,
+                              opcut_stats_t *stats) {
+    // candidates are resolved from cache, reuse evaluation of equivalent
+    // candidate or are marked for evaluation (source is own index)
+    uint64_t state_hash =
+        init_state_hash(params, result, panel_states, rects_hashes);
+
+    for (size_t i = 0; i < candidates_len; ++i) {
+        candidate_t *candidate = candidates + i;
+        candidate->hash = calculate_candidate_hash(
+            params, panel_states, rects_hashes, state_hash, placed, item_id,
+            candidate);
+
+        cache_entry_t *entry = cache_get(cache, candidate->hash);
+        if (!entry) {
+            entry = cache_put(cache, candidate->hash);
+            entry->source = i;
+            candidate->source = i;
+            stats->cache_misses += 1;
+            continue;
+        }
+
+        stats->cache_hits += 1;
+
+        if (entry->status == PENDING) {
+            candidate->source = entry->source;
+
+        } else {
+            candidate->source = NO_INDEX;
+            candidate->status = entry->status;
+            candidate->fitness = entry->fitness;
+        }
+    }
+}
+
+
+static void store_candidates(cache_t *cache, candidate_t *candidates,
+                             size_t candidates_len) {
+    for (size_t i = 0; i < candidates_len; ++i) {
+        candidate_t *candidate = candidates + i;
+        if (candidate->source == NO_INDEX)
+            continue;
+
+        if (candidate->source != i) {
+            candidate->status = candidates[candidate->source].status;
+            candidate->fitness = candidates[candidate->source].fitness;
+            continue;
+        }
+
+        if (candidate->status != OPCUT_SUCCESS &&
+            candidate->status != OPCUT_UNSOLVABLE)
+            continue;
+
+        cache_entry_t *entry = cache_put(cache, candidate->hash);
+        entry->status = candidate->status;
+        entry->fitness = candidate->fitness;
+    }
+}
+
+
+static int evaluate_candidate(opcut_allocator_t *a, opcut_params_t *params,
+                              result_t *result, size_t *item_ids,
+                              size_t item_ids_len, double deadline,
+                              candidate_t *candidate, opcut_stats_t *stats) {
+    result_t candidate_result;
+    if (create_candidate_result(a, params, result, item_ids[0], candidate,
+                                &candidate_result))
+        return OPCUT_ERROR;
+
+    stats->rollouts += 1;
+    int err = calculate_greedy(a, params, &candidate_result, item_ids + 1,
+                               item_ids_len - 1, deadline,
+                               &(candidate->fitness), stats, NULL);
+
+    free_used_until(a, candidate_result.used, result->used);
+    free_unused_until(a, candidate_result.unused, NULL);
+    return err;
+}
+
+
+static void *evaluate_candidates(void *arg) {
+    evaluation_t *e = arg;
+
+    for (size_t i = e->offset; i < e->candidates_len; i += e->step) {
+        if (e->candidates[i].source != i)
+            continue;
+
+        e->candidates[i].status = evaluate_candidate(
+            e->a, e->params, e->result, e->item_ids, e->item_ids_len,
+            e->deadline, e->candidates + i, &(e->stats));
+    }
+
+    return NULL;
+}
+
+
+static int calculate_forward_greedy(opcut_allocator_t *a,
+                                    opcut_params_t *params, result_t *result,
+                                    size_t *item_ids, size_t item_ids_len,
+                                    double deadline, bool *final,
+                                    opcut_stats_t *stats,
+                                    progress_t *progress) {
+    int ret = OPCUT_ERROR;
+    size_t threads_len = (params->threads > 1 ? params->threads : 1);
+    candidate_t *candidates = NULL;
+    cache_t *cache = NULL;
+    panel_state_t *panel_states = NULL;
+    uint64_t *rects_hashes = NULL;
+
+    // evaluation 0 is executed by calling thread using allocator `a`
+    evaluation_t *evaluations = a->malloc(threads_len * sizeof(evaluation_t));
+    pthread_t *threads = a->malloc(threads_len * sizeof(pthread_t));
+    if (!evaluations || !threads)
+        goto cleanup;
+
+    panel_states =
+        a->malloc(params->panel_instances_len * sizeof(panel_state_t));
+    if (params->panel_instances_len && !panel_states)
+        goto cleanup;
+
+    // cache is accessed only by calling thread
+    if (params->cache_size) {
+        cache = cache_create(a, params->cache_size);
+        rects_hashes =
+            a->malloc(params->panel_instances_len * sizeof(uint64_t));
+        if (!cache || (params->panel_instances_len && !rects_hashes))
+            goto cleanup;
+    }
+
+    for (size_t i = 0; i < threads_len; ++i) {
+        evaluations[i].a = NULL;
+        evaluations[i].stats = (opcut_stats_t){0};
+    }
+
+    evaluations[0].a = a;
+    for (size_t i = 1; i < threads_len; ++i) {
+        evaluations[i].a = opcut_allocator_create(a->malloc, a->free);
+        if (!evaluations[i].a)
+            goto cleanup;
+    }
+
+    for (size_t i = 0; i < item_ids_len; ++i) {
+        if (is_cancelled(params)) {
+            ret = OPCUT_CANCELLED;
+            goto cleanup;
+        }
+
+        candidates =
+            a->malloc(get_max_candidates_len(result, 1) * sizeof(candidate_t));
+        if (!candidates)
+            goto cleanup;
+
+        fitness_t fitness;
+        init_panel_states(params, result, panel_states, &fitness);
+
+        size_t item_id = item_ids[i];
+        size_t candidates_len = create_candidates(
+            params, panel_states, item_id, result->unused, candidates, stats);
+
+        if (cache)
+            lookup_candidates(params, result, i + 1, item_id, panel_states,
+                              rects_hashes, cache, candidates, candidates_len,
+                              stats);
+
+        size_t evaluated = 0;
+        for (size_t j = 0; j < candidates_len; ++j)
+            evaluated += (candidates[j].source == j ? 1 : 0);
+
+        size_t evaluations_len =
+            (candidates_len < threads_len ? candidates_len : threads_len);
+
+        for (size_t j = 0; j < evaluations_len; ++j) {
+            evaluation_t *e = evaluations + j;
+            e->params = params;
+            e->result = result;
+            e->item_ids = item_ids + i;
+            e->item_ids_len = item_ids_len - i;
+            e->deadline = deadline;
+            e->candidates = candidates;
+            e->candidates_len = candidates_len;
+            e->offset = j;
+            e->step = evaluations_len;
+        }
+
+        size_t threads_started = 0;
+        for (size_t j = 1; j < evaluations_len; ++j) {
+            if (pthread_create(threads + j, NULL, evaluate_candidates,
+                               evaluations + j))
+                break;
+            threads_started = j;
+        }
+
+        if (evaluations_len)
+            evaluate_candidates(evaluations);
+
+        for (size_t j = 1; j <= threads_started; ++j)
+            pthread_join(threads[j], NULL);
+
+        if (evaluations_len > 1 && threads_started < evaluations_len - 1)
+            goto cleanup;
+
+        if (cache)
+            store_candidates(cache, candidates, candidates_len);
+
+        candidate_t *best_candidate = NULL;
+        bool timeout = false;
+        for (size_t j = 0; j < candidates_len; ++j) {
+            candidate_t *candidate = candidates + j;
+
+            if (candidate->status == TIMEOUT) {
+                timeout = true;
+
+            } else if (candidate->status == OPCUT_CANCELLED) {
+                ret = OPCUT_CANCELLED;
+                goto cleanup;
+
+            } else if (candidate->status == OPCUT_ERROR) {
+                goto cleanup;
+
+            } else if (candidate->status == OPCUT_SUCCESS &&
+                       (!best_candidate ||
+                        compare_fitness(&(candidate->fitness),
+                                        &(best_candidate->fitness)) < 0)) {
+                best_candidate = candidate;
             }
         }
 
-        if (!solvable)
-            return OPCUT_UNSOLVABLE;
+        if (!best_candidate && !timeout) {
+            ret = OPCUT_UNSOLVABLE;
+            goto cleanup;
+        }
+
+        if (best_candidate &&
+            apply_candidate(a, params, result, item_id, best_candidate))
+            goto cleanup;
+
+        if (best_candidate)
+            report_progress(params, progress, 1, evaluated,
+                            &(best_candidate->fitness));
 
-        free_unused_until(a, result->unused, NULL);
-        *result = best_result;
+        a->free(candidates);
+        candidates = NULL;
+
+        if (timeout) {
+            size_t placed = i + (best_candidate ? 1 : 0);
+            *final = false;
+            ret = calculate_greedy(a, params, result, item_ids + placed,
+                                   item_ids_len - placed, 0, NULL, stats,
+                                   progress);
+            goto cleanup;
+        }
     }
 
-    return OPCUT_SUCCESS;
+    ret = OPCUT_SUCCESS;
+
+cleanup:
+    if (candidates)
+        a->free(candidates);
+
+    if (evaluations) {
+        // rollout stats are summed after all threads are joined so that
+        // reported stats don't depend on number of threads (except pool
+        // blocks allocated by each thread's allocator)
+        for (size_t i = 0; i < threads_len; ++i)
+            add_stats(stats, &(evaluations[i].stats));
+
+        for (size_t i = 1; i < threads_len; ++i) {
+            if (!evaluations[i].a)
+                continue;
+
+            stats->pool_blocks += get_pool_blocks_len(evaluations[i].a);
+            opcut_allocator_destroy(evaluations[i].a);
+        }
+        a->free(evaluations);
+    }
+
+    if (threads)
+        a->free(threads);
+
+    cache_destroy(a, cache);
+
+    if (panel_states)
+        a->free(panel_states);
+
+    if (rects_hashes)
+        a->free(rects_hashes);
+
+    return ret;
+}
+
+
+static void insert_beam_candidate(beam_candidate_t *candidates,
+                                  size_t *candidates_len, size_t beam_width,
+                                  beam_candidate_t *candidate) {
+    size_t pos = *candidates_len;
+    while (pos > 0 &&
+           compare_fitness(&(candidate->candidate.fitness),
+                           &(candidates[pos - 1].candidate.fitness)) < 0)
+        pos -= 1;
+
+    if (pos >= beam_width)
+        return;
+
+    if (*candidates_len < beam_width)
+        *candidates_len += 1;
+
+    for (size_t i = *candidates_len - 1; i > pos; --i)
+        candidates[i] = candidates[i - 1];
+
+    candidates[pos] = *candidate;
+}
+
+
+static size_t add_beam_candidates(opcut_params_t *params, result_t *state,
+                                  size_t item_id,
+                                  panel_state_t *panel_states,
+                                  candidate_t *state_candidates,
+                                  beam_candidate_t *candidates,
+                                  size_t *candidates_len, size_t beam_width,
+                                  opcut_stats_t *stats) {
+    fitness_t fitness;
+    init_panel_states(params, state, panel_states, &fitness);
+
+    size_t state_candidates_len = create_candidates(
+        params, panel_states, item_id, state->unused, state_candidates, stats);
+
+    for (size_t i = 0; i < state_candidates_len; ++i) {
+        beam_candidate_t candidate = {.state = state,
+                                      .candidate = state_candidates[i]};
+        candidate.candidate.status = OPCUT_SUCCESS;
+
+        calculate_candidate_fitness(params, panel_states, &fitness, item_id,
+                                    &(candidate.candidate));
+        stats->fitness_evaluations += 1;
+
+        insert_beam_candidate(candidates, candidates_len, beam_width,
+                              &candidate);
+    }
+
+    return state_candidates_len;
+}
+
+
+static int calculate_beam(opcut_allocator_t *a, opcut_params_t *params,
+                          result_t *result, size_t *item_ids,
+                          size_t item_ids_len, double deadline, bool *final,
+                          opcut_stats_t *stats, progress_t *progress) {
+    // used lists are shared between states - used elements of discarded
+    // states are released together with allocator
+    int ret = OPCUT_ERROR;
+    size_t beam_width = (params->beam_width > 1 ? params->beam_width : 1);
+
+    result_t *states = a->malloc(beam_width * sizeof(result_t));
+    result_t *new_states = a->malloc(beam_width * sizeof(result_t));
+    beam_candidate_t *candidates =
+        a->malloc(beam_width * sizeof(beam_candidate_t));
+    panel_state_t *panel_states =
+        a->malloc(params->panel_instances_len * sizeof(panel_state_t));
+    candidate_t *state_candidates = NULL;
+    size_t states_len = 0;
+
+    if (!states || !new_states || !candidates ||
+        (params->panel_instances_len && !panel_states))
+        goto cleanup;
+
+    states[0] = *result;
+    states_len = 1;
+
+    size_t i = 0;
+    for (; i < item_ids_len; ++i) {
+        size_t item_id = item_ids[i];
+        size_t candidates_len = 0;
+        size_t evaluated = 0;
+        bool timeout = false;
+
+        size_t state_candidates_len = 0;
+        for (size_t j = 0; j < states_len; ++j) {
+            size_t len = get_max_candidates_len(states + j, 1);
+            if (len > state_candidates_len)
+                state_candidates_len = len;
+        }
+
+        state_candidates =
+            a->malloc(state_candidates_len * sizeof(candidate_t));
+        if (!state_candidates)
+            goto cleanup;
+
+        for (size_t j = 0; j < states_len; ++j) {
+            if (is_cancelled(params)) {
+                ret = OPCUT_CANCELLED;
+                goto cleanup;
+            }
+
+            if (deadline && get_time() > deadline) {
+                timeout = true;
+                break;
+            }
+
+            evaluated += add_beam_candidates(
+                params, states + j, item_id, panel_states, state_candidates,
+                candidates, &candidates_len, beam_width, stats);
+        }
+
+        a->free(state_candidates);
+        state_candidates = NULL;
+
+        if (timeout)
+            break;
+
+        if (!candidates_len) {
+            ret = OPCUT_UNSOLVABLE;
+            goto cleanup;
+        }
+
+        size_t new_states_len = 0;
+        for (; new_states_len < candidates_len; ++new_states_len) {
+            beam_candidate_t *candidate = candidates + new_states_len;
+            if (create_candidate_result(a, params, candidate->state, item_id,
+                                        &(candidate->candidate),
+                                        new_states + new_states_len))
+                break;
+        }
+
+        for (size_t j = 0; j < states_len; ++j)
+            free_unused_until(a, states[j].unused, NULL);
+
+        result_t *temp_states = states;
+        states = new_states;
+        new_states = temp_states;
+        states_len = new_states_len;
+
+        if (new_states_len < candidates_len)
+            goto cleanup;
+
+        report_progress(params, progress, 1, evaluated,
+                        &(candidates[0].candidate.fitness));
+    }
+
+    if (i < item_ids_len) {
+        *final = false;
+        ret = calculate_greedy(a, params, states, item_ids + i,
+                               item_ids_len - i, 0, NULL, stats, progress);
+
+    } else {
+        ret = OPCUT_SUCCESS;
+    }
+
+cleanup:
+    if (states_len) {
+        *result = states[0];
+        for (size_t j = 1; j < states_len; ++j)
+            free_unused_until(a, states[j].unused, NULL);
+
+    } else {
+        *result = (result_t){.used = NULL, .unused = NULL};
+    }
+
+    if (states)
+        a->free(states);
+
+    if (new_states)
+        a->free(new_states);
+
+    if (candidates)
+        a->free(candidates);
+
+    if (panel_states)
+        a->free(panel_states);
+
+    if (state_candidates)
+        a->free(state_candidates);
+
+    return ret;
 }
 
 
@@ -514,33 +1827,157 @@ void opcut_allocator_destroy(opcut_allocator_t *a) {
 }
 
 
+int opcut_params_init_arrays(opcut_params_t *params,
+                             opcut_panel_arrays_t *panels,
+                             opcut_item_arrays_t *items) {
+    params->panels_len = panels->len;
+    params->panels_area = 0;
+    params->panel_instances_len = 0;
+    for (size_t i = 0; i < panels->len; ++i) {
+        double width = panels->width[i];
+        double height = panels->height[i];
+        if (!(width > 0 && height > 0 && isfinite(width) && isfinite(height)))
+            return OPCUT_ERROR;
+
+        params->panels[i] =
+            (opcut_panel_t){.width = width,
+                            .height = height,
+                            .quantity = panels->quantity[i],
+                            .area = width * height,
+                            .offset = params->panel_instances_len};
+        params->panels_area += params->panels[i].area * panels->quantity[i];
+        params->panel_instances_len += panels->quantity[i];
+    }
+
+    params->items_len = items->len;
+    params->item_instances_len = 0;
+    for (size_t i = 0; i < items->len; ++i) {
+        double width = items->width[i];
+        double height = items->height[i];
+        if (!(width > 0 && height > 0 && isfinite(width) && isfinite(height)))
+            return OPCUT_ERROR;
+
+        params->items[i] = (opcut_item_t){
+            .width = width,
+            .height = height,
+            .can_rotate = items->can_rotate[i],
+            .quantity = items->quantity[i],
+            .area = width * height,
+            .order = (items->order ? items->order[i] : width * height)};
+        params->item_instances_len += items->quantity[i];
+    }
+
+    return OPCUT_SUCCESS;
+}
+
+
 int opcut_calculate(opcut_allocator_t *a, int method, opcut_params_t *params,
-                    opcut_used_t **used, opcut_unused_t **unused) {
+                    opcut_used_t **used, opcut_unused_t **unused, bool *final,
+                    opcut_stats_t *stats) {
     int ret = OPCUT_ERROR;
     result_t result = (result_t){.used = NULL, .unused = NULL};
+    double deadline = (params->timeout > 0 ? get_time() + params->timeout : 0);
+    opcut_stats_t temp_stats;
+    if (!stats)
+        stats = &temp_stats;
+
+    progress_t progress = {.placed = 0, .evaluated = 0, .fitness = 0};
+
+    *final = true;
+    *stats = (opcut_stats_t){0};
+
+    // allocator can be reused - only blocks allocated by this calculation
+    // are reported
+    size_t pool_blocks_len = get_pool_blocks_len(a);
 
     size_t *item_ids = create_initial_item_ids(a, params);
-    if (params->items_len && !item_ids)
+    if (params->item_instances_len && !item_ids)
         goto cleanup;
 
     result.unused = create_initial_unused(a, params);
-    if (params->panels_len && !result.unused)
+    if (params->panel_instances_len && !result.unused)
         goto cleanup;
 
     if (method == OPCUT_METHOD_GREEDY) {
-        ret = calculate_greedy(a, params, &result, item_ids, params->items_len,
-                               false);
+        ret = calculate_greedy(a, params, &result, item_ids,
+                               params->item_instances_len, 0, NULL, stats,
+                               &progress);
 
     } else if (method == OPCUT_METHOD_FORWARD_GREEDY) {
-        ret = calculate_greedy(a, params, &result, item_ids, params->items_len,
-                               true);
+        ret = calculate_forward_greedy(a, params, &result, item_ids,
+                                       params->item_instances_len, deadline,
+                                       final, stats, &progress);
+
+    } else if (method == OPCUT_METHOD_BEAM) {
+        ret = calculate_beam(a, params, &result, item_ids,
+                             params->item_instances_len, deadline, final,
+                             stats, &progress);
     }
 
 cleanup:
     if (item_ids)
         a->free(item_ids);
 
+    stats->pool_blocks += get_pool_blocks_len(a) - pool_blocks_len;
+
     *used = result.used;
     *unused = result.unused;
     return ret;
 }
+
+
+int opcut_calculate_arrays(opcut_allocator_t *a, int method,
+                           opcut_params_t *params,
+                           opcut_used_arrays_t *used,
+                           opcut_unused_arrays_t *unused, bool *final,
+                           opcut_stats_t *stats) {
+    opcut_used_t *used_list;
+    opcut_unused_t *unused_list;
+    int ret = opcut_calculate(a, method, params, &used_list, &unused_list,
+                              final, stats);
+
+    // lists are in reverse order of placement
+    size_t len = 0;
+    for (opcut_used_t *i = used_list; i; i = i->next)
+        len += 1;
+
+    if (!ret && len > used->len)
+        ret = OPCUT_ERROR;
+
+    if (!ret) {
+        used->len = len;
+        for (opcut_used_t *i = used_list; i; i = i->next) {
+            len -= 1;
+            used->panel_ids[len] = i->panel_id;
+            used->panel_indexes[len] = i->panel_index;
+            used->item_ids[len] = i->item_id;
+            used->x[len] = i->x;
+            used->y[len] = i->y;
+            used->rotate[len] = i->rotate;
+        }
+    }
+
+    len = 0;
+    for (opcut_unused_t *i = unused_list; i; i = i->next)
+        len += 1;
+
+    if (!ret && len > unused->len)
+        ret = OPCUT_ERROR;
+
+    if (!ret) {
+        unused->len = len;
+        for (opcut_unused_t *i = unused_list; i; i = i->next) {
+            len -= 1;
+            unused->panel_ids[len] = i->panel_id;
+            unused->panel_indexes[len] = i->panel_index;
+            unused->width[len] = i->width;
+            unused->height[len] = i->height;
+            unused->x[len] = i->x;
+            unused->y[len] = i->y;
+        }
+    }
+
+    free_used_until(a, used_list, NULL);
+    free_unused_until(a, unused_list, NULL);
+    return ret;
+}
@@ -7,9 +7,11 @@
 #define OPCUT_SUCCESS 0
 #define OPCUT_ERROR 1
 #define OPCUT_UNSOLVABLE 42
+#define OPCUT_CANCELLED 43
 
 #define OPCUT_METHOD_GREEDY 0
 #define OPCUT_METHOD_FORWARD_GREEDY 1
+#define OPCUT_METHOD_BEAM 2
 
 #ifdef __cplusplus
 extern "C" {
@@ -19,21 +21,31 @@ typedef void *(*opcut_malloc_t)(size_t n);
 typedef void (*opcut_free_t)(void *p);
 typedef struct opcut_allocator_t opcut_allocator_t;
 
+// called by calculating thread after each item placement with number of
+// placed items, number of evaluated candidates and fitness of current best
+// (partial or estimated) result
+typedef void (*opcut_progress_t)(void *data, size_t placed, size_t evaluated,
+                                 double fitness);
+
 typedef struct opcut_panel_t {
     double width;
     double height;
+    size_t quantity;
 
     // internal
     double area;
+    size_t offset;
 } opcut_panel_t;
 
 typedef struct opcut_item_t {
     double width;
     double height;
     bool can_rotate;
+    size_t quantity;
 
     // internal
     double area;
+    double order;  // items are placed in order of decreasing order value
 } opcut_item_t;
 
 typedef struct {
@@ -44,12 +56,27 @@ typedef struct {
     opcut_item_t *items;
     size_t items_len;
 
+    // settings
+    double timeout;
+    size_t threads;
+    size_t beam_width;
+    size_t cache_size;
+
+    // calculation is cancelled (OPCUT_CANCELLED is returned) once `cancel`
+    // (optional) is set to true - it can be set from other thread
+    volatile bool *cancel;
+    opcut_progress_t progress;
+    void *progress_data;
+
     // internal
     double panels_area;
+    size_t panel_instances_len;
+    size_t item_instances_len;
 } opcut_params_t;
 
 typedef struct opcut_used_t {
     size_t panel_id;
+    size_t panel_index;
     size_t item_id;
     double x;
     double y;
@@ -61,6 +88,7 @@ typedef struct opcut_used_t {
 
 typedef struct opcut_unused_t {
     size_t panel_id;
+    size_t panel_index;
     double width;
     double height;
     double x;
@@ -72,14 +100,81 @@ typedef struct opcut_unused_t {
     bool initial;
 } opcut_unused_t;
 
+typedef struct {
+    double *width;
+    double *height;
+    size_t *quantity;
+    size_t len;
+} opcut_panel_arrays_t;
+
+typedef struct {
+    double *width;
+    double *height;
+    bool *can_rotate;
+    size_t *quantity;
+    double *order;  // optional (item area is used if NULL)
+    size_t len;
+} opcut_item_arrays_t;
+
+typedef struct {
+    size_t *panel_ids;
+    size_t *panel_indexes;
+    size_t *item_ids;
+    double *x;
+    double *y;
+    bool *rotate;
+    size_t len;
+} opcut_used_arrays_t;
+
+typedef struct {
+    size_t *panel_ids;
+    size_t *panel_indexes;
+    double *width;
+    double *height;
+    double *x;
+    double *y;
+    size_t len;
+} opcut_unused_arrays_t;
+
+typedef struct {
+    size_t cache_hits;
+    size_t cache_misses;
+    size_t pruned_candidates;
+    size_t generated_candidates;
+    size_t fitness_evaluations;
+    size_t rollouts;
+    size_t pool_blocks;  // memory pool blocks allocated during calculation
+    size_t peak_unused;  // maximum length of unused list
+} opcut_stats_t;
+
 
 opcut_allocator_t *opcut_allocator_create(opcut_malloc_t malloc,
                                           opcut_free_t free);
 void opcut_allocator_destroy(opcut_allocator_t *a);
 
+// panels and items (including internal fields of params, panels and items)
+// are initialized from arrays - `params->panels` and `params->items` should
+// point to caller provided arrays of `panels->len` and `items->len`
+// elements (OPCUT_ERROR is returned if width or height is not positive)
+int opcut_params_init_arrays(opcut_params_t *params,
+                             opcut_panel_arrays_t *panels,
+                             opcut_item_arrays_t *items);
+
 
 int opcut_calculate(opcut_allocator_t *a, int method, opcut_params_t *params,
-                    opcut_used_t **used, opcut_unused_t **unused);
+                    opcut_used_t **used, opcut_unused_t **unused, bool *final,
+                    opcut_stats_t *stats);
+
+// used (in order of placement) and unused are copied to caller provided
+// arrays - `len` is arrays capacity on input and number of copied elements
+// on output (`params->item_instances_len` used elements and
+// `params->panels_len + 2 * params->item_instances_len` unused elements
+// are always sufficient)
+int opcut_calculate_arrays(opcut_allocator_t *a, int method,
+                           opcut_params_t *params,
+                           opcut_used_arrays_t *used,
+                           opcut_unused_arrays_t *unused, bool *final,
+                           opcut_stats_t *stats);
 
 #ifdef __cplusplus
 }
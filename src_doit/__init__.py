@@ -9,7 +9,8 @@ from hat.doit.js import (ESLintConf,
                          run_eslint)
 from hat.doit.py import (get_task_build_wheel,
                          get_task_create_pip_requirements,
-                         run_flake8)
+                         run_flake8,
+                         run_pytest)
 from hat.doit.c import get_task_clang_format
 
 from . import dist
@@ -19,6 +20,7 @@ from . import libopcut
 __all__ = ['task_clean_all',
            'task_wheel',
            'task_check',
+           'task_test',
            'task_ts',
            'task_static',
            'task_node_modules',
@@ -39,6 +41,7 @@ src_js_dir = Path('src_js')
 src_py_dir = Path('src_py')
 src_scss_dir = Path('src_scss')
 src_static_dir = Path('src_static')
+pytest_dir = Path('test_pytest')
 
 build_py_dir = build_dir / 'py'
 ui_dir = src_py_dir / 'opcut/ui'
@@ -70,10 +73,19 @@ def task_wheel():
 def task_check():
     """Check"""
     return {'actions': [(run_flake8, [src_py_dir]),
+                        (run_flake8, [pytest_dir]),
                         (run_eslint, [src_js_dir, ESLintConf.TS])],
             'task_dep': ['node_modules']}
 
 
+def task_test():
+    """Test"""
+    return {'actions': [lambda args: run_pytest(pytest_dir, *(args or []))],
+            'pos_arg': 'args',
+            'task_dep': ['json_schema_repo',
+                         'libopcut']}
+
+
 def task_ts():
     """Build TypeScript"""
 
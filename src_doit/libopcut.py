@@ -18,12 +18,13 @@ src_py_dir = Path('src_py')
 libopcut_path = src_py_dir / f'opcut/_libopcut{get_lib_suffix()}'
 
 c_flags = ['-fPIC', '-O2']
-# c_flags = ['-fPIC', '-O0', '-ggdb']
+# c_flags = ['-fPIC', '-O0', '-ggdb', '-DOPCUT_DEBUG_FITNESS']
 
 build = CBuild(src_paths=[*src_c_dir.rglob('*.c')],
                build_dir=(build_dir / 'libopcut' /
                           common.target_platform.name.lower()),
                c_flags=c_flags,
+               ld_libs=['-lpthread'],
                task_dep=['libopcut_cleanup'])
 
 
@@ -9,7 +9,10 @@ export const methods = {
     forward_greedy: 'Forward greedy',
     greedy: 'Greedy',
     forward_greedy_native: 'Forward greedy (native)',
-    greedy_native: 'Greedy (native)'
+    greedy_native: 'Greedy (native)',
+    beam: 'Beam',
+    beam_native: 'Beam (native)',
+    portfolio: 'Portfolio'
 } as const;
 
 export const fontSizes = {
@@ -26,12 +29,14 @@ export type FontSize = keyof (typeof fontSizes);
 export type Panel = {
     width: number;
     height: number;
+    quantity?: number;
 };
 
 export type Item = {
     width: number;
     height: number;
     can_rotate: boolean;
+    quantity?: number;
 };
 
 export type Params = {
@@ -102,6 +107,11 @@ export type Settings = {
     };
 };
 
+export type Progress = {
+    placed: number;
+    items: number;
+};
+
 export type State = {
     form: {
         method: Method;
@@ -111,6 +121,7 @@ export type State = {
         items: FormItem[];
     };
     result: Result | null;
+    resultId: string | null;
     selected: {
         panel: string | null;
         item: string | null;
@@ -121,17 +132,22 @@ export type State = {
         showDimensions: boolean;
     };
     calculating: boolean;
+    progress: Progress | null;
     showSettings: boolean;
     settings: Settings;
 };
 
 
-const calculateUrl = String(new URL('./calculate', window.location.href));
+const calculateUrl = String(
+    new URL('./calculate/stream', window.location.href)
+);
 const generateUrl = String(new URL('./generate', window.location.href));
 
 let panelCounter = 0;
 let itemCounter = 0;
 
+let calculateAbortController: AbortController | null = null;
+
 
 const defaultSettings: Settings = {
     lang: 'en',
@@ -163,6 +179,7 @@ export const defaultState: State = {
         items: [] as FormItem[]
     },
     result: null,
+    resultId: null,
     selected: {
         panel: null,
         item: null
@@ -173,6 +190,7 @@ export const defaultState: State = {
         showDimensions: false
     },
     calculating: false,
+    progress: null,
     showSettings: false,
     settings: defaultSettings
 } as const;
@@ -219,7 +237,13 @@ export function saveSettings(settings: Settings) {
 
 
 export async function calculate() {
-    await r.set('calculating', true);
+    const abortController = new AbortController();
+    calculateAbortController = abortController;
+
+    await r.change(u.pipe(
+        u.set('calculating', true),
+        u.set('progress', null)
+    ));
 
     try {
         const state = getState();
@@ -230,7 +254,8 @@ export async function calculate() {
         const res = await fetch(`${calculateUrl}?method=${state.form.method}`, {
             method: 'POST',
             headers: {'Content-Type': 'application/json'},
-            body: JSON.stringify(params)
+            body: JSON.stringify(params),
+            signal: abortController.signal
         });
 
         if (!res.ok) {
@@ -238,35 +263,62 @@ export async function calculate() {
             throw `${dict.server_error}: ${err}`;
         }
 
-        const result = await res.json() as Result;
+        const calculated = await readCalculateEvents(res);
+        if (calculated == null)
+            return;
+
+        const result = calculated.result;
         const selected: State['selected'] = {
             panel: Object.keys(result.params.panels)[0],
             item: null
         };
         await r.change(u.pipe(
             u.set('result', result),
+            u.set('resultId', calculated.resultId),
             u.set('selected', selected)
         ));
 
     } catch (e) {
-        notify(String(e));
+        if (!abortController.signal.aborted)
+            notify(String(e));
 
     } finally {
-        await r.set('calculating', false);
+        calculateAbortController = null;
+        await r.change(u.pipe(
+            u.set('calculating', false),
+            u.set('progress', null)
+        ));
     }
 }
 
 
+export function cancelCalculate() {
+    if (calculateAbortController)
+        calculateAbortController.abort();
+}
+
+
 export async function generate() {
     try {
         const state = getState();
         const dict = getDict();
 
-        const res = await fetch(`${generateUrl}?output_format=pdf`, {
-            method: 'POST',
-            headers: {'Content-Type': 'application/json'},
-            body: JSON.stringify(state.result)
-        });
+        // result stored on server is referenced by id (if result is no
+        // longer available on server, whole result is sent)
+        let res = (state.resultId != null ?
+            await fetch(
+                `${generateUrl}?output_format=pdf&result_id=${state.resultId}`,
+                {method: 'POST'}
+            ) :
+            null
+        );
+
+        if (res == null || res.status == 404)
+            res = await fetch(`${generateUrl}?output_format=pdf`, {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify(state.result)
+            });
 
         if (!res.ok) {
             const err = await res.text();
@@ -383,16 +435,14 @@ function createCalculateParams(state: State): Params {
         if (panel.width <= 0)
             throw `${dict.invalid_width} (${dict.panel} ${panel.name})`;
 
-        for (let i = 1; i <= panel.quantity; ++i) {
-            const name = panel.quantity > 1 ? `${panel.name} ${i}` : panel.name;
-            if (name in panels)
-                throw `${dict.duplicate_name} (${dict.panel} ${panel.name})`;
+        if (panel.name in panels)
+            throw `${dict.duplicate_name} (${dict.panel} ${panel.name})`;
 
-            panels[name] = {
-                width: panel.width,
-                height: panel.height
-            };
-        }
+        panels[panel.name] = {
+            width: panel.width,
+            height: panel.height,
+            quantity: panel.quantity
+        };
     }
     if (u.equals(panels, {}))
         throw dict.no_panels_defined;
@@ -411,17 +461,15 @@ function createCalculateParams(state: State): Params {
         if (item.width <= 0)
             throw `${dict.invalid_width} (${dict.item} ${item.name})`;
 
-        for (let i = 1; i <= item.quantity; ++i) {
-            const name = item.quantity > 1 ? `${item.name} ${i}` : item.name;
-            if (name in items)
-                throw `${dict.duplicate_name} (${dict.panel} ${item.name})`;
+        if (item.name in items)
+            throw `${dict.duplicate_name} (${dict.item} ${item.name})`;
 
-            items[name] = {
-                width: item.width,
-                height: item.height,
-                can_rotate: item.canRotate
-            };
-        }
+        items[item.name] = {
+            width: item.width,
+            height: item.height,
+            can_rotate: item.canRotate,
+            quantity: item.quantity
+        };
     }
     if (u.equals(items, {}))
         throw dict.no_items_defined;
@@ -435,6 +483,64 @@ function createCalculateParams(state: State): Params {
 }
 
 
+async function readCalculateEvents(
+    res: Response
+): Promise<{result: Result, resultId: string | null} | null> {
+    const dict = getDict();
+
+    if (res.body == null)
+        return null;
+
+    let resultId: string | null = null;
+
+    const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+
+    while (true) {
+        const {done, value} = await reader.read();
+        if (done)
+            return null;
+
+        buffer += value;
+        const events = buffer.split('\n\n');
+        buffer = events.pop() ?? '';
+
+        for (const event of events) {
+            let name = 'message';
+            let data = '';
+            for (const line of event.split('\n')) {
+                if (line.startsWith('event: ')) {
+                    name = line.substring(7);
+
+                } else if (line.startsWith('data: ')) {
+                    data += line.substring(6);
+                }
+            }
+
+            if (name == 'job') {
+                resultId = JSON.parse(data).id;
+
+            } else if (name == 'progress') {
+                const progress = JSON.parse(data);
+                await r.set('progress', {
+                    placed: progress.placed,
+                    items: progress.items
+                });
+
+            } else if (name == 'result') {
+                return {
+                    result: JSON.parse(data) as Result,
+                    resultId: resultId
+                };
+
+            } else if (name == 'error') {
+                throw `${dict.server_error}: ${JSON.parse(data).message}`;
+            }
+        }
+    }
+}
+
+
 function notify(message: string) {
     let root = document.querySelector('body > .notifications');
     if (!root) {
@@ -18,6 +18,7 @@ const en = {
     cut_width: 'Cut width',
     minimize_initial_panel_usage: 'Minimize initial panel usage',
     calculate: 'Calculate',
+    cancel: 'Cancel',
     quantity: 'Quantity',
     height: 'Height',
     width: 'Width',
@@ -67,6 +68,7 @@ const hr = {
     cut_width: 'Širina reza',
     minimize_initial_panel_usage: 'Optimiraj upotrebu početnih ploca',
     calculate: 'Izračunaj',
+    cancel: 'Odustani',
     quantity: 'Količina',
     height: 'Visina',
     width: 'Širina',
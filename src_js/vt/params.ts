@@ -55,16 +55,24 @@ export function main(): u.VNodeChild {
             panels(),
             items()
         ],
-        ['button.calculate', {
-            props: {
-                disabled: state.calculating
-            },
-            on: {
-                click: common.calculate
-            }},
-            icon('system-run'),
-            ` ${dict.calculate}`
-        ]
+        (state.calculating ?
+            ['button.calculate', {
+                on: {
+                    click: common.cancelCalculate
+                }},
+                icon('window-close'),
+                ` ${dict.cancel}`,
+                (state.progress ?
+                    ` (${state.progress.placed}/${state.progress.items})` :
+                    '')
+            ] :
+            ['button.calculate', {
+                on: {
+                    click: common.calculate
+                }},
+                icon('system-run'),
+                ` ${dict.calculate}`
+            ])
     ];
 }
 
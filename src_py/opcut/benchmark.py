@@ -0,0 +1,434 @@
+"""Benchmark of calculation methods
+
+Benchmark instances are generated by seeded generator so that same
+instances are calculated by different builds. Each measurement is executed
+in separate process (peak resident set size is measured per calculation).
+
+Startup of ``opcut calculate`` process is measured with ``python -X
+importtime``. This module is imported by `opcut.main` for every action -
+calculation modules are imported only once benchmark is run.
+
+"""
+
+import math
+import multiprocessing
+import random
+import subprocess
+import sys
+import time
+import typing
+
+from hat import json
+
+from opcut import common
+
+try:
+    import resource
+
+except ImportError:
+    resource = None
+
+
+class InstanceSettings(typing.NamedTuple):
+    items: int
+    """number of item instances"""
+    panels: int
+    """number of panel types"""
+    can_rotate_ratio: float = 0.5
+    """ratio of items which can be rotated"""
+    duplicate_ratio: float = 0
+    """ratio of item instances which duplicate existing item"""
+    cut_width: float = 3
+    min_initial_usage: bool = True
+    seed: int = 0
+
+
+class Measurement(typing.NamedTuple):
+    instance: str
+    method: common.Method
+    status: str
+    """``success``, ``unresolvable``, ``timeout`` or ``error``"""
+    final: bool
+    wall_time: float
+    """calculation duration in seconds"""
+    peak_rss: int | None
+    """peak resident set size of calculation process in bytes"""
+    evaluated: int
+    """number of evaluated placement candidates"""
+    waste: float | None
+    """percentage of used panels area not covered by items"""
+
+
+class StartupMeasurement(typing.NamedTuple):
+    wall_time: float
+    """duration of ``opcut calculate`` process in seconds"""
+    import_time: float
+    """total import time of ``opcut calculate`` process in seconds"""
+    excluded_modules: list[str]
+    """imported modules which should not be imported"""
+
+
+class Comparison(typing.NamedTuple):
+    instance: str
+    method: common.Method
+    baseline: Measurement
+    measurement: Measurement
+    wall_time_ratio: float | None
+    regression: bool
+
+
+default_instances: dict[str, InstanceSettings] = {
+    'tiny': InstanceSettings(items=10,
+                             panels=1),
+    'small': InstanceSettings(items=100,
+                              panels=2,
+                              duplicate_ratio=0.3),
+    'small_fixed': InstanceSettings(items=100,
+                                    panels=2,
+                                    can_rotate_ratio=0,
+                                    duplicate_ratio=0.3,
+                                    cut_width=4,
+                                    min_initial_usage=False),
+    'medium': InstanceSettings(items=1000,
+                               panels=3,
+                               duplicate_ratio=0.5),
+    'medium_exact': InstanceSettings(items=1000,
+                                     panels=3,
+                                     can_rotate_ratio=1,
+                                     duplicate_ratio=0.7,
+                                     cut_width=0),
+    'large': InstanceSettings(items=10000,
+                              panels=4,
+                              duplicate_ratio=0.9)}
+
+startup_excluded_modules: list[str] = ['aiohttp', 'asyncio', 'cairo',
+                                       'opcut.generate', 'opcut.server']
+"""modules which should not be imported by ``opcut calculate``"""
+
+_panel_sizes = [(2800, 2070),
+                (2440, 1220),
+                (3050, 1530),
+                (2500, 1250),
+                (2750, 1830),
+                (2620, 2070)]
+
+
+def generate_params(settings: InstanceSettings) -> common.Params:
+    """Generate benchmark instance
+
+    Panel quantities are chosen so that all items can be placed.
+
+    """
+    r = random.Random(settings.seed)
+
+    panel_sizes = r.sample(_panel_sizes, settings.panels)
+    max_item_size = min(min(size) for size in panel_sizes)
+
+    items = []
+    for _ in range(settings.items):
+        if items and r.random() < settings.duplicate_ratio:
+            i = r.randrange(len(items))
+            items[i] = items[i]._replace(quantity=items[i].quantity + 1)
+            continue
+
+        items.append(common.Item(
+            id=f'item{len(items) + 1}',
+            width=round(r.triangular(50, max_item_size, max_item_size / 4)),
+            height=round(r.triangular(50, max_item_size, max_item_size / 4)),
+            can_rotate=r.random() < settings.can_rotate_ratio))
+
+    items_area = sum(item.width * item.height * item.quantity
+                     for item in items)
+    panels = [common.Panel(id=f'panel{i + 1}',
+                           width=width,
+                           height=height,
+                           quantity=math.ceil(2 * items_area /
+                                              (len(panel_sizes) *
+                                               width * height)))
+              for i, (width, height) in enumerate(panel_sizes)]
+
+    return common.Params(cut_width=settings.cut_width,
+                         min_initial_usage=settings.min_initial_usage,
+                         panels=panels,
+                         items=items)
+
+
+def run_benchmark(instances: dict[str, common.Params],
+                  methods: typing.Iterable[common.Method],
+                  timeout: float | None = None,
+                  threads: int | None = None,
+                  beam_width: int = 10,
+                  repeat: int = 1
+                  ) -> typing.Iterator[Measurement]:
+    """Measure calculation of each instance with each method
+
+    Arguments `timeout`, `threads` and `beam_width` are passed to
+    `opcut.calculate.calculate`. Calculation which does not finish in
+    ``2 * timeout + 10`` seconds is terminated (measurement with status
+    ``timeout``). If `repeat` is greater than 1, measurement with shortest
+    wall time is yielded.
+
+    """
+    methods = list(methods)
+    time_limit = 2 * timeout + 10 if timeout else None
+
+    for instance, params in instances.items():
+        for method in methods:
+            measurements = [_measure(instance, method, params, timeout,
+                                     threads, beam_width, time_limit)
+                            for _ in range(repeat)]
+            yield min(measurements, key=lambda i: i.wall_time)
+
+
+def measure_startup(repeat: int = 1) -> StartupMeasurement:
+    """Measure startup of ``opcut calculate`` process
+
+    Process calculates ``tiny`` instance with greedy method. If `repeat` is
+    greater than 1, measurement with shortest import time is returned.
+
+    """
+    params = generate_params(default_instances['tiny'])
+    params_str = json.encode(common.params_to_json(params))
+
+    return min((_measure_startup(params_str) for _ in range(repeat)),
+               key=lambda i: i.import_time)
+
+
+def compare(baseline: typing.Iterable[Measurement],
+            measurements: typing.Iterable[Measurement],
+            threshold: float = 0.1
+            ) -> list[Comparison]:
+    """Compare measurements with baseline measurements
+
+    Measurement is regression if its wall time is longer than baseline
+    wall time by more than `threshold` ratio, if its waste is larger than
+    baseline waste or if its status is changed. Measurements without
+    baseline measurement are ignored.
+
+    """
+    baseline = {(i.instance, i.method): i for i in baseline}
+    comparisons = []
+
+    for measurement in measurements:
+        baseline_measurement = baseline.get((measurement.instance,
+                                             measurement.method))
+        if not baseline_measurement:
+            continue
+
+        wall_time_ratio = (measurement.wall_time /
+                           baseline_measurement.wall_time
+                           if baseline_measurement.wall_time else None)
+        regression = (
+            measurement.status != baseline_measurement.status or
+            (wall_time_ratio is not None and
+             wall_time_ratio > 1 + threshold) or
+            (measurement.waste is not None and
+             baseline_measurement.waste is not None and
+             measurement.waste > baseline_measurement.waste + 1e-9))
+
+        comparisons.append(Comparison(instance=measurement.instance,
+                                      method=measurement.method,
+                                      baseline=baseline_measurement,
+                                      measurement=measurement,
+                                      wall_time_ratio=wall_time_ratio,
+                                      regression=regression))
+
+    return comparisons
+
+
+def benchmark_to_json(measurements: typing.Iterable[Measurement]
+                      ) -> json.Data:
+    """Convert measurements to json serializable data"""
+    return {'environment': _get_environment(),
+            'measurements': [_measurement_to_json(i) for i in measurements]}
+
+
+def startup_to_json(measurement: StartupMeasurement) -> json.Data:
+    """Convert startup measurement to json serializable data"""
+    return {'environment': _get_environment(),
+            'startup': {'wall_time': measurement.wall_time,
+                        'import_time': measurement.import_time,
+                        'excluded_modules': measurement.excluded_modules}}
+
+
+def benchmark_from_json(data: json.Data) -> list[Measurement]:
+    """Convert json serializable data to measurements"""
+    return [_measurement_from_json(i) for i in data['measurements']]
+
+
+def _measure(instance, method, params, timeout, threads, beam_width,
+             time_limit):
+    context = multiprocessing.get_context('spawn')
+    conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_measure_process,
+                              args=(child_conn, method, params, timeout,
+                                    threads, beam_width),
+                              daemon=True)
+    process.start()
+    child_conn.close()
+
+    try:
+        if conn.poll(time_limit):
+            status, final, wall_time, peak_rss, evaluated, waste = conn.recv()
+
+        else:
+            status, final, wall_time, peak_rss, evaluated, waste = (
+                'timeout', False, time_limit, None, 0, None)
+
+    except EOFError:
+        status, final, wall_time, peak_rss, evaluated, waste = (
+            'error', False, 0, None, 0, None)
+
+    finally:
+        conn.close()
+        if process.is_alive():
+            process.kill()
+        process.join()
+
+    return Measurement(instance=instance,
+                       method=method,
+                       status=status,
+                       final=final,
+                       wall_time=wall_time,
+                       peak_rss=peak_rss,
+                       evaluated=evaluated,
+                       waste=waste)
+
+
+def _measure_startup(params_str):
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime',
+                              '-m', 'opcut', 'calculate',
+                              '--method', 'greedy'],
+                             input=params_str,
+                             stdout=subprocess.DEVNULL,
+                             stderr=subprocess.PIPE,
+                             encoding='utf-8',
+                             check=True)
+    wall_time = time.perf_counter() - start
+
+    import_time = 0
+    modules = set()
+
+    # line format: 'import time: <self us> | <cumulative us> | <name>'
+    # where name is indented two spaces per nesting level
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+
+        _, cumulative, name = line.split('|')
+        if not cumulative.strip().isdigit():
+            continue
+
+        if not name.startswith('  '):
+            import_time += int(cumulative) / 1_000_000
+
+        modules.add(name.strip())
+
+    excluded_modules = sorted(
+        module for module in modules
+        if any(module == i or module.startswith(f'{i}.')
+               for i in startup_excluded_modules))
+
+    return StartupMeasurement(wall_time=wall_time,
+                              import_time=import_time,
+                              excluded_modules=excluded_modules)
+
+
+def _measure_process(conn, method, params, timeout, threads, beam_width):
+    import opcut.calculate
+
+    evaluated = 0
+
+    def on_progress(placed, candidates, fitness):
+        nonlocal evaluated
+        evaluated = candidates
+
+    start = time.perf_counter()
+
+    try:
+        result = opcut.calculate.calculate(method=method,
+                                           params=params,
+                                           timeout=timeout,
+                                           threads=threads,
+                                           beam_width=beam_width,
+                                           progress_cb=on_progress)
+        status = 'success'
+
+    except common.UnresolvableError:
+        result = None
+        status = 'unresolvable'
+
+    except Exception:
+        result = None
+        status = 'error'
+
+    wall_time = time.perf_counter() - start
+
+    conn.send((status,
+               result.final if result else False,
+               wall_time,
+               _get_peak_rss(),
+               evaluated,
+               _get_waste(result) if result else None))
+    conn.close()
+
+
+def _get_environment():
+    import platform
+
+    from opcut import libopcut
+
+    return {'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'native': libopcut.is_available()}
+
+
+def _get_peak_rss():
+    if not resource:
+        return
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # linux reports kilobytes and darwin reports bytes
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+def _get_waste(result):
+    panels = {(used.panel.id, used.panel_index): used.panel
+              for used in result.used}
+    panels_area = sum(panel.width * panel.height
+                      for panel in panels.values())
+    items_area = sum(used.item.width * used.item.height
+                     for used in result.used)
+
+    if not panels_area:
+        return
+
+    return 100 * (panels_area - items_area) / panels_area
+
+
+def _measurement_to_json(measurement):
+    return {'instance': measurement.instance,
+            'method': measurement.method.value,
+            'status': measurement.status,
+            'final': measurement.final,
+            'wall_time': measurement.wall_time,
+            'peak_rss': measurement.peak_rss,
+            'evaluated': measurement.evaluated,
+            'evaluated_per_second': (
+                measurement.evaluated / measurement.wall_time
+                if measurement.wall_time else None),
+            'waste': measurement.waste}
+
+
+def _measurement_from_json(data):
+    return Measurement(instance=data['instance'],
+                       method=common.Method(data['method']),
+                       status=data['status'],
+                       final=data['final'],
+                       wall_time=data['wall_time'],
+                       peak_rss=data['peak_rss'],
+                       evaluated=data['evaluated'],
+                       waste=data['waste'])
@@ -0,0 +1,159 @@
+"""On-disk result cache
+
+Results are stored as JSON files named by hash of canonical params, method
+and (for beam and portfolio methods) beam width. Cache directory can be
+shared by multiple processes - files are written atomically and least
+recently used files are removed once total size of cached results exceeds
+maximum size.
+
+"""
+
+from pathlib import Path
+import contextlib
+import hashlib
+import json as std_json
+import os
+import tempfile
+import typing
+
+from hat import json
+
+from opcut import codec
+from opcut import common
+
+
+class CacheStats(typing.NamedTuple):
+    hits: int
+    misses: int
+
+
+def get_key(method: common.Method,
+            params: common.Params,
+            beam_width: int = 10
+            ) -> str:
+    """Get cache key"""
+    data = {'method': method.value,
+            'params': common.params_to_json(params)}
+    if method in (common.Method.BEAM, common.Method.BEAM_NATIVE,
+                  common.Method.PORTFOLIO):
+        data['beam_width'] = beam_width
+
+    data_str = std_json.dumps(data, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(data_str.encode('utf-8')).hexdigest()
+
+
+def create_result_cache(path: Path,
+                        max_size: int = 100 * 1024 * 1024
+                        ) -> 'ResultCache':
+    """Create result cache
+
+    Argument `max_size` is maximum total size of cached results in bytes.
+
+    """
+    path.mkdir(parents=True, exist_ok=True)
+
+    cache = ResultCache()
+    cache._path = path
+    cache._max_size = max_size
+    cache._hits = 0
+    cache._misses = 0
+    return cache
+
+
+class ResultCache:
+
+    @property
+    def stats(self) -> CacheStats:
+        """Hit and miss counts of this cache instance"""
+        return CacheStats(hits=self._hits,
+                          misses=self._misses)
+
+    def get(self,
+            method: common.Method,
+            params: common.Params,
+            beam_width: int = 10
+            ) -> json.Data | None:
+        """Get cached result
+
+        Result is json serializable data specified by
+        ``opcut://opcut.yaml#/$defs/result``.
+
+        """
+        path = self._get_path(get_key(method, params, beam_width))
+
+        try:
+            result = codec.decode_json(path.read_bytes())
+
+        except Exception:
+            self._misses += 1
+            return
+
+        # modification time is used as last access time
+        with contextlib.suppress(OSError):
+            os.utime(path)
+
+        self._hits += 1
+        return result
+
+    def put(self,
+            method: common.Method,
+            params: common.Params,
+            beam_width: int,
+            result: json.Data):
+        """Add result to cache
+
+        Argument `result` is json serializable data specified by
+        ``opcut://opcut.yaml#/$defs/result``. Non final results are
+        ignored. Calculation statistics are not cached.
+
+        """
+        if not result['final']:
+            return
+
+        if 'stats' in result:
+            result = {k: v for k, v in result.items() if k != 'stats'}
+
+        path = self._get_path(get_key(method, params, beam_width))
+
+        fd, tmp_path = tempfile.mkstemp(dir=self._path, prefix='.',
+                                        suffix='.tmp')
+        try:
+            with open(fd, 'wb') as f:
+                f.write(codec.encode_json(result))
+
+            os.replace(tmp_path, path)
+
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+        self._evict()
+
+    def _get_path(self, key):
+        return self._path / f'{key}.json'
+
+    def _evict(self):
+        entries = []
+        size = 0
+
+        for entry in os.scandir(self._path):
+            if not entry.name.endswith('.json'):
+                continue
+
+            try:
+                stat = entry.stat()
+
+            except FileNotFoundError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            size += stat.st_size
+
+        entries.sort()
+
+        for _, entry_size, entry_path in entries:
+            if size <= self._max_size:
+                break
+
+            Path(entry_path).unlink(missing_ok=True)
+            size -= entry_size
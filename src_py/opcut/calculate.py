@@ -1,109 +1,739 @@
+import collections
+import concurrent.futures
+import functools
 import itertools
+import math
+import multiprocessing
+import os
+import random
+import threading
+import time
+import typing
 
 from opcut import common
 from opcut import libopcut
 
 
 def calculate(method: common.Method,
-              params: common.Params
+              params: common.Params,
+              timeout: float | None = None,
+              threads: int | None = None,
+              beam_width: int = 10,
+              cache_size: int = 10000,
+              cancel: common.CancelFlag | None = None,
+              progress_cb: common.ProgressCb | None = None,
+              item_order: common.ItemOrder | None = None,
+              seed: int | None = None
               ) -> common.Result:
-    """Calculate cutting stock problem"""
+    """Calculate cutting stock problem
+
+    If `timeout` is provided and calculation is not finished in `timeout`
+    seconds, best candidate found so far is completed with greedy method and
+    returned as non final result.
+
+    Argument `threads` is number of threads used by native forward greedy
+    method or number of configurations calculated concurrently by portfolio
+    method (if `threads` is ``None``, number of CPUs is used). Result does
+    not depend on number of threads. If `threads` or `beam_width` is less
+    than ``1``, `ValueError` is raised.
+
+    Argument `beam_width` is number of best partial results kept after each
+    item placement by beam methods.
+
+    Forward greedy methods memoize greedy completion of equivalent
+    candidates (same remaining items and same free rectangles per panel
+    dimensions). Argument `cache_size` limits number of memoized
+    completions (``0`` disables memoization).
+
+    If `cancel` is set (from other thread), calculation is stopped and
+    `common.CancelledError` is raised. Optional `progress_cb` is called
+    after each item placement.
+
+    Items are placed in order of decreasing `item_order` value (if not
+    provided, Python methods use `common.ItemOrder.MAX_SIDE` and native
+    methods use `common.ItemOrder.AREA`). If `seed` is provided, items
+    with same order value are placed in random order.
+
+    Portfolio method calculates all `get_portfolio_configurations`
+    configurations and returns result with best fitness. Each configuration
+    is single threaded calculation and `threads` configurations are
+    calculated concurrently - native configurations in threads (native
+    calculation does not hold GIL) and Python configurations in processes.
+    Configuration which produced result is available as
+    `common.Result.configuration`. If `timeout` is provided, it limits
+    duration of whole portfolio calculation - configurations which are
+    not started before timeout are skipped (except first configuration
+    which is always calculated) and result is not final.
+
+    """
+    if beam_width < 1:
+        raise ValueError('invalid beam width')
+
+    if threads is None:
+        threads = os.cpu_count() or 1
+
+    elif threads < 1:
+        raise ValueError('invalid number of threads')
+
+    if method == common.Method.PORTFOLIO:
+        return _calculate_portfolio(params, timeout, threads, beam_width,
+                                    cache_size, cancel, progress_cb)
+
+    deadline = time.monotonic() + timeout if timeout else None
+    progress = _Progress(progress_cb)
 
     if method == common.Method.GREEDY:
-        return _calculate_greedy(_create_initial_result(params))
+        return _create_result(
+            _calculate_greedy(
+                _create_initial_state(params, cancel, item_order, seed),
+                progress=progress))
 
     if method == common.Method.FORWARD_GREEDY:
-        return _calculate_forward_greedy(_create_initial_result(params))
+        state = _create_initial_state(params, cancel, item_order, seed)
+        cache = _RolloutCache(cache_size, state.context.counters)
+        return _calculate_forward_greedy(state, cache, progress, deadline)
+
+    if method == common.Method.BEAM:
+        return _calculate_beam(
+            _create_initial_state(params, cancel, item_order, seed),
+            beam_width, progress, deadline)
 
-    if method in (common.Method.GREEDY_NATIVE,
-                  common.Method.FORWARD_GREEDY_NATIVE):
-        return libopcut.calculate(method, params)
+    if method in _native_methods:
+        return libopcut.calculate(method, params, timeout, threads,
+                                  beam_width, cache_size, cancel, progress_cb,
+                                  item_order, seed)
 
     raise ValueError('unsupported method')
 
 
+def calculate_many(method: common.Method,
+                   params: typing.Iterable[common.Params],
+                   timeout: float | None = None,
+                   threads: int | None = None,
+                   beam_width: int = 10,
+                   cache_size: int = 10000,
+                   processes: int | None = None
+                   ) -> typing.Iterator[common.Result | Exception]:
+    """Calculate multiple cutting stock problems
+
+    Problems are calculated by pool of `processes` processes (if `processes`
+    is ``None``, number of CPUs is used). Results are yielded in order of
+    `params`. If calculation of single problem fails, exception (e.g.
+    `common.UnresolvableError`) is yielded instead of result.
+
+    If `threads` is ``None``, number of CPUs divided by number of processes
+    is used. Remaining arguments are passed to `calculate`.
+
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    if threads is None:
+        threads = max(1, (os.cpu_count() or 1) // processes)
+
+    fn = functools.partial(_calculate_many_job, method=method,
+                           timeout=timeout, threads=threads,
+                           beam_width=beam_width, cache_size=cache_size)
+
+    if processes == 1:
+        yield from map(fn, params)
+        return
+
+    with multiprocessing.Pool(processes) as pool:
+        yield from pool.imap(fn, params)
+
+
+def get_portfolio_configurations() -> list[common.Configuration]:
+    """Get configurations calculated by portfolio method
+
+    Native methods are used if native implementation is available.
+
+    """
+    if libopcut.is_available():
+        greedy = common.Method.GREEDY_NATIVE
+        forward_greedy = common.Method.FORWARD_GREEDY_NATIVE
+        beam = common.Method.BEAM_NATIVE
+
+    else:
+        greedy = common.Method.GREEDY
+        forward_greedy = common.Method.FORWARD_GREEDY
+        beam = common.Method.BEAM
+
+    # configurations are ordered by expected calculation duration
+    return [
+        *(common.Configuration(method=greedy, item_order=item_order)
+          for item_order in common.ItemOrder),
+        *(common.Configuration(method=greedy,
+                               item_order=common.ItemOrder.AREA,
+                               seed=seed)
+          for seed in range(1, 4)),
+        *(common.Configuration(method=beam, item_order=item_order)
+          for item_order in (common.ItemOrder.AREA,
+                             common.ItemOrder.MAX_SIDE)),
+        *(common.Configuration(method=forward_greedy, item_order=item_order)
+          for item_order in (common.ItemOrder.AREA,
+                             common.ItemOrder.MAX_SIDE,
+                             common.ItemOrder.PERIMETER))]
+
+
 _fitness_K = 0.03
 
+_native_methods = {common.Method.GREEDY_NATIVE,
+                   common.Method.FORWARD_GREEDY_NATIVE,
+                   common.Method.BEAM_NATIVE}
+
+# interval of polling cancel flag while waiting for portfolio processes
+_portfolio_poll_interval = 0.1
+
+# compare incremental fitness with full recalculation (debugging only)
+_check_fitness = False
+
+
+def _calculate_many_job(params, **kwargs):
+    try:
+        return calculate(params=params, **kwargs)
+
+    except Exception as e:
+        return e
+
+
+class _Context(typing.NamedTuple):
+    params: common.Params
+    items: list[common.Item]
+    total_area: float
+    panels: list[common.Panel]
+    panel_offsets: dict[str, int]
+    unused_order: list[int]
+    counters: '_Counters'
+    cancel: common.CancelFlag | None
+
+
+class _PanelState(typing.NamedTuple):
+    used_area: float
+    min_used_area: float
+    max_unused_area: float
+    next_max_unused_area: float
+    fitness: float
+
+
+class _State(typing.NamedTuple):
+    context: _Context
+    used: tuple | None
+    unused: tuple[tuple[common.Unused, ...], ...]
+    cuts: tuple | None
+    placed: int
+    panels: tuple[_PanelState, ...]
+    fitness: float
+    unused_initial_count: int
+
+
+class _Candidate(typing.NamedTuple):
+    state: _State
+    panel: int
+    unused_index: int
+    used: common.Used
+    unused: list[common.Unused]
+    cut: common.Cut
+
+
+class _TimeoutError(Exception):
+    pass
+
+
+class _Counters:
+
+    def __init__(self):
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.pruned_candidates = 0
+        self.generated_candidates = 0
+        self.fitness_evaluations = 0
+        self.rollouts = 0
+        self.peak_unused = 0
+        self._start_time = time.perf_counter()
+
+    def get_stats(self):
+        return common.Stats(cache_hits=self.cache_hits,
+                            cache_misses=self.cache_misses,
+                            pruned_candidates=self.pruned_candidates,
+                            generated_candidates=self.generated_candidates,
+                            fitness_evaluations=self.fitness_evaluations,
+                            rollouts=self.rollouts,
+                            peak_unused=self.peak_unused,
+                            solve_time=time.perf_counter() - self._start_time)
+
+
+class _Progress:
+
+    def __init__(self, progress_cb):
+        self._progress_cb = progress_cb
+        self._placed = 0
+        self._evaluated = 0
+
+    def update(self, placed, evaluated, fitness):
+        self._placed += placed
+        self._evaluated += evaluated
+        if self._progress_cb:
+            self._progress_cb(self._placed, self._evaluated, fitness)
+
+
+class _PortfolioProgress:
+
+    def __init__(self, progress_cb, configurations_count):
+        self._progress_cb = progress_cb
+        self._lock = threading.Lock()
+        self._placed = [0] * configurations_count
+        self._evaluated = [0] * configurations_count
+
+    def get_progress_cb(self, index):
+        if not self._progress_cb:
+            return
+
+        return functools.partial(self._update, index)
+
+    def _update(self, index, placed, evaluated, fitness):
+        # reported placed count is count of most advanced configuration
+        with self._lock:
+            self._placed[index] = placed
+            self._evaluated[index] = evaluated
+            self._progress_cb(max(self._placed), sum(self._evaluated),
+                              fitness)
+
+
+class _RolloutCache:
+
+    def __init__(self, size, counters):
+        self._size = size
+        self._counters = counters
+        self._data = collections.OrderedDict()
+
+    def get(self, key):
+        if not self._size:
+            return False, None
+
+        if key not in self._data:
+            self._counters.cache_misses += 1
+            return False, None
+
+        self._counters.cache_hits += 1
+        self._data.move_to_end(key)
+        return True, self._data[key]
+
+    def put(self, key, value):
+        if not self._size:
+            return
+
+        self._data[key] = value
+        if len(self._data) > self._size:
+            self._data.popitem(last=False)
+
+
+def _create_initial_state(params, cancel=None, item_order=None, seed=None):
+    # items are placed in order of decreasing item order value (by default
+    # larger dimension - item with quantity is repeated by reference) and
+    # panel states are kept for each panel instance - only first unused
+    # panel instance of each panel is available as unused (next instance is
+    # added once it is cut) - unused are grouped by panel instance so that
+    # applying candidate copies only unused of single panel instance
+    items = list(params.items)
+    if seed is not None:
+        random.Random(seed).shuffle(items)
+    items.sort(key=functools.partial(
+                   common.get_item_order_value,
+                   item_order=item_order or common.ItemOrder.MAX_SIDE),
+               reverse=True)
+    items = [item for item in items for _ in range(item.quantity)]
+    panels = [panel
+              for panel in params.panels
+              for _ in range(panel.quantity)]
+    panel_offsets = {}
+    offset = 0
+    for panel in params.panels:
+        panel_offsets[panel.id] = offset
+        offset += panel.quantity
+    # unused are iterated in order of panels and in reverse order of panel
+    # instances (next instance precedes unused of cut instance)
+    unused_order = [panel_offsets[panel.id] + i
+                    for panel in params.panels
+                    for i in reversed(range(panel.quantity))]
+    context = _Context(params=params,
+                       items=items,
+                       total_area=sum(panel.width * panel.height
+                                      for panel in panels),
+                       panels=panels,
+                       panel_offsets=panel_offsets,
+                       unused_order=unused_order,
+                       counters=_Counters(),
+                       cancel=cancel)
+    panel_states = tuple(
+        _create_panel_state(context, panel, 0, 0, panel.width * panel.height,
+                            0)
+        for panel in panels)
+    unused = [() for _ in panels]
+    for panel in params.panels:
+        if panel.quantity:
+            unused[panel_offsets[panel.id]] = (
+                _create_initial_unused(panel, 0), )
+    return _State(context=context,
+                  used=None,
+                  unused=tuple(unused),
+                  cuts=None,
+                  placed=0,
+                  panels=panel_states,
+                  fitness=sum(panel.fitness for panel in panel_states),
+                  unused_initial_count=len(panels))
+
+
+def _calculate_portfolio(params, timeout, threads, beam_width, cache_size,
+                         cancel, progress_cb):
+    deadline = time.monotonic() + timeout if timeout else None
+    configurations = get_portfolio_configurations()
+    progress = _PortfolioProgress(progress_cb, len(configurations))
+    context = _create_initial_state(params).context
+
+    # daemon processes (e.g. `calculate_many` processes) can not create
+    # child processes
+    if (threads > 1 and
+            any(configuration.method not in _native_methods
+                for configuration in configurations) and
+            not multiprocessing.current_process().daemon):
+        results = _calculate_portfolio_processes(
+            params, deadline, threads, beam_width, cache_size, cancel,
+            progress, context, configurations)
+
+    else:
+        with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+            results = list(executor.map(
+                lambda index, configuration: _calculate_configuration(
+                    index, configuration, params, deadline, beam_width,
+                    cache_size, cancel, progress.get_progress_cb(index)),
+                itertools.count(), configurations))
+
+    resolved = [result for result, _ in results if result]
+    if not resolved:
+        raise common.UnresolvableError()
+
+    # first configuration is preferred between results with same fitness
+    result = min(resolved, key=lambda result: _fitness(
+        context, common.result_to_table(result)))
+    return result._replace(final=all(final for _, final in results))
+
+
+def _calculate_portfolio_processes(params, deadline, threads, beam_width,
+                                   cache_size, cancel, progress, context,
+                                   configurations):
+    # cancel flag and progress callback can not be passed to processes -
+    # cancel flag is polled while waiting for results and progress is
+    # reported once configuration is calculated
+    results = []
+
+    with multiprocessing.Pool(min(threads, len(configurations))) as pool:
+        async_results = [
+            pool.apply_async(_calculate_configuration,
+                             (index, configuration, params, deadline,
+                              beam_width, cache_size))
+            for index, configuration in enumerate(configurations)]
+
+        for index, async_result in enumerate(async_results):
+            while True:
+                if cancel and cancel.is_set():
+                    raise common.CancelledError()
 
-def _create_initial_result(params):
-    return common.Result(params=params,
-                         used=[],
-                         unused=[common.Unused(panel=panel,
-                                               width=panel.width,
-                                               height=panel.height,
-                                               x=0,
-                                               y=0)
-                                 for panel in params.panels],
-                         cuts=[])
+                try:
+                    result, final = async_result.get(
+                        _portfolio_poll_interval)
+                    break
 
+                except multiprocessing.TimeoutError:
+                    pass
 
-def _calculate_greedy(result):
-    while not _is_done(result):
-        new_result = None
+            progress_cb = progress.get_progress_cb(index)
+            if progress_cb and result:
+                progress_cb(len(result.used),
+                            result.stats.fitness_evaluations,
+                            _fitness_value(_fitness(
+                                context, common.result_to_table(result))))
+
+            results.append((result, final))
+
+    return results
+
+
+def _calculate_configuration(index, configuration, params, deadline,
+                             beam_width, cache_size, cancel=None,
+                             progress_cb=None):
+    timeout = None
+    if deadline is not None:
+        timeout = deadline - time.monotonic()
+
+        # first configuration is always calculated so that result is
+        # unresolvable only if it is reported by configuration
+        if timeout <= 0:
+            if index:
+                return None, False
+
+            timeout = None
+
+    try:
+        result = calculate(method=configuration.method,
+                           params=params,
+                           timeout=timeout,
+                           threads=1,
+                           beam_width=beam_width,
+                           cache_size=cache_size,
+                           cancel=cancel,
+                           progress_cb=progress_cb,
+                           item_order=configuration.item_order,
+                           seed=configuration.seed)
+
+    except common.UnresolvableError:
+        return None, True
+
+    return result._replace(configuration=configuration), result.final
+
+
+def _create_initial_unused(panel, panel_index):
+    return common.Unused(panel=panel,
+                         width=panel.width,
+                         height=panel.height,
+                         x=0,
+                         y=0,
+                         panel_index=panel_index)
+
+
+def _create_result(state, final=True):
+    # result is converted to table so that it does not reference used and
+    # unused of intermediate states
+    return common.result_from_table(common.result_to_table(
+        common.Result(params=state.context.params,
+                      used=_cons_to_list(state.used),
+                      unused=[unused for _, _, unused in _iter_unused(state)],
+                      cuts=_cons_to_list(state.cuts),
+                      final=final,
+                      stats=state.context.counters.get_stats())))
+
+
+def _iter_unused(state):
+    for panel in state.context.unused_order:
+        for i, unused in enumerate(state.unused[panel]):
+            yield panel, i, unused
+
+
+def _cons_to_list(cons):
+    ret = []
+    while cons:
+        value, cons = cons
+        ret.append(value)
+    ret.reverse()
+    return ret
+
+
+def _calculate_greedy(state, deadline=None, progress=None):
+    while not _is_done(state):
+        new_candidate = None
         new_fitness = None
-        for next_result in _get_next_results(result):
-            next_result_fitness = _fitness(next_result)
-            if new_fitness is None or next_result_fitness < new_fitness:
-                new_result = next_result
-                new_fitness = next_result_fitness
-        if not new_result:
+        candidates_count = 0
+        for candidate in _get_candidates(state):
+            _check_cancel(state.context)
+            if deadline is not None and time.monotonic() > deadline:
+                raise _TimeoutError()
+            candidate_fitness = _candidate_fitness(candidate)
+            candidates_count += 1
+            if new_fitness is None or candidate_fitness < new_fitness:
+                new_candidate = candidate
+                new_fitness = candidate_fitness
+        if not new_candidate:
             raise common.UnresolvableError()
-        result = new_result
-    return result
+        state = _apply_candidate(new_candidate)
+        if progress:
+            progress.update(1, candidates_count, state.fitness)
+    return state
 
 
-def _calculate_forward_greedy(result):
-    while not _is_done(result):
-        new_result = None
+def _calculate_forward_greedy(state, cache, progress, deadline=None):
+    while not _is_done(state):
+        _check_cancel(state.context)
+        new_state = None
         new_fitness = None
-        for next_result in _get_next_results(result):
-            try:
-                next_result_fitness = _fitness(_calculate_greedy(next_result))
-            except common.UnresolvableError:
+        rollouts_count = 0
+        for candidate in _get_candidates(state):
+            next_state = _apply_candidate(candidate)
+            key = _get_state_key(next_state)
+            found, next_state_fitness = cache.get(key)
+            if not found:
+                rollouts_count += 1
+                state.context.counters.rollouts += 1
+                try:
+                    next_state_fitness = _state_fitness(
+                        _calculate_greedy(next_state, deadline))
+                except common.UnresolvableError:
+                    next_state_fitness = None
+                except _TimeoutError:
+                    if new_state:
+                        progress.update(1, rollouts_count,
+                                        _fitness_value(new_fitness))
+                    state = _calculate_greedy(new_state or state,
+                                              progress=progress)
+                    return _create_result(state, final=False)
+                cache.put(key, next_state_fitness)
+            if next_state_fitness is None:
                 continue
-            if new_fitness is None or next_result_fitness < new_fitness:
-                new_result = next_result
-                new_fitness = next_result_fitness
-        if not new_result:
+            if new_fitness is None or next_state_fitness < new_fitness:
+                new_state = next_state
+                new_fitness = next_state_fitness
+        if not new_state:
             raise common.UnresolvableError()
-        result = new_result
-    return result
+        state = new_state
+        progress.update(1, rollouts_count, _fitness_value(new_fitness))
+    return _create_result(state)
 
 
-def _get_next_results(result):
-    selected_item = None
-    used_items = {used.item.id for used in result.used}
-    for item in result.params.items:
-        if item.id in used_items:
-            continue
-        if (not selected_item or
-                max(item.width, item.height) >
-                max(selected_item.width, selected_item.height)):
-            selected_item = item
-    if not selected_item:
-        raise Exception('result is done')
-    return _get_next_results_for_item(result, selected_item)
+def _calculate_beam(state, beam_width, progress, deadline=None):
+    states = [state]
+    while not _is_done(states[0]):
+        _check_cancel(states[0].context)
+        if deadline is not None and time.monotonic() > deadline:
+            return _create_result(
+                _calculate_greedy(states[0], progress=progress),
+                final=False)
+        candidates = [candidate
+                      for state in states
+                      for candidate in _get_candidates(state)]
+        if not candidates:
+            raise common.UnresolvableError()
+        fitnesses = [_candidate_fitness(candidate)
+                     for candidate in candidates]
+        indexes = sorted(range(len(candidates)), key=fitnesses.__getitem__)
+        states = [_apply_candidate(candidates[i])
+                  for i in indexes[:beam_width]]
+        progress.update(1, len(candidates), states[0].fitness)
+    return _create_result(states[0])
 
 
-def _get_next_results_for_item(result, item):
-    ret = []
-    loop_iter = ((False, i, unused) for i, unused in enumerate(result.unused))
-    if item.can_rotate:
-        loop_iter = itertools.chain(
-            loop_iter,
-            ((True, i, unused) for i, unused in enumerate(result.unused)))
-    for rotate, i, unused in loop_iter:
+def _check_cancel(context):
+    if context.cancel and context.cancel.is_set():
+        raise common.CancelledError()
+
+
+def _get_state_key(state):
+    # panels are identified only by their dimensions and unused only by
+    # their dimensions
+    panels = (
+        (panel.width, panel.height, panel_state.used_area,
+         panel_state.min_used_area,
+         tuple(sorted((unused.width, unused.height)
+                      for unused in panel_unused)))
+        for panel, panel_state, panel_unused in zip(state.context.panels,
+                                                    state.panels,
+                                                    state.unused))
+
+    return state.placed, tuple(sorted(panels))
+
+
+def _is_done(state):
+    return state.placed == len(state.context.items)
+
+
+def _get_candidates(state):
+    if _is_done(state):
+        raise Exception('result is done')
+    # candidates equivalent to already generated candidates (rotated square
+    # item, unused with same dimensions on panel with same dimensions and
+    # state, cut resulting in same unused dimensions) are pruned
+    context = state.context
+    item = context.items[state.placed]
+    cut_width = context.params.cut_width
+    context.counters.peak_unused = max(context.counters.peak_unused,
+                                       sum(map(len, state.unused)))
+    rotations = [False, True] if item.can_rotate else [False]
+    unused_keys = set()
+    for rotate, (panel_state_index, i, unused) in itertools.product(
+            rotations, _iter_unused(state)):
+        if rotate and item.width == item.height:
+            context.counters.pruned_candidates += _count_fits(item, unused,
+                                                              rotate)
+            continue
+        panel = unused.panel
+        unused_key = (rotate, panel.width, panel.height,
+                      state.panels[panel_state_index],
+                      unused.width, unused.height)
+        if unused_key in unused_keys:
+            context.counters.pruned_candidates += _count_fits(item, unused,
+                                                              rotate)
+            continue
+        unused_keys.add(unused_key)
+        unused_dims = None
         for vertical in [True, False]:
             new_used, new_unused = _cut_item_from_unused(
-                unused, item, rotate, result.params.cut_width, vertical)
+                unused, item, rotate, cut_width, vertical)
             if not new_used:
                 continue
+            new_unused_dims = [(i.width, i.height) for i in new_unused]
+            if new_unused_dims == unused_dims:
+                context.counters.pruned_candidates += 1
+                continue
+            unused_dims = new_unused_dims
+            context.counters.generated_candidates += 1
             cut = common.Cut.VERTICAL if vertical else common.Cut.HORIZONTAL
-            ret.append(result._replace(
-                used=result.used + [new_used],
-                unused=result.unused[:i] + new_unused + result.unused[i+1:],
-                cuts=result.cuts + [cut]))
-    return ret
+            yield _Candidate(state=state,
+                             panel=panel_state_index,
+                             unused_index=i,
+                             used=new_used,
+                             unused=new_unused,
+                             cut=cut)
+
+
+def _count_fits(item, unused, rotate):
+    item_width = item.width if not rotate else item.height
+    item_height = item.height if not rotate else item.width
+    if unused.height < item_height or unused.width < item_width:
+        return 0
+    return 2
+
+
+def _apply_candidate(candidate):
+    state = candidate.state
+    panel_index = candidate.panel
+    index = candidate.unused_index
+    panel_unused = state.unused[panel_index]
+    removed = panel_unused[index]
+    panel = removed.panel
+    panel_state = state.panels[panel_index]
+    panel_unused = (*panel_unused[:index], *candidate.unused,
+                    *panel_unused[index+1:])
+
+    used_area, min_used_area = _add_used_area(
+        panel_state, candidate.used.item.width * candidate.used.item.height)
+    max_unused_area, next_max_unused_area = 0, 0
+    for i in panel_unused:
+        max_unused_area, next_max_unused_area = _add_unused_area(
+            max_unused_area, next_max_unused_area, i.width * i.height)
+    new_panel_state = _create_panel_state(
+        state.context, panel, used_area, min_used_area, max_unused_area,
+        next_max_unused_area)
+
+    panels = list(state.panels)
+    panels[panel_index] = new_panel_state
+
+    # only unused of affected panel instance are copied - unused of other
+    # panel instances are shared with previous state
+    unused = list(state.unused)
+    unused[panel_index] = panel_unused
+
+    if (_is_unused_initial(removed) and
+            removed.panel_index + 1 < panel.quantity):
+        unused[panel_index + 1] = (
+            _create_initial_unused(panel, removed.panel_index + 1), )
+
+    return state._replace(
+        used=(candidate.used, state.used),
+        unused=tuple(unused),
+        cuts=(candidate.cut, state.cuts),
+        placed=state.placed + 1,
+        panels=tuple(panels),
+        fitness=state.fitness - panel_state.fitness + new_panel_state.fitness,
+        unused_initial_count=(state.unused_initial_count -
+                              _is_unused_initial(removed)))
 
 
 def _cut_item_from_unused(unused, item, rotate, cut_width, vertical):
@@ -115,7 +745,8 @@ def _cut_item_from_unused(unused, item, rotate, cut_width, vertical):
                        item=item,
                        x=unused.x,
                        y=unused.y,
-                       rotate=rotate)
+                       rotate=rotate,
+                       panel_index=unused.panel_index)
     new_unused = []
     width = unused.width - item_width - cut_width
     height = unused.height if vertical else item_height
@@ -124,7 +755,8 @@ def _cut_item_from_unused(unused, item, rotate, cut_width, vertical):
                                         width=width,
                                         height=height,
                                         x=unused.x + item_width + cut_width,
-                                        y=unused.y))
+                                        y=unused.y,
+                                        panel_index=unused.panel_index))
     width = item_width if vertical else unused.width
     height = unused.height - item_height - cut_width
     if height > 0:
@@ -132,35 +764,150 @@ def _cut_item_from_unused(unused, item, rotate, cut_width, vertical):
                                         width=width,
                                         height=height,
                                         x=unused.x,
-                                        y=unused.y + item_height + cut_width))
+                                        y=unused.y + item_height + cut_width,
+                                        panel_index=unused.panel_index))
     return used, new_unused
 
 
-def _is_done(result):
-    return len(result.params.items) == len(result.used)
+def _state_fitness(state):
+    if _check_fitness:
+        _check_state_fitness(state, state.fitness, state.unused_initial_count)
+
+    if not state.context.params.min_initial_usage:
+        return state.fitness
+
+    return (-state.unused_initial_count, state.fitness)
+
+
+def _fitness_value(fitness):
+    return fitness[1] if isinstance(fitness, tuple) else fitness
+
+
+def _candidate_fitness(candidate):
+    state = candidate.state
+    state.context.counters.fitness_evaluations += 1
+    removed = state.unused[candidate.panel][candidate.unused_index]
+    panel = removed.panel
+    panel_state = state.panels[candidate.panel]
+
+    used_area, min_used_area = _add_used_area(
+        panel_state, candidate.used.item.width * candidate.used.item.height)
+    if removed.width * removed.height >= panel_state.max_unused_area:
+        max_unused_area = panel_state.next_max_unused_area
+    else:
+        max_unused_area = panel_state.max_unused_area
+    for i in candidate.unused:
+        max_unused_area = max(max_unused_area, i.width * i.height)
+
+    panel_fitness = _calculate_panel_fitness(
+        state.context, panel, used_area, min_used_area, max_unused_area)
+    fitness = state.fitness - panel_state.fitness + panel_fitness
+    unused_initial_count = (state.unused_initial_count -
+                            _is_unused_initial(removed))
+
+    if _check_fitness:
+        _check_state_fitness(_apply_candidate(candidate), fitness,
+                             unused_initial_count)
+
+    if not state.context.params.min_initial_usage:
+        return fitness
+
+    return (-unused_initial_count, fitness)
+
+
+def _create_panel_state(context, panel, used_area, min_used_area,
+                        max_unused_area, next_max_unused_area):
+    return _PanelState(
+        used_area=used_area,
+        min_used_area=min_used_area,
+        max_unused_area=max_unused_area,
+        next_max_unused_area=next_max_unused_area,
+        fitness=_calculate_panel_fitness(context, panel, used_area,
+                                         min_used_area, max_unused_area))
+
+
+def _calculate_panel_fitness(context, panel, used_area, min_used_area,
+                             max_unused_area):
+    total_area = context.total_area
+    return ((panel.width * panel.height - used_area) / total_area -
+            _fitness_K * min_used_area * max_unused_area /
+            (total_area * total_area))
+
+
+def _add_used_area(panel_state, area):
+    used_area = panel_state.used_area + area
+    if panel_state.min_used_area == 0 or area < panel_state.min_used_area:
+        return used_area, area
+    return used_area, panel_state.min_used_area
+
+
+def _add_unused_area(max_unused_area, next_max_unused_area, area):
+    if area > max_unused_area:
+        return area, max_unused_area
+    if area > next_max_unused_area:
+        return max_unused_area, area
+    return max_unused_area, next_max_unused_area
+
+
+def _check_state_fitness(state, fitness, unused_initial_count):
+    expected = _fitness(state.context, common.result_to_table(
+        _create_result(state)))
+    if not state.context.params.min_initial_usage:
+        expected = (-unused_initial_count, expected)
+
+    if (expected[0] != -unused_initial_count or
+            not math.isclose(expected[1], fitness, abs_tol=1e-9)):
+        raise Exception(f'fitness mismatch: expected {expected}, '
+                        f'got {(-unused_initial_count, fitness)}')
+
+
+def _fitness(context, table):
+    params = context.params
+    total_area = context.total_area
+    panel_offsets = [context.panel_offsets[panel.id]
+                     for panel in params.panels]
+
+    used_areas = [[] for _ in context.panels]
+    for panel, panel_index, item in zip(table.used.panels,
+                                        table.used.panel_indexes,
+                                        table.used.items):
+        item = params.items[item]
+        used_areas[panel_offsets[panel] + panel_index].append(
+            item.width * item.height)
 
+    max_unused_areas = [0 for _ in context.panels]
+    unused_counts = [0 for _ in context.panels]
+    unused_initial_count = 0
+    for panel, panel_index, width, height, x, y in zip(
+            table.unused.panels, table.unused.panel_indexes,
+            table.unused.width, table.unused.height, table.unused.x,
+            table.unused.y):
+        index = panel_offsets[panel] + panel_index
+        area = width * height
+        if area > max_unused_areas[index]:
+            max_unused_areas[index] = area
+        unused_counts[index] += 1
+        panel = params.panels[panel]
+        if (x == 0 and y == 0 and
+                width == panel.width and height == panel.height):
+            unused_initial_count += 1
 
-def _fitness(result):
-    total_area = sum(panel.width * panel.height
-                     for panel in result.params.panels)
     fitness = 0
-    for panel in result.params.panels:
-        used_areas = [used.item.width * used.item.height
-                      for used in result.used
-                      if used.panel == panel]
-        unused_areas = [unused.width * unused.height
-                        for unused in result.unused
-                        if unused.panel == panel]
-        fitness += (panel.width * panel.height - sum(used_areas)) / total_area
+    for index, panel in enumerate(context.panels):
+        panel_used_areas = used_areas[index]
+        if not panel_used_areas and not unused_counts[index]:
+            # panel instance which is not yet available as unused
+            unused_initial_count += 1
+        fitness += ((panel.width * panel.height - sum(panel_used_areas)) /
+                    total_area)
         fitness -= (_fitness_K *
-                    min(used_areas, default=0) * max(unused_areas, default=0) /
+                    min(panel_used_areas, default=0) *
+                    max_unused_areas[index] /
                     (total_area * total_area))
 
-    if not result.params.min_initial_usage:
+    if not params.min_initial_usage:
         return fitness
 
-    unused_initial_count = sum(1 for unused in result.unused
-                               if _is_unused_initial(unused))
     return (-unused_initial_count, fitness)
 
 
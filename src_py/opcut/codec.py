@@ -0,0 +1,510 @@
+"""Params and result encoding
+
+JSON data is encoded with `orjson` if it is installed (standard library
+implementation is used otherwise). YAML and TOML formats are encoded with
+`hat.json`.
+
+Binary format is compact columnar layout (all values are little-endian)::
+
+    header        magic ``OPCUT``, version (u8), kind (u8 - 0 params,
+                  1 result)
+    params        min_initial_usage (u8), number of panels (u32), number
+                  of items (u32), cut_width, identifiers, panel width,
+                  height and quantity columns, item width, height,
+                  quantity and can_rotate columns
+    result        flags (u8 - 1 final, 2 cuts), number of used (u32),
+                  number of unused (u32), used panel, panel_index, item,
+                  x, y and rotate columns, unused panel, panel_index,
+                  width, height, x and y columns, cuts column (only if
+                  cuts flag is set), extra (JSON object with
+                  configuration and stats)
+
+Each column is prefixed with its array type code. Smallest type which
+exactly represents all column values is used (``B``, ``H`` or ``I`` for
+unsigned integers, ``i`` or ``q`` for signed integers and ``f`` or ``d``
+for floats). Columns containing only integers are decoded as integers
+and columns containing any float are decoded as floats. Encoding integers
+which can not be represented with ``q`` raises `ValueError`. Identifiers
+are encoded as column of UTF-8 byte lengths followed by concatenated UTF-8
+data. Panels and items referenced by used and unused are encoded as
+indexes. Result is not expanded (panels with quantity are referenced by
+index together with instance index). Decoded result columns are used as
+`common.ResultTable` columns without conversion.
+
+"""
+
+from pathlib import Path
+import array
+import enum
+import json as std_json
+import struct
+import sys
+
+from hat import json
+
+from opcut import common
+
+try:
+    import orjson
+
+except ImportError:
+    orjson = None
+
+
+class Format(enum.Enum):
+    JSON = 'json'
+    YAML = 'yaml'
+    TOML = 'toml'
+    BINARY = 'binary'
+
+
+json_content_type: str = 'application/json'
+
+binary_content_type: str = 'application/x-opcut'
+
+binary_suffix: str = '.opcut'
+
+
+def get_file_format(path: Path) -> Format:
+    """Detect file format based on path suffix"""
+    if path.suffix == binary_suffix:
+        return Format.BINARY
+
+    return Format(json.get_file_format(path).value)
+
+
+def encode_json(data: json.Data,
+                indent: bool = False
+                ) -> bytes:
+    """Encode JSON data
+
+    If `indent` is set, data is indented with two spaces.
+
+    """
+    if orjson:
+        return orjson.dumps(data, option=(orjson.OPT_INDENT_2 if indent
+                                          else 0))
+
+    return std_json.dumps(data,
+                          indent=(2 if indent else None),
+                          separators=(None if indent else (',', ':')),
+                          allow_nan=False).encode('utf-8')
+
+
+def decode_json(data: bytes | str) -> json.Data:
+    """Decode JSON data"""
+    if orjson:
+        return orjson.loads(data)
+
+    return std_json.loads(data)
+
+
+def encode(data: json.Data,
+           format: Format
+           ) -> bytes:
+    """Encode json serializable data with JSON, YAML or TOML format
+
+    JSON data is indented.
+
+    """
+    if format == Format.JSON:
+        return encode_json(data, indent=True)
+
+    if format == Format.BINARY:
+        raise ValueError('binary format supports only params and result')
+
+    return json.encode(data, json.Format(format.value),
+                       indent=4).encode('utf-8')
+
+
+def decode(data: bytes,
+           format: Format
+           ) -> json.Data:
+    """Decode json serializable data encoded with JSON, YAML or TOML
+    format"""
+    if format == Format.JSON:
+        return decode_json(data)
+
+    if format == Format.BINARY:
+        raise ValueError('binary format supports only params and result')
+
+    return json.decode(data.decode('utf-8'), json.Format(format.value))
+
+
+def encode_params(params: common.Params,
+                  format: Format
+                  ) -> bytes:
+    """Encode params"""
+    if format != Format.BINARY:
+        return encode(common.params_to_json(params), format)
+
+    chunks = [_header.pack(_magic, _version, _Kind.PARAMS.value)]
+    _write_params(chunks, params)
+    return b''.join(chunks)
+
+
+def decode_params(data: bytes,
+                  format: Format
+                  ) -> common.Params:
+    """Decode and validate params"""
+    if format != Format.BINARY:
+        params_json = decode(data, format)
+        common.validate_params(params_json)
+        return common.params_from_json(params_json)
+
+    reader = _Reader(data)
+    _read_header(reader, _Kind.PARAMS)
+    params = _read_params(reader)
+    reader.read_end()
+    return params
+
+
+def encode_result(result: common.Result,
+                  format: Format,
+                  include_stats: bool = False
+                  ) -> bytes:
+    """Encode result
+
+    Calculation statistics are included only if `include_stats` is set.
+
+    """
+    if format != Format.BINARY:
+        return encode(common.result_to_json(result, include_stats), format)
+
+    chunks = [_header.pack(_magic, _version, _Kind.RESULT.value)]
+    _write_params(chunks, result.params)
+    _write_result(chunks, result, include_stats)
+    return b''.join(chunks)
+
+
+def decode_result(data: bytes,
+                  format: Format
+                  ) -> common.Result:
+    """Decode and validate result"""
+    if format != Format.BINARY:
+        result_json = decode(data, format)
+        common.validate_result(result_json)
+        return common.result_from_json(result_json)
+
+    reader = _Reader(data)
+    _read_header(reader, _Kind.RESULT)
+    params = _read_params(reader)
+    result = _read_result(reader, params)
+    reader.read_end()
+    return result
+
+
+class _Kind(enum.Enum):
+    PARAMS = 0
+    RESULT = 1
+
+
+_magic = b'OPCUT'
+
+_version = 1
+
+_header = struct.Struct('<5sBB')
+
+_params_header = struct.Struct('<BII')
+
+_result_header = struct.Struct('<BII')
+
+_count = struct.Struct('<I')
+
+_final_flag = 1
+
+_cuts_flag = 2
+
+_bool_typecodes = 'B'
+
+_index_typecodes = 'BHI'
+
+_int_typecodes = 'iq'
+
+_float_typecodes = 'fd'
+
+_cuts = list(common.Cut)
+
+_cut_indexes = {cut: i for i, cut in enumerate(_cuts)}
+
+
+class _Reader:
+
+    def __init__(self, data):
+        self._data = memoryview(data)
+        self._offset = 0
+
+    def read(self, size):
+        if self._offset + size > len(self._data):
+            raise ValueError('unexpected end of data')
+
+        data = self._data[self._offset:self._offset + size]
+        self._offset += size
+        return data
+
+    def read_struct(self, s):
+        return s.unpack(self.read(s.size))
+
+    def read_column(self, length, typecodes):
+        typecode = chr(self.read(1)[0])
+        if typecode not in typecodes:
+            raise ValueError('invalid column type')
+
+        column = array.array(typecode)
+        column.frombytes(self.read(column.itemsize * length))
+        if sys.byteorder == 'big':
+            column.byteswap()
+
+        return column
+
+    def read_numbers(self, length):
+        return self.read_column(length, _int_typecodes + _float_typecodes)
+
+    def read_end(self):
+        if self._offset != len(self._data):
+            raise ValueError('unexpected data after end')
+
+
+def _write_column(chunks, values, typecodes):
+    # last type code is used if values can not be exactly represented by
+    # smaller types
+    values = list(values)
+    for typecode in typecodes:
+        try:
+            column = array.array(typecode, values)
+
+        except OverflowError:
+            continue
+
+        if typecode == typecodes[-1] or column.tolist() == values:
+            break
+
+    else:
+        raise ValueError('unsupported column values')
+
+    if sys.byteorder == 'big':
+        column.byteswap()
+
+    chunks.append(typecode.encode('ascii'))
+    chunks.append(column.tobytes())
+
+
+def _write_numbers(chunks, values):
+    typecodes = (_int_typecodes if all(type(i) is int for i in values)
+                 else _float_typecodes)
+    _write_column(chunks, values, typecodes)
+
+
+def _write_ids(chunks, ids):
+    encoded = [i.encode('utf-8') for i in ids]
+    _write_column(chunks, [len(i) for i in encoded], _index_typecodes)
+    chunks.append(b''.join(encoded))
+
+
+def _read_header(reader, kind):
+    magic, version, kind_value = reader.read_struct(_header)
+    if magic != _magic:
+        raise ValueError('invalid binary data')
+
+    if version != _version:
+        raise ValueError('unsupported binary format version')
+
+    if kind_value != kind.value:
+        raise ValueError(f'binary data does not contain {kind.name.lower()}')
+
+
+def _read_ids(reader, length):
+    lengths = reader.read_column(length, _index_typecodes)
+    data = reader.read(sum(lengths))
+
+    ids = []
+    offset = 0
+    for i in lengths:
+        ids.append(str(data[offset:offset + i], 'utf-8'))
+        offset += i
+
+    return ids
+
+
+def _write_params(chunks, params):
+    panels = params.panels
+    items = params.items
+
+    chunks.append(_params_header.pack(params.min_initial_usage,
+                                      len(panels),
+                                      len(items)))
+    _write_numbers(chunks, [params.cut_width])
+    _write_ids(chunks, [panel.id for panel in panels])
+    _write_ids(chunks, [item.id for item in items])
+
+    _write_numbers(chunks, [panel.width for panel in panels])
+    _write_numbers(chunks, [panel.height for panel in panels])
+    _write_column(chunks, [panel.quantity for panel in panels],
+                  _index_typecodes)
+
+    _write_numbers(chunks, [item.width for item in items])
+    _write_numbers(chunks, [item.height for item in items])
+    _write_column(chunks, [item.quantity for item in items],
+                  _index_typecodes)
+    _write_column(chunks, [item.can_rotate for item in items],
+                  _bool_typecodes)
+
+
+def _read_params(reader):
+    min_initial_usage, panels_len, items_len = \
+        reader.read_struct(_params_header)
+    cut_width, = reader.read_numbers(1)
+
+    panel_ids = _read_ids(reader, panels_len)
+    item_ids = _read_ids(reader, items_len)
+
+    panel_widths = reader.read_numbers(panels_len)
+    panel_heights = reader.read_numbers(panels_len)
+    panel_quantities = reader.read_column(panels_len, _index_typecodes)
+
+    item_widths = reader.read_numbers(items_len)
+    item_heights = reader.read_numbers(items_len)
+    item_quantities = reader.read_column(items_len, _index_typecodes)
+    item_can_rotates = reader.read_column(items_len, _bool_typecodes)
+
+    if 0 in panel_quantities or 0 in item_quantities:
+        raise ValueError('invalid quantity')
+
+    params = common.Params(
+        cut_width=cut_width,
+        min_initial_usage=bool(min_initial_usage),
+        panels=list(map(common.Panel, panel_ids, panel_widths,
+                        panel_heights, panel_quantities)),
+        items=list(map(common.Item, item_ids, item_widths, item_heights,
+                       map(bool, item_can_rotates), item_quantities)))
+    common.validate_instance_ids(params)
+    return params
+
+
+def _write_result(chunks, result, include_stats):
+    table = common.result_to_table(result)
+    used = table.used
+    unused = table.unused
+
+    flags = ((_final_flag if result.final else 0) |
+             (_cuts_flag if result.cuts is not None else 0))
+    chunks.append(_result_header.pack(flags, len(used.x), len(unused.x)))
+
+    _write_column(chunks, used.panels, _index_typecodes)
+    _write_column(chunks, used.panel_indexes, _index_typecodes)
+    _write_column(chunks, used.items, _index_typecodes)
+    _write_numbers(chunks, used.x)
+    _write_numbers(chunks, used.y)
+    _write_column(chunks, used.rotate, _bool_typecodes)
+
+    _write_column(chunks, unused.panels, _index_typecodes)
+    _write_column(chunks, unused.panel_indexes, _index_typecodes)
+    _write_numbers(chunks, unused.width)
+    _write_numbers(chunks, unused.height)
+    _write_numbers(chunks, unused.x)
+    _write_numbers(chunks, unused.y)
+
+    if result.cuts is not None:
+        chunks.append(_count.pack(len(result.cuts)))
+        _write_column(chunks, [_cut_indexes[i] for i in result.cuts],
+                      _index_typecodes)
+
+    extra = _extra_to_json(result, include_stats)
+    extra_bytes = encode_json(extra) if extra else b''
+    chunks.append(_count.pack(len(extra_bytes)))
+    chunks.append(extra_bytes)
+
+
+def _read_result(reader, params):
+    flags, used_len, unused_len = reader.read_struct(_result_header)
+
+    used_panels = reader.read_column(used_len, _index_typecodes)
+    used_panel_indexes = reader.read_column(used_len, _index_typecodes)
+    used_items = reader.read_column(used_len, _index_typecodes)
+    used_xs = reader.read_numbers(used_len)
+    used_ys = reader.read_numbers(used_len)
+    used_rotates = reader.read_column(used_len, _bool_typecodes)
+
+    unused_panels = reader.read_column(unused_len, _index_typecodes)
+    unused_panel_indexes = reader.read_column(unused_len, _index_typecodes)
+    unused_widths = reader.read_numbers(unused_len)
+    unused_heights = reader.read_numbers(unused_len)
+    unused_xs = reader.read_numbers(unused_len)
+    unused_ys = reader.read_numbers(unused_len)
+
+    if flags & _cuts_flag:
+        cuts_len, = reader.read_struct(_count)
+        cut_indexes = reader.read_column(cuts_len, _index_typecodes)
+        if any(i >= len(_cuts) for i in cut_indexes):
+            raise ValueError('invalid cut')
+
+        cuts = [_cuts[i] for i in cut_indexes]
+
+    else:
+        cuts = None
+
+    extra_len, = reader.read_struct(_count)
+    extra = decode_json(reader.read(extra_len)) if extra_len else {}
+    extra_result = _extra_from_json(extra)
+
+    panels = params.panels
+
+    if any(panel >= len(panels) or panels[panel].quantity <= panel_index
+           for panel, panel_index in zip(used_panels, used_panel_indexes)):
+        raise ValueError('invalid used panel')
+
+    if any(item >= len(params.items) for item in used_items):
+        raise ValueError('invalid used item')
+
+    if any(panel >= len(panels) or panels[panel].quantity <= panel_index
+           for panel, panel_index in zip(unused_panels,
+                                         unused_panel_indexes)):
+        raise ValueError('invalid unused panel')
+
+    return common.result_from_table(common.ResultTable(
+        params=params,
+        used=common.UsedTable(panels=used_panels,
+                              panel_indexes=used_panel_indexes,
+                              items=used_items,
+                              x=used_xs,
+                              y=used_ys,
+                              rotate=used_rotates),
+        unused=common.UnusedTable(panels=unused_panels,
+                                  panel_indexes=unused_panel_indexes,
+                                  width=unused_widths,
+                                  height=unused_heights,
+                                  x=unused_xs,
+                                  y=unused_ys),
+        cuts=cuts,
+        final=bool(flags & _final_flag),
+        stats=extra_result.stats,
+        configuration=extra_result.configuration))
+
+
+# rarely used result fields (configuration and stats) are encoded as JSON
+# with common result conversion applied to result without rectangles
+
+_empty_params = common.Params(cut_width=0,
+                              min_initial_usage=False,
+                              panels=[],
+                              items=[])
+
+
+def _extra_to_json(result, include_stats):
+    data = common.result_to_json(
+        common.Result(params=_empty_params,
+                      used=[],
+                      unused=[],
+                      cuts=None,
+                      stats=result.stats,
+                      configuration=result.configuration),
+        include_stats)
+    return {k: v for k, v in data.items() if k in ('configuration', 'stats')}
+
+
+def _extra_from_json(data):
+    return common.result_from_json({
+        'params': common.params_to_json(_empty_params),
+        'used': [],
+        'unused': [],
+        **data})
@@ -1,5 +1,11 @@
+import array
+import collections
+import collections.abc
+import ctypes
 import enum
+import functools
 import importlib.resources
+import re
 import typing
 
 from hat import json
@@ -7,17 +13,45 @@ from hat import json
 
 mm: float = 72 / 25.4
 
-with importlib.resources.as_file(importlib.resources.files(__package__) /
-                                 'json_schema_repo.json') as _path:
-    json_schema_repo: json.SchemaRepository = json.merge_schema_repositories(
-        json.json_schema_repo,
-        json.decode_file(_path))
+params_schema_id: str = 'opcut://opcut.yaml#/$defs/params'
+
+result_schema_id: str = 'opcut://opcut.yaml#/$defs/result'
+
+
+@functools.cache
+def get_json_schema_repo() -> json.SchemaRepository:
+    """Get JSON schema repository
+
+    Repository is loaded on first call. It is also available as module
+    attribute `json_schema_repo`.
+
+    """
+    with importlib.resources.as_file(importlib.resources.files(__package__) /
+                                     'json_schema_repo.json') as path:
+        return json.merge_schema_repositories(json.json_schema_repo,
+                                              json.decode_file(path))
+
+
+@functools.cache
+def get_validator() -> json.SchemaValidator:
+    """Get JSON schema validator shared by all callers in process"""
+    return json.DefaultSchemaValidator(get_json_schema_repo())
+
+
+def __getattr__(name):
+    # schema repository is not loaded at import time - actions which do not
+    # validate data (e.g. worker processes) do not pay for its decoding
+    if name == 'json_schema_repo':
+        return get_json_schema_repo()
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class Panel(typing.NamedTuple):
     id: str
     width: float
     height: float
+    quantity: int = 1
 
 
 class Item(typing.NamedTuple):
@@ -25,6 +59,7 @@ class Item(typing.NamedTuple):
     width: float
     height: float
     can_rotate: bool
+    quantity: int = 1
 
 
 class Params(typing.NamedTuple):
@@ -40,6 +75,8 @@ class Used(typing.NamedTuple):
     x: float
     y: float
     rotate: bool
+    panel_index: int = 0
+    """panel instance index (``0 <= panel_index < panel.quantity``)"""
 
 
 class Unused(typing.NamedTuple):
@@ -48,6 +85,8 @@ class Unused(typing.NamedTuple):
     height: float
     x: float
     y: float
+    panel_index: int = 0
+    """panel instance index (``0 <= panel_index < panel.quantity``)"""
 
 
 class Cut(enum.Enum):
@@ -55,11 +94,72 @@ class Cut(enum.Enum):
     HORIZONTAL = 'horizontal'
 
 
+class Stats(typing.NamedTuple):
+    cache_hits: int = 0
+    cache_misses: int = 0
+    pruned_candidates: int = 0
+    generated_candidates: int = 0
+    fitness_evaluations: int = 0
+    rollouts: int = 0
+    """number of greedy completions of forward greedy candidates"""
+    pool_blocks: int = 0
+    """number of allocated native memory pool blocks"""
+    peak_unused: int = 0
+    """maximum number of unused in single state"""
+    encode_time: float = 0.0
+    """duration of native params encoding in seconds"""
+    solve_time: float = 0.0
+    """duration of calculation in seconds"""
+    decode_time: float = 0.0
+    """duration of native result decoding in seconds"""
+
+
 class Result(typing.NamedTuple):
     params: Params
-    used: list[Used]
-    unused: list[Unused]
+    used: collections.abc.Sequence[Used]
+    unused: collections.abc.Sequence[Unused]
     cuts: list[Cut] | None
+    final: bool = True
+    stats: Stats | None = None
+    configuration: typing.Optional['Configuration'] = None
+    """configuration which produced result (portfolio method only)"""
+
+
+class UsedTable(typing.NamedTuple):
+    panels: collections.abc.Sequence[int]
+    """indexes of `Params.panels`"""
+    panel_indexes: collections.abc.Sequence[int]
+    items: collections.abc.Sequence[int]
+    """indexes of `Params.items`"""
+    x: collections.abc.Sequence[float]
+    y: collections.abc.Sequence[float]
+    rotate: collections.abc.Sequence[bool]
+
+
+class UnusedTable(typing.NamedTuple):
+    panels: collections.abc.Sequence[int]
+    """indexes of `Params.panels`"""
+    panel_indexes: collections.abc.Sequence[int]
+    width: collections.abc.Sequence[float]
+    height: collections.abc.Sequence[float]
+    x: collections.abc.Sequence[float]
+    y: collections.abc.Sequence[float]
+
+
+class ResultTable(typing.NamedTuple):
+    """Columnar result representation
+
+    Used and unused are represented by parallel columns (usually
+    `array.array`) with panels and items referenced by index.
+
+    """
+    params: Params
+    used: UsedTable
+    unused: UnusedTable
+    cuts: list[Cut] | None
+    final: bool = True
+    stats: Stats | None = None
+    configuration: typing.Optional['Configuration'] = None
 
 
 class OutputSettings(typing.NamedTuple):
@@ -75,6 +175,25 @@ class Method(enum.Enum):
     FORWARD_GREEDY = 'forward_greedy'
     GREEDY_NATIVE = 'greedy_native'
     FORWARD_GREEDY_NATIVE = 'forward_greedy_native'
+    BEAM = 'beam'
+    BEAM_NATIVE = 'beam_native'
+    PORTFOLIO = 'portfolio'
+
+
+class ItemOrder(enum.Enum):
+    AREA = 'area'
+    MAX_SIDE = 'max_side'
+    PERIMETER = 'perimeter'
+    WIDTH = 'width'
+    HEIGHT = 'height'
+
+
+class Configuration(typing.NamedTuple):
+    method: Method
+    item_order: ItemOrder | None = None
+    """items placement order (``None`` - method's default order)"""
+    seed: int | None = None
+    """seed of random tie-breaking between items with same order"""
 
 
 class OutputFormat(enum.Enum):
@@ -86,74 +205,709 @@ class UnresolvableError(Exception):
     """Exception raised when Result is not solvable"""
 
 
+class CancelledError(Exception):
+    """Exception raised when calculation is cancelled"""
+
+
+ProgressCb: typing.TypeAlias = typing.Callable[[int, int, float], None]
+"""Progress callback
+
+Called with number of placed items, number of evaluated candidates and
+fitness of current best partial (or estimated) result.
+
+"""
+
+
+class CancelFlag:
+    """Calculation cancellation flag
+
+    Flag can be set from any thread. Running calculation polls flag and
+    raises `CancelledError` once flag is set. Flag value is stored as
+    C bool so that it can be polled by native implementation without
+    holding GIL.
+
+    """
+
+    def __init__(self):
+        self._value = ctypes.c_bool(False)
+
+    @property
+    def value(self) -> ctypes.c_bool:
+        """Underlying C bool"""
+        return self._value
+
+    def set(self):
+        """Set flag"""
+        self._value.value = True
+
+    def is_set(self) -> bool:
+        """Is flag set"""
+        return self._value.value
+
+
+def get_item_order_value(item: Item,
+                         item_order: ItemOrder
+                         ) -> float:
+    """Get item value used for ordering items
+
+    Items are placed in order of decreasing value.
+
+    """
+    if item_order == ItemOrder.AREA:
+        return item.width * item.height
+
+    if item_order == ItemOrder.MAX_SIDE:
+        return max(item.width, item.height)
+
+    if item_order == ItemOrder.PERIMETER:
+        return item.width + item.height
+
+    if item_order == ItemOrder.WIDTH:
+        return item.width
+
+    if item_order == ItemOrder.HEIGHT:
+        return item.height
+
+    raise ValueError('unsupported item order')
+
+
+def validate_params(data: json.Data):
+    """Validate json data against ``opcut://opcut.yaml#/$defs/params``
+
+    Data is checked with structural check equivalent to (or stricter than)
+    JSON schema. Data is validated with JSON schema validator only if it is
+    rejected by structural check (exception describes validation error).
+    Instance identifiers are validated with `validate_instance_ids`.
+
+    """
+    if not _is_params_json(data):
+        get_validator().validate(params_schema_id, data)
+
+    _validate_instance_ids({k: v.get('quantity', 1)
+                            for k, v in data['panels'].items()})
+    _validate_instance_ids({k: v.get('quantity', 1)
+                            for k, v in data['items'].items()})
+
+
+def validate_result(data: json.Data):
+    """Validate json data against ``opcut://opcut.yaml#/$defs/result``
+
+    Data is checked with structural check equivalent to (or stricter than)
+    JSON schema. Data is validated with JSON schema validator only if it is
+    rejected by structural check (exception describes validation error).
+    Params instance identifiers are validated with `validate_instance_ids`.
+
+    """
+    if not _is_result_json(data):
+        get_validator().validate(result_schema_id, data)
+
+    validate_params(data['params'])
+
+
 def params_to_json(params: Params) -> json.Data:
     """Convert params to json serializable data specified by
     ``opcut://opcut.yaml#/$defs/params``"""
     return {'cut_width': params.cut_width,
             'min_initial_usage': params.min_initial_usage,
             'panels': {panel.id: {'width': panel.width,
-                                  'height': panel.height}
+                                  'height': panel.height,
+                                  **_quantity_to_json(panel.quantity)}
                        for panel in params.panels},
             'items': {item.id: {'width': item.width,
                                 'height': item.height,
-                                'can_rotate': item.can_rotate}
+                                'can_rotate': item.can_rotate,
+                                **_quantity_to_json(item.quantity)}
                       for item in params.items}}
 
 
 def params_from_json(data: json.Data) -> Params:
     """Convert json serializable data specified by
-    ``opcut://opcut.yaml#/$defs/params`` to params"""
-    return Params(cut_width=data['cut_width'],
-                  min_initial_usage=data.get('min_initial_usage', False),
-                  panels=[Panel(id=k,
+    ``opcut://opcut.yaml#/$defs/params`` to params
+
+    Instance identifiers are validated with `validate_instance_ids`.
+
+    """
+    params = Params(cut_width=data['cut_width'],
+                    min_initial_usage=data.get('min_initial_usage', False),
+                    panels=[Panel(id=k,
+                                  width=v['width'],
+                                  height=v['height'],
+                                  quantity=v.get('quantity', 1))
+                            for k, v in data['panels'].items()],
+                    items=[Item(id=k,
                                 width=v['width'],
-                                height=v['height'])
-                          for k, v in data['panels'].items()],
-                  items=[Item(id=k,
-                              width=v['width'],
-                              height=v['height'],
-                              can_rotate=v['can_rotate'])
-                         for k, v in data['items'].items()])
+                                height=v['height'],
+                                can_rotate=v['can_rotate'],
+                                quantity=v.get('quantity', 1))
+                           for k, v in data['items'].items()])
+    validate_instance_ids(params)
+    return params
 
 
-def result_to_json(result: Result) -> json.Data:
+def validate_instance_ids(params: Params):
+    """Validate panel and item identifiers against instance identifiers
+
+    If panel or item identifier is equal to instance identifier of other
+    panel or item (see `expand_params`), `ValueError` is raised.
+
+    """
+    _validate_instance_ids({panel.id: panel.quantity
+                            for panel in params.panels})
+    _validate_instance_ids({item.id: item.quantity
+                            for item in params.items})
+
+
+def expand_params(params: Params) -> Params:
+    """Expand panels and items with quantity to single instances
+
+    Instance of panel or item with quantity greater than ``1`` is identified
+    by ``<id>/<n>`` where ``n`` is instance number (starting from ``1``).
+    Instance identifiers are validated with `validate_instance_ids`.
+
+    """
+    validate_instance_ids(params)
+    return params._replace(
+        panels=[panel._replace(id=_get_instance_id(panel, i), quantity=1)
+                for panel in params.panels
+                for i in range(panel.quantity)],
+        items=[item._replace(id=_get_instance_id(item, i), quantity=1)
+               for item in params.items
+               for i in range(item.quantity)])
+
+
+def expand_result(result: Result) -> Result:
+    """Expand result to single panel and item instances
+
+    Params are expanded with `expand_params`. Item instances are assigned to
+    used entries in order of occurrence.
+
+    """
+    return result_from_table(expand_result_table(result_to_table(result)))
+
+
+def expand_result_table(table: ResultTable) -> ResultTable:
+    """Expand result table to single panel and item instances
+
+    Params are expanded with `expand_params`. Item instances are assigned to
+    used entries in order of occurrence.
+
+    """
+    panels = table.params.panels
+    items = table.params.items
+    item_offsets = _get_instance_offsets(items)
+    item_counts = [0] * len(items)
+
+    used_items = []
+    for item in table.used.items:
+        if item_counts[item] >= items[item].quantity:
+            raise ValueError('item quantity exceeded')
+
+        used_items.append(item_offsets[item] + item_counts[item])
+        item_counts[item] += 1
+
+    return table._replace(
+        params=expand_params(table.params),
+        used=table.used._replace(
+            panels=_expand_panels(panels, table.used),
+            panel_indexes=_create_zeros_column(len(used_items)),
+            items=_create_index_column(used_items)),
+        unused=table.unused._replace(
+            panels=_expand_panels(panels, table.unused),
+            panel_indexes=_create_zeros_column(len(table.unused.panels))))
+
+
+def result_to_table(result: Result) -> ResultTable:
+    """Convert result to result table
+
+    Columns of result created with `result_from_table` are used without
+    copying.
+
+    """
+    panel_indexes = _get_indexes(result.params.panels)
+
+    if (isinstance(result.used, _UsedView) and
+            result.used._params is result.params):
+        used = result.used._table
+
+    else:
+        item_indexes = _get_indexes(result.params.items)
+        used = UsedTable(
+            panels=_create_index_column([panel_indexes[i.panel.id]
+                                         for i in result.used]),
+            panel_indexes=_create_index_column([i.panel_index
+                                                for i in result.used]),
+            items=_create_index_column([item_indexes[i.item.id]
+                                        for i in result.used]),
+            x=_create_number_column([i.x for i in result.used]),
+            y=_create_number_column([i.y for i in result.used]),
+            rotate=_create_bool_column([i.rotate for i in result.used]))
+
+    if (isinstance(result.unused, _UnusedView) and
+            result.unused._params is result.params):
+        unused = result.unused._table
+
+    else:
+        unused = UnusedTable(
+            panels=_create_index_column([panel_indexes[i.panel.id]
+                                         for i in result.unused]),
+            panel_indexes=_create_index_column([i.panel_index
+                                                for i in result.unused]),
+            width=_create_number_column([i.width for i in result.unused]),
+            height=_create_number_column([i.height for i in result.unused]),
+            x=_create_number_column([i.x for i in result.unused]),
+            y=_create_number_column([i.y for i in result.unused]))
+
+    return ResultTable(params=result.params,
+                       used=used,
+                       unused=unused,
+                       cuts=result.cuts,
+                       final=result.final,
+                       stats=result.stats,
+                       configuration=result.configuration)
+
+
+def result_from_table(table: ResultTable) -> Result:
+    """Convert result table to result
+
+    Resulting used and unused are read-only sequences which create `Used`
+    and `Unused` from table columns on access.
+
+    """
+    return Result(params=table.params,
+                  used=_UsedView(table.params, table.used),
+                  unused=_UnusedView(table.params, table.unused),
+                  cuts=table.cuts,
+                  final=table.final,
+                  stats=table.stats,
+                  configuration=table.configuration)
+
+
+def result_to_json(result: Result,
+                   include_stats: bool = False
+                   ) -> json.Data:
     """Convert result to json serializable data specified by
-    ``opcut://opcut.yaml#/$defs/result``"""
-    return {'params': params_to_json(result.params),
-            'used': [{'panel': used.panel.id,
-                      'item': used.item.id,
-                      'x': used.x,
-                      'y': used.y,
-                      'rotate': used.rotate}
-                     for used in result.used],
-            'unused': [{'panel': unused.panel.id,
-                        'width': unused.width,
-                        'height': unused.height,
-                        'x': unused.x,
-                        'y': unused.y}
-                       for unused in result.unused],
-            'cuts': (None if result.cuts is None
-                     else [cut.value for cut in result.cuts])}
+    ``opcut://opcut.yaml#/$defs/result``
+
+    Panels and items with quantity are expanded with `expand_result`.
+    Calculation statistics are included only if `include_stats` is set.
+
+    """
+    return result_table_to_json(result_to_table(result), include_stats)
 
 
 def result_from_json(data: json.Data) -> Result:
     """Convert json serializable data specified by
     ``opcut://opcut.yaml#/$defs/result`` to result"""
+    return result_from_table(result_table_from_json(data))
+
+
+def result_table_to_json(table: ResultTable,
+                         include_stats: bool = False
+                         ) -> json.Data:
+    """Convert result table to json serializable data specified by
+    ``opcut://opcut.yaml#/$defs/result``
+
+    Panels and items with quantity are expanded with `expand_result_table`.
+    Calculation statistics are included only if `include_stats` is set.
+
+    """
+    if any(panel.quantity != 1 for panel in table.params.panels) or any(
+            item.quantity != 1 for item in table.params.items):
+        table = expand_result_table(table)
+
+    panel_ids = [panel.id for panel in table.params.panels]
+    item_ids = [item.id for item in table.params.items]
+    used = table.used
+    unused = table.unused
+
+    data = {'params': params_to_json(table.params),
+            'used': [{'panel': panel_ids[panel],
+                      'item': item_ids[item],
+                      'x': x,
+                      'y': y,
+                      'rotate': bool(rotate)}
+                     for panel, item, x, y, rotate in zip(
+                        used.panels, used.items, used.x, used.y,
+                        used.rotate)],
+            'unused': [{'panel': panel_ids[panel],
+                        'width': width,
+                        'height': height,
+                        'x': x,
+                        'y': y}
+                       for panel, width, height, x, y in zip(
+                        unused.panels, unused.width, unused.height,
+                        unused.x, unused.y)],
+            'cuts': (None if table.cuts is None
+                     else [cut.value for cut in table.cuts]),
+            'final': table.final}
+
+    if table.configuration:
+        data['configuration'] = _configuration_to_json(table.configuration)
+
+    if include_stats and table.stats:
+        data['stats'] = table.stats._asdict()
+
+    return data
+
+
+def result_table_from_json(data: json.Data) -> ResultTable:
+    """Convert json serializable data specified by
+    ``opcut://opcut.yaml#/$defs/result`` to result table"""
     params = params_from_json(data['params'])
-    panels = {panel.id: panel for panel in params.panels}
-    items = {item.id: item for item in params.items}
-    return Result(params=params,
-                  used=[Used(panel=panels[used['panel']],
-                             item=items[used['item']],
-                             x=used['x'],
-                             y=used['y'],
-                             rotate=used['rotate'])
-                        for used in data['used']],
-                  unused=[Unused(panel=panels[unused['panel']],
-                                 width=unused['width'],
-                                 height=unused['height'],
-                                 x=unused['x'],
-                                 y=unused['y'])
-                          for unused in data['unused']],
-                  cuts=(None if data.get('cuts') is None
-                        else [Cut(cut) for cut in data['cuts']]))
+    panel_indexes = _get_indexes(params.panels)
+    item_indexes = _get_indexes(params.items)
+    used = data['used']
+    unused = data['unused']
+    return ResultTable(
+        params=params,
+        used=UsedTable(
+            panels=_create_index_column([panel_indexes[i['panel']]
+                                         for i in used]),
+            panel_indexes=_create_zeros_column(len(used)),
+            items=_create_index_column([item_indexes[i['item']]
+                                        for i in used]),
+            x=_create_number_column([i['x'] for i in used]),
+            y=_create_number_column([i['y'] for i in used]),
+            rotate=_create_bool_column([i['rotate'] for i in used])),
+        unused=UnusedTable(
+            panels=_create_index_column([panel_indexes[i['panel']]
+                                         for i in unused]),
+            panel_indexes=_create_zeros_column(len(unused)),
+            width=_create_number_column([i['width'] for i in unused]),
+            height=_create_number_column([i['height'] for i in unused]),
+            x=_create_number_column([i['x'] for i in unused]),
+            y=_create_number_column([i['y'] for i in unused])),
+        cuts=(None if data.get('cuts') is None
+              else [Cut(cut) for cut in data['cuts']]),
+        final=data.get('final', True),
+        stats=(_stats_from_json(data['stats'])
+               if data.get('stats') else None),
+        configuration=(
+            _configuration_from_json(data['configuration'])
+            if data.get('configuration') else None))
+
+
+def _stats_from_json(data):
+    # unknown statistics are ignored (as other additional properties)
+    return Stats(**{k: v for k, v in data.items() if k in Stats._fields})
+
+
+def _configuration_to_json(configuration):
+    return {'method': configuration.method.value,
+            'item_order': (configuration.item_order.value
+                           if configuration.item_order else None),
+            'seed': configuration.seed}
+
+
+def _configuration_from_json(data):
+    return Configuration(method=Method(data['method']),
+                         item_order=(ItemOrder(data['item_order'])
+                                     if data.get('item_order') else None),
+                         seed=data.get('seed'))
+
+
+def _quantity_to_json(quantity):
+    return {'quantity': quantity} if quantity != 1 else {}
+
+
+def _get_instance_id(panel_or_item, index):
+    if panel_or_item.quantity == 1:
+        return panel_or_item.id
+
+    return f'{panel_or_item.id}/{index + 1}'
+
+
+_instance_number = re.compile('[1-9][0-9]*')
+
+
+def _validate_instance_ids(quantities):
+    # only identifiers formatted as instance identifiers are checked (number
+    # of checks does not depend on quantities)
+    for i in quantities:
+        parent_id, _, number = i.rpartition('/')
+        if (parent_id not in quantities or
+                not _instance_number.fullmatch(number)):
+            continue
+
+        quantity = quantities[parent_id]
+        if quantity > 1 and int(number) <= quantity:
+            raise ValueError(f"identifier '{i}' is equal to instance "
+                             f"identifier")
+
+
+def _get_indexes(panels_or_items):
+    return {i.id: index for index, i in enumerate(panels_or_items)}
+
+
+def _get_instance_offsets(panels_or_items):
+    offsets = []
+    offset = 0
+    for i in panels_or_items:
+        offsets.append(offset)
+        offset += i.quantity
+    return offsets
+
+
+def _expand_panels(panels, table):
+    panel_offsets = _get_instance_offsets(panels)
+
+    expanded = []
+    for panel, panel_index in zip(table.panels, table.panel_indexes):
+        if panel_index >= panels[panel].quantity:
+            raise ValueError('invalid panel index')
+
+        expanded.append(panel_offsets[panel] + panel_index)
+
+    return _create_index_column(expanded)
+
+
+# columns are arrays of smallest type which can represent all values (values
+# which can not be represented by array, e.g. mix of integers and floats,
+# are kept in list)
+
+def _create_index_column(values):
+    return _create_column(values, 'BHIQ')
+
+
+def _create_number_column(values):
+    if all(type(i) is float for i in values):
+        return array.array('d', values)
+
+    return _create_column(values, 'q')
+
+
+def _create_bool_column(values):
+    return array.array('B', values)
+
+
+def _create_zeros_column(length):
+    return array.array('B', bytes(length))
+
+
+def _create_column(values, typecodes):
+    for typecode in typecodes:
+        try:
+            return array.array(typecode, values)
+
+        except (OverflowError, TypeError):
+            continue
+
+    return list(values)
+
+
+class _UsedView(collections.abc.Sequence):
+
+    def __init__(self, params, table):
+        self._params = params
+        self._table = table
+
+    def __len__(self):
+        return len(self._table.x)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        table = self._table
+        return Used(panel=self._params.panels[table.panels[index]],
+                    item=self._params.items[table.items[index]],
+                    x=table.x[index],
+                    y=table.y[index],
+                    rotate=bool(table.rotate[index]),
+                    panel_index=table.panel_indexes[index])
+
+    def __iter__(self):
+        panels = self._params.panels
+        items = self._params.items
+        table = self._table
+        for panel, item, x, y, rotate, panel_index in zip(
+                table.panels, table.items, table.x, table.y, table.rotate,
+                table.panel_indexes):
+            yield Used(panel=panels[panel],
+                       item=items[item],
+                       x=x,
+                       y=y,
+                       rotate=bool(rotate),
+                       panel_index=panel_index)
+
+    def __eq__(self, other):
+        return _sequence_equals(self, other)
+
+
+class _UnusedView(collections.abc.Sequence):
+
+    def __init__(self, params, table):
+        self._params = params
+        self._table = table
+
+    def __len__(self):
+        return len(self._table.x)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        table = self._table
+        return Unused(panel=self._params.panels[table.panels[index]],
+                      width=table.width[index],
+                      height=table.height[index],
+                      x=table.x[index],
+                      y=table.y[index],
+                      panel_index=table.panel_indexes[index])
+
+    def __iter__(self):
+        panels = self._params.panels
+        table = self._table
+        for panel, width, height, x, y, panel_index in zip(
+                table.panels, table.width, table.height, table.x, table.y,
+                table.panel_indexes):
+            yield Unused(panel=panels[panel],
+                         width=width,
+                         height=height,
+                         x=x,
+                         y=y,
+                         panel_index=panel_index)
+
+    def __eq__(self, other):
+        return _sequence_equals(self, other)
+
+
+def _sequence_equals(s1, s2):
+    if not isinstance(s2, collections.abc.Sequence):
+        return NotImplemented
+
+    return len(s1) == len(s2) and all(i == j for i, j in zip(s1, s2))
+
+
+# structural checks mirror opcut.yaml schemas - they can reject valid data
+# (e.g. integral floats as quantity) but they must not accept invalid data
+
+_number_types = {int, float}
+
+_item_orders = {None, *(item_order.value for item_order in ItemOrder)}
+
+_cuts = {cut.value for cut in Cut}
+
+_stats_types = {field: ({float} if field.endswith('_time') else {int})
+                for field in Stats._fields}
+
+
+def _is_number(x):
+    return type(x) in _number_types
+
+
+def _is_quantity(data, key):
+    if key not in data:
+        return True
+
+    quantity = data[key]
+    return type(quantity) is int and quantity >= 1
+
+
+def _is_params_json(data):
+    if not isinstance(data, dict):
+        return False
+
+    if not _is_number(data.get('cut_width')):
+        return False
+
+    if ('min_initial_usage' in data and
+            not isinstance(data['min_initial_usage'], bool)):
+        return False
+
+    panels = data.get('panels')
+    items = data.get('items')
+    if not isinstance(panels, dict) or not isinstance(items, dict):
+        return False
+
+    return (all(_is_panel_json(i) for i in panels.values()) and
+            all(_is_item_json(i) for i in items.values()))
+
+
+def _is_panel_json(data):
+    return (isinstance(data, dict) and
+            _is_number(data.get('width')) and
+            _is_number(data.get('height')) and
+            _is_quantity(data, 'quantity'))
+
+
+def _is_item_json(data):
+    return (isinstance(data, dict) and
+            _is_number(data.get('width')) and
+            _is_number(data.get('height')) and
+            isinstance(data.get('can_rotate'), bool) and
+            _is_quantity(data, 'quantity'))
+
+
+def _is_result_json(data):
+    if not isinstance(data, dict):
+        return False
+
+    if not _is_params_json(data.get('params')):
+        return False
+
+    used = data.get('used')
+    unused = data.get('unused')
+    if not isinstance(used, list) or not isinstance(unused, list):
+        return False
+
+    if not all(_is_used_json(i) for i in used):
+        return False
+
+    if not all(_is_unused_json(i) for i in unused):
+        return False
+
+    cuts = data.get('cuts')
+    if cuts is not None and not (isinstance(cuts, list) and
+                                 all(type(i) is str and i in _cuts
+                                     for i in cuts)):
+        return False
+
+    if 'final' in data and not isinstance(data['final'], bool):
+        return False
+
+    if ('configuration' in data and
+            not _is_configuration_json(data['configuration'])):
+        return False
+
+    if 'stats' in data and not _is_stats_json(data['stats']):
+        return False
+
+    return True
+
+
+def _is_used_json(data):
+    return (isinstance(data, dict) and
+            isinstance(data.get('panel'), str) and
+            isinstance(data.get('item'), str) and
+            _is_number(data.get('x')) and
+            _is_number(data.get('y')) and
+            isinstance(data.get('rotate'), bool))
+
+
+def _is_unused_json(data):
+    return (isinstance(data, dict) and
+            isinstance(data.get('panel'), str) and
+            _is_number(data.get('width')) and
+            _is_number(data.get('height')) and
+            _is_number(data.get('x')) and
+            _is_number(data.get('y')))
+
+
+def _is_configuration_json(data):
+    if not isinstance(data, dict):
+        return False
+
+    item_order = data.get('item_order')
+    seed = data.get('seed')
+    return (isinstance(data.get('method'), str) and
+            (item_order is None or
+             (type(item_order) is str and item_order in _item_orders)) and
+            (seed is None or type(seed) is int))
+
+
+def _is_stats_json(data):
+    return (isinstance(data, dict) and
+            all(type(data[field]) in types
+                for field, types in _stats_types.items()
+                if field in data))
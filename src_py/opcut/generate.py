@@ -11,7 +11,30 @@ def generate(result: common.Result,
              panel_id: typing.Optional[str] = None,
              settings: common.OutputSettings = common.OutputSettings()
              ) -> bytes:
-    """Generate output"""
+    """Generate output
+
+    Panels with quantity are expanded with `common.expand_result_table`
+    (one page per panel instance identified by `panel_id` ``<id>/<n>``).
+
+    """
+    table = common.expand_result_table(common.result_to_table(result))
+    panels = table.params.panels
+    items = table.params.items
+
+    # used and unused are grouped by index of expanded panel
+    used = [[] for _ in panels]
+    for panel, item, x, y, rotate in zip(table.used.panels, table.used.items,
+                                         table.used.x, table.used.y,
+                                         table.used.rotate):
+        used[panel].append((items[item], x, y, rotate))
+
+    unused = [[] for _ in panels]
+    for panel, width, height, x, y in zip(table.unused.panels,
+                                          table.unused.width,
+                                          table.unused.height,
+                                          table.unused.x, table.unused.y):
+        unused[panel].append((width, height, x, y))
+
     ret = io.BytesIO()
 
     if output_format == common.OutputFormat.PDF:
@@ -26,17 +49,17 @@ def generate(result: common.Result,
     with surface_cls(ret,
                      settings.pagesize[0],
                      settings.pagesize[1]) as surface:
-        for panel in result.params.panels:
+        for panel, panel_used, panel_unused in zip(panels, used, unused):
             if panel_id and panel.id != panel_id:
                 continue
 
-            _write_panel(surface, settings, result, panel)
+            _write_panel(surface, settings, panel, panel_used, panel_unused)
             surface.show_page()
 
     return ret.getvalue()
 
 
-def _write_panel(surface, settings, result, panel):
+def _write_panel(surface, settings, panel, used, unused):
     scale = _calculate_scale(settings, panel)
     width = panel.width * scale
     height = panel.height * scale
@@ -51,28 +74,24 @@ def _write_panel(surface, settings, result, panel):
     ctx.rectangle(x0, y0, width, height)
     ctx.fill()
 
-    for used in result.used:
-        if used.panel != panel:
-            continue
-        _write_used(surface, scale, x0, y0, used)
+    for item, x, y, rotate in used:
+        _write_used(surface, scale, x0, y0, item, x, y, rotate)
 
-    for unused in result.unused:
-        if unused.panel != panel:
-            continue
-        _write_unused(surface, scale, x0, y0, unused)
+    for width, height, x, y in unused:
+        _write_unused(surface, scale, x0, y0, width, height, x, y)
 
     _write_centered_text(surface, settings.pagesize[0] / 2,
                          settings.pagesize[1] - settings.margin_bottom / 2,
                          panel.id)
 
 
-def _write_used(surface, scale, x0, y0, used):
-    width = used.item.width * scale
-    height = used.item.height * scale
-    if used.rotate:
+def _write_used(surface, scale, x0, y0, item, x, y, rotate):
+    width = item.width * scale
+    height = item.height * scale
+    if rotate:
         width, height = height, width
-    x = x0 + used.x * scale
-    y = y0 + used.y * scale
+    x = x0 + x * scale
+    y = y0 + y * scale
 
     ctx = cairo.Context(surface)
     ctx.set_line_width(0)
@@ -81,14 +100,14 @@ def _write_used(surface, scale, x0, y0, used):
     ctx.fill()
 
     _write_centered_text(surface, x + width / 2, y + height / 2,
-                         used.item.id + (' (r)' if used.rotate else ''))
+                         item.id + (' (r)' if rotate else ''))
 
 
-def _write_unused(surface, scale, x0, y0, unused):
-    width = unused.width * scale
-    height = unused.height * scale
-    x = x0 + unused.x * scale
-    y = y0 + unused.y * scale
+def _write_unused(surface, scale, x0, y0, width, height, x, y):
+    width = width * scale
+    height = height * scale
+    x = x0 + x * scale
+    y = y0 + y * scale
 
     ctx = cairo.Context(surface)
     ctx.set_line_width(0)
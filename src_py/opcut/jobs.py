@@ -0,0 +1,412 @@
+import asyncio
+import collections
+import enum
+import functools
+import os
+import typing
+import uuid
+
+from hat import aio
+from hat import json
+from hat import util
+
+from opcut import codec
+from opcut import common
+import opcut.cache
+import opcut.pool
+
+
+class JobStatus(enum.Enum):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+
+class JobProgress(typing.NamedTuple):
+    placed: int
+    items: int
+    evaluated: int
+    fitness: float
+
+
+class JobInfo(typing.NamedTuple):
+    id: str
+    method: common.Method
+    status: JobStatus
+    message: str | None
+    progress: JobProgress | None = None
+
+
+JobProgressCb: typing.TypeAlias = typing.Callable[[JobProgress], None]
+
+
+class QueueFullError(Exception):
+    """Exception raised when job queue is full"""
+
+
+class JobFailedError(Exception):
+    """Exception raised when job did not complete successfully"""
+
+
+class JobInternalError(JobFailedError):
+    """Exception raised when job failed because of internal error (e.g.
+    worker failure)"""
+
+
+def job_info_to_json(info: JobInfo) -> json.Data:
+    """Convert job info to json serializable data"""
+    return {'id': info.id,
+            'method': info.method.value,
+            'status': info.status.value,
+            'message': info.message,
+            'progress': (info.progress._asdict() if info.progress
+                         else None)}
+
+
+def get_error_message(error: Exception | None) -> str | None:
+    """Get message describing job error"""
+    if error is None:
+        return
+
+    if isinstance(error, common.UnresolvableError):
+        return 'Result is not solvable'
+
+    return str(error)
+
+
+async def create_job_queue(pool: opcut.pool.Pool,
+                           timeout: float,
+                           concurrency: int,
+                           queue_size: int,
+                           history_size: int = 1000,
+                           history_max_size: int = 100 * 1024 * 1024,
+                           threads: int | None = None,
+                           progress_interval: float = 0.2,
+                           cache: opcut.cache.ResultCache | None = None
+                           ) -> 'JobQueue':
+    """Create job queue
+
+    At most `concurrency` jobs are executed at the same time and at most
+    `queue_size` jobs can wait for execution. After `timeout` seconds,
+    calculation is completed with greedy method and result is marked as non
+    final. If calculation is not completed in twice the `timeout` seconds,
+    job fails. Each calculation uses `threads` threads (see
+    `opcut.calculate.calculate`) - if `threads` is ``None``, number of CPUs
+    divided by `concurrency` is used.
+
+    Last `history_size` completed jobs are available for querying. Oldest
+    completed jobs are also removed while total size of their results
+    (encoded as JSON) exceeds `history_max_size` bytes.
+
+    Progress of running jobs is available as part of job info and is
+    reported (at most once per `progress_interval` seconds) to registered
+    progress callbacks.
+
+    If `cache` is provided, cached results are returned without
+    calculation (cache is queried in executor after submission and job
+    with cached result is done without waiting for execution) and final
+    results of completed jobs are added to cache.
+
+    """
+    queue = JobQueue()
+    queue._pool = pool
+    queue._timeout = timeout
+    queue._queue_size = queue_size
+    queue._history_size = history_size
+    queue._history_max_size = history_max_size
+    queue._threads = (threads if threads is not None
+                      else max(1, (os.cpu_count() or 1) // concurrency))
+    queue._progress_interval = progress_interval
+    queue._cache = cache
+    queue._async_group = aio.Group()
+    queue._queue = aio.Queue()
+    queue._queued_count = 0
+    queue._running_count = 0
+    queue._completed_counts = collections.Counter()
+    queue._jobs = {}
+    queue._history = collections.deque()
+    queue._history_result_size = 0
+
+    for _ in range(concurrency):
+        queue.async_group.spawn(queue._runner_loop)
+
+    return queue
+
+
+class JobQueue(aio.Resource):
+
+    @property
+    def async_group(self) -> aio.Group:
+        return self._async_group
+
+    @property
+    def queued_count(self) -> int:
+        """Number of jobs waiting for execution"""
+        return self._queued_count
+
+    @property
+    def running_count(self) -> int:
+        """Number of running jobs"""
+        return self._running_count
+
+    @property
+    def completed_counts(self) -> dict[tuple[common.Method, str], int]:
+        """Number of completed jobs per method and outcome
+
+        Outcome is one of ``done``, ``cached`` (result found in cache),
+        ``unresolvable``, ``timeout``, ``failed`` or ``cancelled``.
+
+        """
+        return dict(self._completed_counts)
+
+    def submit(self,
+               method: common.Method,
+               params: json.Data,
+               beam_width: int = 10
+               ) -> JobInfo:
+        """Submit new calculation job
+
+        Argument `params` is json serializable data specified by
+        ``opcut://opcut.yaml#/$defs/params``. Argument `beam_width` is used
+        by beam methods. If queue is full, `QueueFullError` is raised.
+
+        """
+        if not self.is_open:
+            raise Exception('job queue is not open')
+
+        if self._queued_count >= self._queue_size:
+            raise QueueFullError()
+
+        job = _Job(id=uuid.uuid4().hex,
+                   method=method,
+                   params=params,
+                   beam_width=beam_width,
+                   items=sum(item.get('quantity', 1)
+                             for item in params['items'].values()))
+
+        self._jobs[job.id] = job
+        self._queued_count += 1
+
+        if self._cache:
+            self.async_group.spawn(self._get_cache_result, job, params)
+
+        else:
+            self._queue.put_nowait(job)
+
+        return _get_job_info(job)
+
+    def get_info(self, job_id: str) -> JobInfo | None:
+        """Get job info"""
+        job = self._jobs.get(job_id)
+        return _get_job_info(job) if job else None
+
+    def register_progress_cb(self,
+                             job_id: str,
+                             cb: JobProgressCb
+                             ) -> util.RegisterCallbackHandle | None:
+        """Register job progress callback
+
+        Callback is called each time progress of running job is updated.
+
+        """
+        job = self._jobs.get(job_id)
+        return job.progress_cbs.register(cb) if job else None
+
+    def get_result(self, job_id: str) -> json.Data | None:
+        """Get result of successfully completed job
+
+        Result is json serializable data specified by
+        ``opcut://opcut.yaml#/$defs/result``.
+
+        """
+        job = self._jobs.get(job_id)
+        return job.result if job else None
+
+    def get_error(self, job_id: str) -> Exception | None:
+        """Get error of failed or cancelled job
+
+        Error is `common.UnresolvableError` or `JobFailedError`.
+
+        """
+        job = self._jobs.get(job_id)
+        return job.error if job else None
+
+    async def wait_result(self, job_id: str) -> json.Data:
+        """Wait for job completion and return its result
+
+        If job is not successfully completed, `common.UnresolvableError` or
+        `JobFailedError` is raised.
+
+        """
+        job = self._jobs.get(job_id)
+        if not job:
+            raise ValueError('invalid job id')
+
+        await job.done.wait()
+
+        if job.error:
+            raise job.error
+
+        return job.result
+
+    def cancel(self, job_id: str) -> JobInfo | None:
+        """Cancel queued or running job"""
+        job = self._jobs.get(job_id)
+        if not job:
+            return
+
+        if job.status == JobStatus.QUEUED:
+            self._queued_count -= 1
+            self._set_completed(job, JobStatus.CANCELLED,
+                                JobFailedError('Job cancelled'))
+
+        elif job.status == JobStatus.RUNNING:
+            job.async_group.close()
+
+        return _get_job_info(job)
+
+    async def _runner_loop(self):
+        while True:
+            job = await self._queue.get()
+            if job.status != JobStatus.QUEUED:
+                continue
+
+            self._queued_count -= 1
+            self._running_count += 1
+            job.status = JobStatus.RUNNING
+            job.async_group = self.async_group.create_subgroup()
+
+            try:
+                await asyncio.wait([job.async_group.spawn(self._run_job, job)])
+
+            finally:
+                self._running_count -= 1
+                await aio.uncancellable(job.async_group.async_close())
+
+    async def _run_job(self, job):
+        params = job.params
+
+        try:
+            job.result = await asyncio.wait_for(
+                self._pool.calculate(
+                    method=job.method,
+                    params=job.params,
+                    timeout=self._timeout,
+                    threads=self._threads,
+                    beam_width=job.beam_width,
+                    progress_cb=functools.partial(self._on_progress, job),
+                    progress_interval=self._progress_interval),
+                2 * self._timeout)
+            self._set_completed(job, JobStatus.DONE, None)
+
+            if self._cache:
+                self.async_group.spawn(self._put_cache_result, job, params)
+
+        except asyncio.CancelledError:
+            self._set_completed(job, JobStatus.CANCELLED,
+                                JobFailedError('Job cancelled'))
+
+        except asyncio.TimeoutError:
+            self._set_completed(job, JobStatus.FAILED,
+                                JobFailedError('Request timeout'), 'timeout')
+
+        except common.UnresolvableError as e:
+            self._set_completed(job, JobStatus.FAILED, e)
+
+        except Exception as e:
+            self._set_completed(job, JobStatus.FAILED,
+                                JobInternalError(str(e)))
+
+    async def _get_cache_result(self, job, params):
+        # job params are removed once job is completed (e.g. cancelled) and
+        # failed cache query is handled as cache miss (job is queued)
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                None, _get_cache_result, self._cache, job.method, params,
+                job.beam_width)
+
+        except Exception:
+            result = None
+
+        # job could be cancelled while cache was queried
+        if job.status != JobStatus.QUEUED:
+            return
+
+        if result is None:
+            self._queue.put_nowait(job)
+            return
+
+        self._queued_count -= 1
+        job.result = result
+        self._set_completed(job, JobStatus.DONE, None, 'cached')
+
+    async def _put_cache_result(self, job, params):
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._cache.put, job.method,
+            common.params_from_json(params), job.beam_width, job.result)
+
+    def _on_progress(self, job, placed, evaluated, fitness):
+        job.progress = JobProgress(placed=placed,
+                                   items=job.items,
+                                   evaluated=evaluated,
+                                   fitness=fitness)
+        job.progress_cbs.notify(job.progress)
+
+    def _set_completed(self, job, status, error, outcome=None):
+        job.status = status
+        job.error = error
+        job.params = None
+        job.done.set()
+
+        if outcome is None:
+            if isinstance(error, common.UnresolvableError):
+                outcome = 'unresolvable'
+
+            else:
+                outcome = status.value
+
+        self._completed_counts[job.method, outcome] += 1
+
+        if job.result is not None:
+            job.result_size = len(codec.encode_json(job.result))
+
+        self._history.append(job)
+        self._history_result_size += job.result_size
+
+        while (len(self._history) > self._history_size or
+               self._history_result_size > self._history_max_size):
+            removed = self._history.popleft()
+            self._history_result_size -= removed.result_size
+            self._jobs.pop(removed.id, None)
+
+
+class _Job:
+
+    def __init__(self, id, method, params, beam_width, items):
+        self.id = id
+        self.method = method
+        self.params = params
+        self.beam_width = beam_width
+        self.items = items
+        self.progress = None
+        self.progress_cbs = util.CallbackRegistry()
+        self.status = JobStatus.QUEUED
+        self.result = None
+        self.result_size = 0
+        self.error = None
+        self.async_group = None
+        self.done = asyncio.Event()
+
+
+def _get_job_info(job):
+    return JobInfo(id=job.id,
+                   method=job.method,
+                   status=job.status,
+                   message=get_error_message(job.error),
+                   progress=job.progress)
+
+
+def _get_cache_result(cache, method, params, beam_width):
+    return cache.get(method, common.params_from_json(params), beam_width)
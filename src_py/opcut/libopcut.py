@@ -1,17 +1,187 @@
 from pathlib import Path
-import collections
+import array
 import ctypes
+import random
 import sys
+import time
+import typing
 
 from opcut import common
 
 
+class PanelArrays(typing.NamedTuple):
+    width: memoryview
+    height: memoryview
+    quantity: memoryview
+
+
+class ItemArrays(typing.NamedTuple):
+    width: memoryview
+    height: memoryview
+    can_rotate: memoryview
+    quantity: memoryview
+    order: memoryview | None = None
+
+
+class ParamsArrays(typing.NamedTuple):
+    """Params represented as arrays
+
+    Each array is one-dimensional C-contiguous buffer (``memoryview``,
+    ``array.array``, ``numpy.ndarray``) with format ``d`` (width, height,
+    order), ``?`` (can_rotate) or unsigned integer with size of ``size_t``
+    (quantity). Items are placed in order of decreasing order value (or
+    area if `ItemArrays.order` is ``None``).
+
+    """
+    cut_width: float
+    min_initial_usage: bool
+    panels: PanelArrays
+    items: ItemArrays
+
+
+class UsedArrays(typing.NamedTuple):
+    panel_ids: memoryview
+    panel_indexes: memoryview
+    item_ids: memoryview
+    x: memoryview
+    y: memoryview
+    rotate: memoryview
+
+
+class UnusedArrays(typing.NamedTuple):
+    panel_ids: memoryview
+    panel_indexes: memoryview
+    width: memoryview
+    height: memoryview
+    x: memoryview
+    y: memoryview
+
+
+class Arrays(typing.NamedTuple):
+    used: UsedArrays
+    unused: UnusedArrays
+    final: bool
+    stats: common.Stats
+
+
 def calculate(method: common.Method,
-              params: common.Params
+              params: common.Params,
+              timeout: float | None = None,
+              threads: int = 1,
+              beam_width: int = 10,
+              cache_size: int = 10000,
+              cancel: common.CancelFlag | None = None,
+              progress_cb: common.ProgressCb | None = None,
+              item_order: common.ItemOrder | None = None,
+              seed: int | None = None
               ) -> common.Result:
+    """Calculate result
+
+    Result is created with `common.result_from_table` from result of
+    `calculate_table`.
+
+    """
+    return common.result_from_table(
+        calculate_table(method, params, timeout, threads, beam_width,
+                        cache_size, cancel, progress_cb, item_order, seed))
+
+
+def calculate_table(method: common.Method,
+                    params: common.Params,
+                    timeout: float | None = None,
+                    threads: int = 1,
+                    beam_width: int = 10,
+                    cache_size: int = 10000,
+                    cancel: common.CancelFlag | None = None,
+                    progress_cb: common.ProgressCb | None = None,
+                    item_order: common.ItemOrder | None = None,
+                    seed: int | None = None
+                    ) -> common.ResultTable:
+    """Calculate result table
+
+    Table columns are `array.array` copies of native arrays returned by
+    `calculate_arrays` (copies are not bound to lifetime of native arrays,
+    which are allocated for worst case number of unused, and can be
+    pickled).
+
+    """
+    arrays = calculate_arrays(method, params, timeout, threads, beam_width,
+                              cache_size, cancel, progress_cb, item_order,
+                              seed)
+    return arrays_to_table(params, arrays)
+
+
+def arrays_to_table(params: common.Params,
+                    arrays: Arrays
+                    ) -> common.ResultTable:
+    """Convert native arrays to result table"""
+    return common.ResultTable(
+        params=params,
+        used=common.UsedTable(panels=_copy_array(arrays.used.panel_ids),
+                              panel_indexes=_copy_array(
+                                  arrays.used.panel_indexes),
+                              items=_copy_array(arrays.used.item_ids),
+                              x=_copy_array(arrays.used.x),
+                              y=_copy_array(arrays.used.y),
+                              rotate=_copy_array(arrays.used.rotate)),
+        unused=common.UnusedTable(panels=_copy_array(arrays.unused.panel_ids),
+                                  panel_indexes=_copy_array(
+                                      arrays.unused.panel_indexes),
+                                  width=_copy_array(arrays.unused.width),
+                                  height=_copy_array(arrays.unused.height),
+                                  x=_copy_array(arrays.unused.x),
+                                  y=_copy_array(arrays.unused.y)),
+        cuts=None,
+        final=arrays.final,
+        stats=arrays.stats)
+
+
+def calculate_arrays(method: common.Method,
+                     params: common.Params | ParamsArrays,
+                     timeout: float | None = None,
+                     threads: int = 1,
+                     beam_width: int = 10,
+                     cache_size: int = 10000,
+                     cancel: common.CancelFlag | None = None,
+                     progress_cb: common.ProgressCb | None = None,
+                     item_order: common.ItemOrder | None = None,
+                     seed: int | None = None
+                     ) -> Arrays:
+    """Calculate result as arrays
+
+    Used and unused are represented as zero-copy memoryviews of native
+    arrays (one array for each attribute - e.g. ``numpy.asarray`` can be
+    applied to each array). Panel and item ids are indexes of
+    `params.panels` and `params.items`.
+
+    Native calculation is executed without holding GIL. If `cancel` is
+    set (from other thread), calculation is stopped and
+    `common.CancelledError` is raised. Optional `progress_cb` is called
+    from calculating thread after each item placement (exceptions raised
+    by `progress_cb` are ignored).
+
+    Items are placed in order of decreasing area, if `item_order` is not
+    provided. If `seed` is provided, items with same order value are
+    placed in random order.
+
+    If `params` is `ParamsArrays`, native params are initialized directly
+    from arrays (without creating `common.Params`) - `item_order` and
+    `seed` are not supported (order is provided by `ItemArrays.order`).
+
+    """
     if not _lib:
         raise Exception("native implementation not available")
 
+    if threads < 1:
+        raise ValueError('invalid number of threads')
+
+    if isinstance(params, ParamsArrays):
+        if item_order is not None or seed is not None:
+            raise ValueError('item order not supported for params arrays')
+
+    else:
+        params = _params_to_arrays(params, item_order, seed)
+
     native_method = _encode_method(method)
 
     a = _lib.opcut_allocator_create(ctypes.pythonapi.PyMem_RawMalloc,
@@ -20,31 +190,59 @@ def calculate(method: common.Method,
         raise Exception("allocation error")
 
     try:
-        native_params = _encode_params(params)
-        native_used = ctypes.POINTER(_lib.opcut_used_t)()
-        native_unused = ctypes.POINTER(_lib.opcut_unused_t)()
-        ret = _lib.opcut_calculate(a, native_method,
-                                   ctypes.byref(native_params),
-                                   ctypes.byref(native_used),
-                                   ctypes.byref(native_unused))
+        encode_start = time.perf_counter()
+        native_params = _encode_params(params, timeout, threads,
+                                       beam_width, cache_size, cancel,
+                                       progress_cb)
+        native_used, used = _create_arrays(
+            _lib.opcut_used_arrays_t, native_params.item_instances_len)
+        native_unused, unused = _create_arrays(
+            _lib.opcut_unused_arrays_t,
+            native_params.panels_len + 2 * native_params.item_instances_len)
+        native_final = ctypes.c_bool()
+        native_stats = _lib.opcut_stats_t()
+
+        solve_start = time.perf_counter()
+        ret = _lib.opcut_calculate_arrays(a, native_method,
+                                          ctypes.byref(native_params),
+                                          ctypes.byref(native_used),
+                                          ctypes.byref(native_unused),
+                                          ctypes.byref(native_final),
+                                          ctypes.byref(native_stats))
+        decode_start = time.perf_counter()
 
         if ret == _lib.OPCUT_UNSOLVABLE:
             raise common.UnresolvableError()
 
+        if ret == _lib.OPCUT_CANCELLED:
+            raise common.CancelledError()
+
         if ret != _lib.OPCUT_SUCCESS:
             raise Exception("calculation error")
 
-        used = list(_decode_used(params, native_used))
-        unused = list(_decode_unused(params, native_unused))
-        return common.Result(params=params,
-                             used=used,
-                             unused=unused,
-                             cuts=None)
+        used = UsedArrays(**_decode_arrays(native_used, used))
+        unused = UnusedArrays(**_decode_arrays(native_unused, unused))
+        decode_end = time.perf_counter()
+
+        stats = _decode_stats(native_stats)._replace(
+            encode_time=solve_start - encode_start,
+            solve_time=decode_start - solve_start,
+            decode_time=decode_end - decode_start)
+
+        return Arrays(used=used,
+                      unused=unused,
+                      final=native_final.value,
+                      stats=stats)
 
     finally:
         _lib.opcut_allocator_destroy(a)
 
 
+def is_available() -> bool:
+    """Is native implementation available"""
+    return _lib is not None
+
+
 def _encode_method(method):
     if method == common.Method.GREEDY_NATIVE:
         return _lib.OPCUT_METHOD_GREEDY
@@ -52,57 +250,174 @@ def _encode_method(method):
     if method == common.Method.FORWARD_GREEDY_NATIVE:
         return _lib.OPCUT_METHOD_FORWARD_GREEDY
 
+    if method == common.Method.BEAM_NATIVE:
+        return _lib.OPCUT_METHOD_BEAM
+
     raise ValueError('unsupported method')
 
 
-def _encode_params(params):
-    panels_type = _lib.opcut_panel_t * len(params.panels)
-    panels = panels_type(*(_lib.opcut_panel_t(width=panel.width,
-                                              height=panel.height,
-                                              area=panel.width * panel.height)
-                           for panel in params.panels))
-
-    items_type = _lib.opcut_item_t * len(params.items)
-    items = items_type(*(_lib.opcut_item_t(width=item.width,
-                                           height=item.height,
-                                           can_rotate=item.can_rotate,
-                                           area=item.width * item.height)
-                         for item in params.items))
-
-    return _lib.opcut_params_t(cut_width=params.cut_width,
-                               min_initial_usage=params.min_initial_usage,
-                               panels=panels,
-                               panels_len=len(panels),
-                               items=items,
-                               items_len=len(items),
-                               panels_area=sum(panel.width * panel.height
-                                               for panel in params.panels))
-
-
-def _decode_used(params, used):
-    queue = collections.deque()
-    while used:
-        queue.appendleft(
-            common.Used(panel=params.panels[used.contents.panel_id],
-                        item=params.items[used.contents.item_id],
-                        x=used.contents.x,
-                        y=used.contents.y,
-                        rotate=used.contents.rotate))
-        used = used.contents.next
-    return queue
-
-
-def _decode_unused(params, unused):
-    queue = collections.deque()
-    while unused:
-        queue.appendleft(
-            common.Unused(panel=params.panels[unused.contents.panel_id],
-                          width=unused.contents.width,
-                          height=unused.contents.height,
-                          x=unused.contents.x,
-                          y=unused.contents.y))
-        unused = unused.contents.next
-    return queue
+def _params_to_arrays(params, item_order, seed):
+    panels = params.panels
+    items = params.items
+    item_orders = _get_item_orders(items, item_order, seed)
+    return ParamsArrays(
+        cut_width=params.cut_width,
+        min_initial_usage=params.min_initial_usage,
+        panels=PanelArrays(
+            width=array.array('d', (panel.width for panel in panels)),
+            height=array.array('d', (panel.height for panel in panels)),
+            quantity=array.array(_size_t_format,
+                                 (panel.quantity for panel in panels))),
+        items=ItemArrays(
+            width=array.array('d', (item.width for item in items)),
+            height=array.array('d', (item.height for item in items)),
+            can_rotate=memoryview(
+                bytes(item.can_rotate for item in items)).cast('?'),
+            quantity=array.array(_size_t_format,
+                                 (item.quantity for item in items)),
+            order=(array.array('d', item_orders)
+                   if item_orders is not None else None)))
+
+
+def _encode_params(params, timeout, threads, beam_width, cache_size,
+                   cancel, progress_cb):
+    # native panels and items are initialized by opcut_params_init_arrays
+    # (ctypes arrays of columns are only needed during initialization)
+    panels_len = len(memoryview(params.panels.width))
+    items_len = len(memoryview(params.items.width))
+    panels = (_lib.opcut_panel_t * panels_len)()
+    items = (_lib.opcut_item_t * items_len)()
+
+    native_panels = _lib.opcut_panel_arrays_t(
+        width=_get_column(params.panels.width, ctypes.c_double, panels_len),
+        height=_get_column(params.panels.height, ctypes.c_double, panels_len),
+        quantity=_get_column(params.panels.quantity, ctypes.c_size_t,
+                             panels_len),
+        len=panels_len)
+    native_items = _lib.opcut_item_arrays_t(
+        width=_get_column(params.items.width, ctypes.c_double, items_len),
+        height=_get_column(params.items.height, ctypes.c_double, items_len),
+        can_rotate=_get_column(params.items.can_rotate, ctypes.c_bool,
+                               items_len),
+        quantity=_get_column(params.items.quantity, ctypes.c_size_t,
+                             items_len),
+        order=(_get_column(params.items.order, ctypes.c_double, items_len)
+               if params.items.order is not None else None),
+        len=items_len)
+
+    native_params = _lib.opcut_params_t(
+        cut_width=params.cut_width,
+        min_initial_usage=params.min_initial_usage,
+        panels=panels,
+        items=items,
+        timeout=timeout or 0,
+        threads=threads,
+        beam_width=beam_width,
+        cache_size=cache_size,
+        cancel=ctypes.pointer(cancel.value) if cancel else None,
+        progress=_encode_progress_cb(progress_cb),
+        progress_data=None)
+
+    if _lib.opcut_params_init_arrays(ctypes.byref(native_params),
+                                     ctypes.byref(native_panels),
+                                     ctypes.byref(native_items)):
+        raise ValueError('invalid params arrays')
+
+    return native_params
+
+
+def _get_column(column, value_type, length):
+    view = memoryview(column)
+    if (view.ndim != 1 or
+            not view.c_contiguous or
+            len(view) != length or
+            view.itemsize != ctypes.sizeof(value_type) or
+            view.format.lstrip(_native_byte_orders) not in
+            _column_formats[value_type]):
+        raise ValueError('invalid params array')
+
+    array_type = value_type * length
+    if view.readonly:
+        return array_type.from_buffer_copy(view)
+
+    return array_type.from_buffer(view)
+
+
+def _get_item_orders(items, item_order, seed):
+    # native order defaults to item area
+    if item_order is None and seed is None:
+        return None
+
+    # native sort is not stable - ties are resolved by ranking items
+    ids = list(range(len(items)))
+    if seed is not None:
+        random.Random(seed).shuffle(ids)
+
+    item_order = item_order or common.ItemOrder.AREA
+    ids.sort(key=lambda i: common.get_item_order_value(items[i], item_order),
+             reverse=True)
+
+    orders = [0] * len(items)
+    for rank, i in enumerate(ids):
+        orders[i] = len(ids) - rank
+    return orders
+
+
+def _encode_progress_cb(progress_cb):
+    # reference to callback is kept by params structure
+    if not progress_cb:
+        return _lib.opcut_progress_t()
+
+    def progress(data, placed, evaluated, fitness):
+        progress_cb(placed, evaluated, fitness)
+
+    return _lib.opcut_progress_t(progress)
+
+
+def _create_arrays(arrays_type, length):
+    arrays = {name: (field_type._type_ * length)()
+              for name, field_type in arrays_type._fields_
+              if name != 'len'}
+    return arrays_type(len=length, **arrays), arrays
+
+
+def _decode_arrays(native_arrays, arrays):
+    # memoryviews are cast to native formats (supported by memoryview
+    # indexing and numpy)
+    return {name: memoryview(array).cast('B').cast(
+                _get_array_format(array._type_))[:native_arrays.len]
+            for name, array in arrays.items()}
+
+
+def _get_array_format(value_type):
+    if value_type is ctypes.c_size_t:
+        return _size_t_format
+
+    if value_type is ctypes.c_double:
+        return 'd'
+
+    if value_type is ctypes.c_bool:
+        return '?'
+
+    raise ValueError('unsupported array type')
+
+
+def _copy_array(view):
+    # memoryview formats are array type codes except bool
+    copy = array.array('B' if view.format == '?' else view.format)
+    copy.frombytes(view.cast('B'))
+    return copy
+
+
+def _decode_stats(stats):
+    return common.Stats(cache_hits=stats.cache_hits,
+                        cache_misses=stats.cache_misses,
+                        pruned_candidates=stats.pruned_candidates,
+                        generated_candidates=stats.generated_candidates,
+                        fitness_evaluations=stats.fitness_evaluations,
+                        rollouts=stats.rollouts,
+                        pool_blocks=stats.pool_blocks,
+                        peak_unused=stats.peak_unused)
 
 
 class _Lib:
@@ -113,26 +428,36 @@ class _Lib:
         self.OPCUT_SUCCESS = 0
         self.OPCUT_ERROR = 1
         self.OPCUT_UNSOLVABLE = 42
+        self.OPCUT_CANCELLED = 43
 
         self.OPCUT_METHOD_GREEDY = 0
         self.OPCUT_METHOD_FORWARD_GREEDY = 1
+        self.OPCUT_METHOD_BEAM = 2
 
         self.opcut_malloc_t = ctypes.c_void_p
         self.opcut_free_t = ctypes.c_void_p
         self.opcut_allocator_t_p = ctypes.c_void_p
+        self.opcut_progress_t = ctypes.CFUNCTYPE(None, ctypes.c_void_p,
+                                                 ctypes.c_size_t,
+                                                 ctypes.c_size_t,
+                                                 ctypes.c_double)
 
         self.opcut_panel_t = type('opcut_panel_t', (ctypes.Structure, ), {})
         self.opcut_panel_t._fields_ = [
             ('width', ctypes.c_double),
             ('height', ctypes.c_double),
-            ('area', ctypes.c_double)]
+            ('quantity', ctypes.c_size_t),
+            ('area', ctypes.c_double),
+            ('offset', ctypes.c_size_t)]
 
         self.opcut_item_t = type('opcut_item_t', (ctypes.Structure, ), {})
         self.opcut_item_t._fields_ = [
             ('width', ctypes.c_double),
             ('height', ctypes.c_double),
             ('can_rotate', ctypes.c_bool),
-            ('area', ctypes.c_double)]
+            ('quantity', ctypes.c_size_t),
+            ('area', ctypes.c_double),
+            ('order', ctypes.c_double)]
 
         self.opcut_params_t = type('opcut_params_t', (ctypes.Structure, ), {})
         self.opcut_params_t._fields_ = [
@@ -142,11 +467,21 @@ class _Lib:
             ('panels_len', ctypes.c_size_t),
             ('items', ctypes.POINTER(self.opcut_item_t)),
             ('items_len', ctypes.c_size_t),
-            ('panels_area', ctypes.c_double)]
+            ('timeout', ctypes.c_double),
+            ('threads', ctypes.c_size_t),
+            ('beam_width', ctypes.c_size_t),
+            ('cache_size', ctypes.c_size_t),
+            ('cancel', ctypes.POINTER(ctypes.c_bool)),
+            ('progress', self.opcut_progress_t),
+            ('progress_data', ctypes.c_void_p),
+            ('panels_area', ctypes.c_double),
+            ('panel_instances_len', ctypes.c_size_t),
+            ('item_instances_len', ctypes.c_size_t)]
 
         self.opcut_used_t = type('opcut_used_t', (ctypes.Structure, ), {})
         self.opcut_used_t._fields_ = [
             ('panel_id', ctypes.c_size_t),
+            ('panel_index', ctypes.c_size_t),
             ('item_id', ctypes.c_size_t),
             ('x', ctypes.c_double),
             ('y', ctypes.c_double),
@@ -156,6 +491,7 @@ class _Lib:
         self.opcut_unused_t = type('opcut_unused_t', (ctypes.Structure, ), {})
         self.opcut_unused_t._fields_ = [
             ('panel_id', ctypes.c_size_t),
+            ('panel_index', ctypes.c_size_t),
             ('width', ctypes.c_double),
             ('height', ctypes.c_double),
             ('x', ctypes.c_double),
@@ -164,6 +500,57 @@ class _Lib:
             ('area', ctypes.c_double),
             ('initial', ctypes.c_bool)]
 
+        self.opcut_panel_arrays_t = type('opcut_panel_arrays_t',
+                                         (ctypes.Structure, ), {})
+        self.opcut_panel_arrays_t._fields_ = [
+            ('width', ctypes.POINTER(ctypes.c_double)),
+            ('height', ctypes.POINTER(ctypes.c_double)),
+            ('quantity', ctypes.POINTER(ctypes.c_size_t)),
+            ('len', ctypes.c_size_t)]
+
+        self.opcut_item_arrays_t = type('opcut_item_arrays_t',
+                                        (ctypes.Structure, ), {})
+        self.opcut_item_arrays_t._fields_ = [
+            ('width', ctypes.POINTER(ctypes.c_double)),
+            ('height', ctypes.POINTER(ctypes.c_double)),
+            ('can_rotate', ctypes.POINTER(ctypes.c_bool)),
+            ('quantity', ctypes.POINTER(ctypes.c_size_t)),
+            ('order', ctypes.POINTER(ctypes.c_double)),
+            ('len', ctypes.c_size_t)]
+
+        self.opcut_used_arrays_t = type('opcut_used_arrays_t',
+                                        (ctypes.Structure, ), {})
+        self.opcut_used_arrays_t._fields_ = [
+            ('panel_ids', ctypes.POINTER(ctypes.c_size_t)),
+            ('panel_indexes', ctypes.POINTER(ctypes.c_size_t)),
+            ('item_ids', ctypes.POINTER(ctypes.c_size_t)),
+            ('x', ctypes.POINTER(ctypes.c_double)),
+            ('y', ctypes.POINTER(ctypes.c_double)),
+            ('rotate', ctypes.POINTER(ctypes.c_bool)),
+            ('len', ctypes.c_size_t)]
+
+        self.opcut_unused_arrays_t = type('opcut_unused_arrays_t',
+                                          (ctypes.Structure, ), {})
+        self.opcut_unused_arrays_t._fields_ = [
+            ('panel_ids', ctypes.POINTER(ctypes.c_size_t)),
+            ('panel_indexes', ctypes.POINTER(ctypes.c_size_t)),
+            ('width', ctypes.POINTER(ctypes.c_double)),
+            ('height', ctypes.POINTER(ctypes.c_double)),
+            ('x', ctypes.POINTER(ctypes.c_double)),
+            ('y', ctypes.POINTER(ctypes.c_double)),
+            ('len', ctypes.c_size_t)]
+
+        self.opcut_stats_t = type('opcut_stats_t', (ctypes.Structure, ), {})
+        self.opcut_stats_t._fields_ = [
+            ('cache_hits', ctypes.c_size_t),
+            ('cache_misses', ctypes.c_size_t),
+            ('pruned_candidates', ctypes.c_size_t),
+            ('generated_candidates', ctypes.c_size_t),
+            ('fitness_evaluations', ctypes.c_size_t),
+            ('rollouts', ctypes.c_size_t),
+            ('pool_blocks', ctypes.c_size_t),
+            ('peak_unused', ctypes.c_size_t)]
+
         functions = [
             (self.opcut_allocator_t_p,
              'opcut_allocator_create',
@@ -173,12 +560,29 @@ class _Lib:
              'opcut_allocator_destroy',
              [self.opcut_allocator_t_p]),
 
+            (ctypes.c_int,
+             'opcut_params_init_arrays',
+             [ctypes.POINTER(self.opcut_params_t),
+              ctypes.POINTER(self.opcut_panel_arrays_t),
+              ctypes.POINTER(self.opcut_item_arrays_t)]),
+
             (ctypes.c_int,
              'opcut_calculate',
              [self.opcut_allocator_t_p, ctypes.c_int,
               ctypes.POINTER(self.opcut_params_t),
               ctypes.POINTER(ctypes.POINTER(self.opcut_used_t)),
-              ctypes.POINTER(ctypes.POINTER(self.opcut_unused_t))])
+              ctypes.POINTER(ctypes.POINTER(self.opcut_unused_t)),
+              ctypes.POINTER(ctypes.c_bool),
+              ctypes.POINTER(self.opcut_stats_t)]),
+
+            (ctypes.c_int,
+             'opcut_calculate_arrays',
+             [self.opcut_allocator_t_p, ctypes.c_int,
+              ctypes.POINTER(self.opcut_params_t),
+              ctypes.POINTER(self.opcut_used_arrays_t),
+              ctypes.POINTER(self.opcut_unused_arrays_t),
+              ctypes.POINTER(ctypes.c_bool),
+              ctypes.POINTER(self.opcut_stats_t)])
         ]
 
         for restype, name, argtypes in functions:
@@ -188,6 +592,15 @@ class _Lib:
             setattr(self, name, function)
 
 
+_size_t_format = {4: 'I', 8: 'Q'}[ctypes.sizeof(ctypes.c_size_t)]
+
+_native_byte_orders = '@=' + ('<' if sys.byteorder == 'little' else '>')
+
+# unsigned integer formats are checked together with item size
+_column_formats = {ctypes.c_double: {'d'},
+                   ctypes.c_size_t: {'B', 'H', 'I', 'L', 'Q', 'N'},
+                   ctypes.c_bool: {'?'}}
+
 if sys.platform == 'win32':
     _lib_suffix = '.dll'
 elif sys.platform == 'darwin':
@@ -1,22 +1,17 @@
 from pathlib import Path
 import argparse
-import asyncio
+import collections
 import contextlib
-import logging.config
+import glob
+import os
 import sys
 import typing
 
-from hat import aio
 from hat import json
 
+from opcut import codec
 from opcut import common
-import opcut.calculate
-import opcut.generate
-import opcut.server
-
-
-params_schema_id: str = 'opcut://opcut.yaml#/$defs/params'
-result_schema_id: str = 'opcut://opcut.yaml#/$defs/result'
+import opcut.benchmark
 
 
 def create_argument_parser() -> argparse.ArgumentParser:
@@ -37,24 +32,128 @@ def create_argument_parser() -> argparse.ArgumentParser:
         default=common.Method.FORWARD_GREEDY_NATIVE,
         help=f"calculate method ({enum_values(common.Method)})")
     calculate.add_argument(
-        '--input-format', metavar='FORMAT', type=json.Format, default=None,
-        help=f"input params format ({enum_values(json.Format)})")
+        '--timeout', metavar='T', type=float, default=None,
+        help="calculation time budget in seconds after which remaining "
+             "items are placed with greedy method (default unlimited)")
+    calculate.add_argument(
+        '--beam-width', metavar='N', type=_positive_int, default=10,
+        help="number of partial results kept by beam methods (default 10)")
+    calculate.add_argument(
+        '--threads', metavar='N', type=_positive_int, default=None,
+        help="number of threads used by native calculation or number of "
+             "concurrent portfolio configurations (default number of CPUs)")
+    calculate.add_argument(
+        '--cache-dir', metavar='PATH', type=Path, default=None,
+        help="result cache directory (default no caching)")
     calculate.add_argument(
-        '--output-format', metavar='FORMAT', type=json.Format, default=None,
-        help=f"output result format ({enum_values(json.Format)})")
+        '--cache-max-size', metavar='MB', type=int, default=100,
+        help="maximum size of result cache in megabytes (default 100)")
+    calculate.add_argument(
+        '--stats', action='store_true',
+        help="include calculation statistics in result and print them "
+             "to stderr")
+    calculate.add_argument(
+        '--input-format', metavar='FORMAT', type=codec.Format, default=None,
+        help=f"input params format ({enum_values(codec.Format)})")
+    calculate.add_argument(
+        '--output-format', metavar='FORMAT', type=codec.Format, default=None,
+        help=f"output result format ({enum_values(codec.Format)})")
     calculate.add_argument(
         '--output', metavar='PATH', type=Path, default=Path('-'),
-        help=f"output result file path or - for stdout ({result_schema_id})")
+        help=f"output result file path or - for stdout "
+             f"({common.result_schema_id})")
     calculate.add_argument(
         'params', type=Path, default=Path('-'), nargs='?',
-        help=f"input params file path or - for stdin ({params_schema_id})")
+        help=f"input params file path or - for stdin "
+             f"({common.params_schema_id})")
+
+    calculate_batch = subparsers.add_parser(
+        'calculate-batch',
+        help='Calculates multiple params and outputs results as JSON lines.')
+    calculate_batch.add_argument(
+        '--method', metavar='METHOD', type=common.Method,
+        default=common.Method.FORWARD_GREEDY_NATIVE,
+        help=f"calculate method ({enum_values(common.Method)})")
+    calculate_batch.add_argument(
+        '--timeout', metavar='T', type=float, default=None,
+        help="single calculation time budget in seconds after which "
+             "remaining items are placed with greedy method "
+             "(default unlimited)")
+    calculate_batch.add_argument(
+        '--beam-width', metavar='N', type=_positive_int, default=10,
+        help="number of partial results kept by beam methods (default 10)")
+    calculate_batch.add_argument(
+        '--threads', metavar='N', type=_positive_int, default=None,
+        help="number of threads used by single native or portfolio "
+             "calculation (default number of CPUs divided by number of "
+             "processes)")
+    calculate_batch.add_argument(
+        '--processes', metavar='N', type=int, default=os.cpu_count() or 1,
+        help="number of calculation processes (default number of CPUs)")
+    calculate_batch.add_argument(
+        '--input-format', metavar='FORMAT', type=json.Format, default=None,
+        help=f"input params files format ({enum_values(json.Format)})")
+    calculate_batch.add_argument(
+        '--output', metavar='PATH', type=Path, default=Path('-'),
+        help="output JSON lines file path or - for stdout")
+    calculate_batch.add_argument(
+        'params', metavar='PARAMS', nargs='*', default=['-'],
+        help=f"input params directory, file path, glob pattern or - for "
+             f"stdin JSON lines ({common.params_schema_id})")
+
+    benchmark = subparsers.add_parser(
+        'benchmark',
+        help='Measures calculation methods on generated instances.')
+    benchmark.add_argument(
+        '--instance', metavar='NAME', dest='instances', action='append',
+        choices=list(opcut.benchmark.default_instances), default=None,
+        help=f"benchmark instance "
+             f"({', '.join(opcut.benchmark.default_instances)}) - can be "
+             f"specified multiple times (default all instances)")
+    benchmark.add_argument(
+        '--method', metavar='METHOD', dest='methods', action='append',
+        type=common.Method, default=None,
+        help=f"calculate method ({enum_values(common.Method)}) - can be "
+             f"specified multiple times (default all methods)")
+    benchmark.add_argument(
+        '--timeout', metavar='T', type=float, default=10,
+        help="single calculation time budget in seconds (default 10)")
+    benchmark.add_argument(
+        '--beam-width', metavar='N', type=_positive_int, default=10,
+        help="number of partial results kept by beam methods (default 10)")
+    benchmark.add_argument(
+        '--threads', metavar='N', type=_positive_int, default=None,
+        help="number of threads used by single native or portfolio "
+             "calculation (default number of CPUs)")
+    benchmark.add_argument(
+        '--repeat', metavar='N', type=int, default=1,
+        help="number of repeated measurements from which shortest is "
+             "reported (default 1)")
+    benchmark.add_argument(
+        '--compare', metavar='PATH', type=Path, default=None,
+        help="baseline benchmark output file path")
+    benchmark.add_argument(
+        '--threshold', metavar='R', type=float, default=0.1,
+        help="allowed wall time increase ratio compared to baseline "
+             "(default 0.1)")
+    benchmark.add_argument(
+        '--startup', action='store_true',
+        help="measure startup of calculate action instead of calculation "
+             "methods")
+    benchmark.add_argument(
+        '--startup-budget', metavar='MS', type=float, default=400,
+        help="maximum import time of calculate action in milliseconds "
+             "(default 400)")
+    benchmark.add_argument(
+        '--output', metavar='PATH', type=Path, default=Path('-'),
+        help="output JSON file path or - for stdout")
 
     generate = subparsers.add_parser(
         'generate',
         help='Renders a cut list as an image file.')
     generate.add_argument(
-        '--input-format', metavar='FORMAT', type=json.Format, default=None,
-        help=f"input result format ({enum_values(json.Format)})")
+        '--input-format', metavar='FORMAT', type=codec.Format, default=None,
+        help=f"input result format ({enum_values(codec.Format)})")
     generate.add_argument(
         '--output-format', metavar='FORMAT', type=common.OutputFormat,
         default=common.OutputFormat.PDF,
@@ -67,7 +166,8 @@ def create_argument_parser() -> argparse.ArgumentParser:
         help="output file path or - for stdout")
     generate.add_argument(
         'result', type=Path, default=Path('-'), nargs='?',
-        help=f"input result file path or - for stdin ({result_schema_id})")
+        help=f"input result file path or - for stdin "
+             f"({common.result_schema_id})")
 
     server = subparsers.add_parser(
         'server',
@@ -81,6 +181,39 @@ def create_argument_parser() -> argparse.ArgumentParser:
     server.add_argument(
         '--timeout', metavar='T', type=float, default=300,
         help="single request timeout in seconds (default 300)")
+    server.add_argument(
+        '--workers', metavar='N', type=int, default=os.cpu_count() or 1,
+        help="number of worker processes (default number of CPUs)")
+    server.add_argument(
+        '--worker-max-jobs', metavar='N', type=int, default=None,
+        help="number of jobs executed by single worker process before it "
+             "is replaced (default unlimited)")
+    server.add_argument(
+        '--concurrency', metavar='N', type=int, default=None,
+        help="maximum number of concurrent calculations "
+             "(default number of workers)")
+    server.add_argument(
+        '--queue-size', metavar='N', type=int, default=100,
+        help="maximum number of calculations waiting for execution "
+             "(default 100)")
+    server.add_argument(
+        '--threads', metavar='N', type=_positive_int, default=None,
+        help="number of threads used by single native or portfolio "
+             "calculation (default number of CPUs divided by concurrency)")
+    server.add_argument(
+        '--history-size', metavar='N', type=int, default=1000,
+        help="number of completed calculations (and their results) kept "
+             "in memory (default 1000)")
+    server.add_argument(
+        '--history-max-size', metavar='MB', type=int, default=100,
+        help="maximum total size of completed calculation results kept in "
+             "memory in megabytes (default 100)")
+    server.add_argument(
+        '--cache-dir', metavar='PATH', type=Path, default=None,
+        help="result cache directory (default no caching)")
+    server.add_argument(
+        '--cache-max-size', metavar='MB', type=int, default=100,
+        help="maximum size of result cache in megabytes (default 100)")
     server.add_argument(
         '--log-level', metavar='LEVEL', default='info',
         choices=['critical', 'error', 'warning', 'info', 'debug', 'notset'],
@@ -95,11 +228,40 @@ def main():
 
     if args.action == 'calculate':
         calculate(method=args.method,
+                  timeout=args.timeout,
+                  threads=args.threads,
+                  beam_width=args.beam_width,
+                  cache_dir=args.cache_dir,
+                  cache_max_size=args.cache_max_size * 1024 * 1024,
+                  stats=args.stats,
                   input_format=args.input_format,
                   output_format=args.output_format,
                   result_path=args.output,
                   params_path=args.params)
 
+    elif args.action == 'calculate-batch':
+        return calculate_batch(method=args.method,
+                               timeout=args.timeout,
+                               threads=args.threads,
+                               beam_width=args.beam_width,
+                               processes=args.processes,
+                               input_format=args.input_format,
+                               output_path=args.output,
+                               params_paths=args.params)
+
+    elif args.action == 'benchmark':
+        return benchmark(instances=args.instances,
+                         methods=args.methods,
+                         timeout=args.timeout,
+                         threads=args.threads,
+                         beam_width=args.beam_width,
+                         repeat=args.repeat,
+                         baseline_path=args.compare,
+                         threshold=args.threshold,
+                         startup=args.startup,
+                         startup_budget=args.startup_budget,
+                         output_path=args.output)
+
     elif args.action == 'generate':
         generate(input_format=args.input_format,
                  output_format=args.output_format,
@@ -111,6 +273,15 @@ def main():
         server(host=args.host,
                port=args.port,
                timeout=args.timeout,
+               workers=args.workers,
+               worker_max_jobs=args.worker_max_jobs,
+               concurrency=args.concurrency,
+               queue_size=args.queue_size,
+               threads=args.threads,
+               history_size=args.history_size,
+               history_max_size=args.history_max_size * 1024 * 1024,
+               cache_dir=args.cache_dir,
+               cache_max_size=args.cache_max_size * 1024 * 1024,
                log_level=args.log_level)
 
     else:
@@ -118,70 +289,233 @@ def main():
 
 
 def calculate(method: common.Method,
-              input_format: typing.Optional[json.Format],
-              output_format: typing.Optional[json.Format],
+              timeout: typing.Optional[float],
+              threads: typing.Optional[int],
+              beam_width: int,
+              cache_dir: typing.Optional[Path],
+              cache_max_size: int,
+              stats: bool,
+              input_format: typing.Optional[codec.Format],
+              output_format: typing.Optional[codec.Format],
               result_path: Path,
               params_path: Path):
-    if input_format is None and params_path == Path('-'):
-        input_format = json.Format.JSON
+    import opcut.cache
+    import opcut.calculate
 
-    if output_format is None and result_path == Path('-'):
-        output_format = json.Format.JSON
+    params = codec.decode_params(_read_input(params_path),
+                                 _get_format(input_format, params_path))
 
-    params_json = (json.decode_stream(sys.stdin, input_format)
-                   if params_path == Path('-')
-                   else json.decode_file(params_path, input_format))
+    cache = (opcut.cache.create_result_cache(cache_dir, cache_max_size)
+             if cache_dir else None)
+    result_json = cache.get(method, params, beam_width) if cache else None
 
-    validator = json.DefaultSchemaValidator(common.json_schema_repo)
-    validator.validate(params_schema_id, params_json)
-    params = common.params_from_json(params_json)
+    if result_json is None:
+        try:
+            result = opcut.calculate.calculate(method=method,
+                                               params=params,
+                                               timeout=timeout,
+                                               threads=threads,
+                                               beam_width=beam_width)
 
-    try:
-        result = opcut.calculate.calculate(method=method,
-                                           params=params)
+        except common.UnresolvableError:
+            sys.exit(42)
+
+        if cache:
+            cache.put(method, params, beam_width,
+                      common.result_to_json(result))
 
-    except common.UnresolvableError:
-        sys.exit(42)
+        if stats:
+            _print_stats(result.stats)
 
-    result_json = common.result_to_json(result)
+    else:
+        result = common.result_from_json(result_json)
+
+        if stats:
+            print("calculation skipped (result found in cache)",
+                  file=sys.stderr)
+
+    _write_output(result_path,
+                  codec.encode_result(result,
+                                      _get_format(output_format, result_path),
+                                      include_stats=stats))
+
+
+def calculate_batch(method: common.Method,
+                    timeout: typing.Optional[float],
+                    threads: typing.Optional[int],
+                    beam_width: int,
+                    processes: int,
+                    input_format: typing.Optional[json.Format],
+                    output_path: Path,
+                    params_paths: list[str]
+                    ) -> int:
+    import opcut.calculate
+
+    entries = collections.deque()
+    status_counts = collections.Counter()
+
+    def get_params():
+        for name, params_json in _read_batch_params(params_paths,
+                                                    input_format):
+            try:
+                if isinstance(params_json, Exception):
+                    raise params_json
+
+                common.validate_params(params_json)
+                params = common.params_from_json(params_json)
+
+            except Exception as e:
+                entries.append((name, e))
+                continue
+
+            entries.append((name, None))
+            yield params
+
+    def get_outputs():
+        results = opcut.calculate.calculate_many(method=method,
+                                                 params=get_params(),
+                                                 timeout=timeout,
+                                                 threads=threads,
+                                                 beam_width=beam_width,
+                                                 processes=processes)
+
+        # entries with invalid params are not calculated and precede
+        # entry of next result
+        for result in results:
+            while True:
+                name, error = entries.popleft()
+                if error is None:
+                    yield _get_batch_output(name, result)
+                    break
+
+                yield _get_batch_output(name, error)
+
+        while entries:
+            yield _get_batch_output(*entries.popleft())
+
+    with (contextlib.nullcontext(sys.stdout.buffer)
+            if output_path == Path('-') else open(output_path, 'wb')) as f:
+        for output in get_outputs():
+            status_counts[output['status']] += 1
+            f.write(codec.encode_json(output) + b'\n')
+            f.flush()
+
+    if status_counts['error']:
+        return 1
+
+    if status_counts['unresolvable']:
+        return 42
+
+    return 0
+
+
+def benchmark(instances: typing.Optional[list[str]],
+              methods: typing.Optional[list[common.Method]],
+              timeout: typing.Optional[float],
+              threads: typing.Optional[int],
+              beam_width: int,
+              repeat: int,
+              baseline_path: typing.Optional[Path],
+              threshold: float,
+              startup: bool,
+              startup_budget: float,
+              output_path: Path
+              ) -> int:
+    if startup:
+        return _benchmark_startup(repeat=repeat,
+                                  budget=startup_budget,
+                                  output_path=output_path)
+
+    instances = {name: opcut.benchmark.generate_params(
+                     opcut.benchmark.default_instances[name])
+                 for name in (instances or opcut.benchmark.default_instances)}
+    measurements = []
+
+    # human readable report is written to stderr
+    print(f"{'instance':<14}{'method':<24}{'status':<14}{'final':<7}"
+          f"{'time [s]':>10}{'rss [MB]':>10}{'eval/s':>12}{'waste [%]':>11}",
+          file=sys.stderr)
+
+    for measurement in opcut.benchmark.run_benchmark(
+            instances=instances,
+            methods=methods or list(common.Method),
+            timeout=timeout,
+            threads=threads,
+            beam_width=beam_width,
+            repeat=repeat):
+        measurements.append(measurement)
+        print(_format_measurement(measurement), file=sys.stderr)
+
+    output_json = opcut.benchmark.benchmark_to_json(measurements)
 
-    if result_path == Path('-'):
-        json.encode_stream(result_json, sys.stdout, output_format)
+    if output_path == Path('-'):
+        json.encode_stream(output_json, sys.stdout, json.Format.JSON)
     else:
-        json.encode_file(result_json, result_path, output_format)
+        json.encode_file(output_json, output_path, json.Format.JSON)
+
+    if not baseline_path:
+        return 0
+
+    baseline = opcut.benchmark.benchmark_from_json(
+        json.decode_file(baseline_path, json.Format.JSON))
+    comparisons = opcut.benchmark.compare(baseline, measurements, threshold)
+
+    print(file=sys.stderr)
+    print(f"{'instance':<14}{'method':<24}{'baseline [s]':>14}"
+          f"{'time [s]':>10}{'ratio':>8}  regression",
+          file=sys.stderr)
+
+    for comparison in comparisons:
+        ratio = (f'{comparison.wall_time_ratio:.2f}'
+                 if comparison.wall_time_ratio is not None else '-')
+        print(f"{comparison.instance:<14}"
+              f"{comparison.method.value:<24}"
+              f"{comparison.baseline.wall_time:>14.3f}"
+              f"{comparison.measurement.wall_time:>10.3f}"
+              f"{ratio:>8}"
+              f"  {'yes' if comparison.regression else 'no'}",
+              file=sys.stderr)
 
+    return 1 if any(i.regression for i in comparisons) else 0
 
-def generate(input_format: typing.Optional[json.Format],
+
+def generate(input_format: typing.Optional[codec.Format],
              output_format: common.OutputFormat,
              panel_id: typing.Optional[str],
              output_path: Path,
              result_path: Path):
-    if input_format is None and result_path == Path('-'):
-        input_format = json.Format.JSON
-
-    result_json = (json.decode_stream(sys.stdin, input_format)
-                   if result_path == Path('-')
-                   else json.decode_file(result_path, input_format))
+    import opcut.generate
 
-    validator = json.DefaultSchemaValidator(common.json_schema_repo)
-    validator.validate(result_schema_id, result_json)
-    result = common.result_from_json(result_json)
+    result = codec.decode_result(_read_input(result_path),
+                                 _get_format(input_format, result_path))
 
     data = opcut.generate.generate(result=result,
                                    output_format=output_format,
                                    panel_id=panel_id)
 
-    if output_path == Path('-'):
-        stdout, sys.stdout = sys.stdout.detach(), None
-        stdout.write(data)
-    else:
-        output_path.write_bytes(data)
+    _write_output(output_path, data)
 
 
 def server(host: str,
            port: int,
            timeout: float,
+           workers: int,
+           worker_max_jobs: typing.Optional[int],
+           concurrency: typing.Optional[int],
+           queue_size: int,
+           threads: typing.Optional[int],
+           history_size: int,
+           history_max_size: int,
+           cache_dir: typing.Optional[Path],
+           cache_max_size: int,
            log_level: str):
+    import asyncio
+    import logging.config
+
+    from hat import aio
+
+    import opcut.server
+
     logging.config.dictConfig({
         'version': 1,
         'formatters': {
@@ -200,7 +534,16 @@ def server(host: str,
     async def run():
         server = await opcut.server.create(host=host,
                                            port=port,
-                                           timeout=timeout)
+                                           timeout=timeout,
+                                           workers=workers,
+                                           worker_max_jobs=worker_max_jobs,
+                                           concurrency=concurrency,
+                                           queue_size=queue_size,
+                                           threads=threads,
+                                           history_size=history_size,
+                                           history_max_size=history_max_size,
+                                           cache_dir=cache_dir,
+                                           cache_max_size=cache_max_size)
 
         try:
             await server.wait_closing()
@@ -213,6 +556,145 @@ def server(host: str,
         aio.run_asyncio(run())
 
 
+_batch_params_suffixes = {'.json', '.yaml', '.yml', '.toml'}
+
+
+def _benchmark_startup(repeat, budget, output_path):
+    measurement = opcut.benchmark.measure_startup(repeat)
+    output_json = opcut.benchmark.startup_to_json(measurement)
+
+    if output_path == Path('-'):
+        json.encode_stream(output_json, sys.stdout, json.Format.JSON)
+    else:
+        json.encode_file(output_json, output_path, json.Format.JSON)
+
+    import_time = measurement.import_time * 1000
+    print(f"{'wall time [ms]':<24}{measurement.wall_time * 1000:>16.1f}",
+          file=sys.stderr)
+    print(f"{'import time [ms]':<24}{import_time:>16.1f}", file=sys.stderr)
+    print(f"{'budget [ms]':<24}{budget:>16.1f}", file=sys.stderr)
+
+    for module in measurement.excluded_modules:
+        print(f"excluded module imported: {module}", file=sys.stderr)
+
+    if import_time > budget or measurement.excluded_modules:
+        return 1
+
+    return 0
+
+
+def _positive_int(value):
+    try:
+        value = int(value)
+
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid int value: {value!r}')
+
+    if value < 1:
+        raise argparse.ArgumentTypeError('value should be at least 1')
+
+    return value
+
+
+def _get_format(format, path):
+    if format is not None:
+        return format
+
+    if path == Path('-'):
+        return codec.Format.JSON
+
+    return codec.get_file_format(path)
+
+
+def _read_input(path):
+    if path == Path('-'):
+        return sys.stdin.buffer.read()
+
+    return path.read_bytes()
+
+
+def _write_output(path, data):
+    if path == Path('-'):
+        stdout, sys.stdout = sys.stdout.detach(), None
+        stdout.write(data)
+
+    else:
+        path.write_bytes(data)
+
+
+def _print_stats(stats):
+    for name, value in stats._asdict().items():
+        if isinstance(value, float):
+            value = f'{value:.6f}'
+
+        print(f"{name.replace('_', ' '):<24}{value:>16}", file=sys.stderr)
+
+
+def _format_measurement(measurement):
+    final = 'yes' if measurement.final else 'no'
+    rss = (f'{measurement.peak_rss / (1024 * 1024):.1f}'
+           if measurement.peak_rss is not None else '-')
+    evaluated_per_second = (
+        f'{measurement.evaluated / measurement.wall_time:.0f}'
+        if measurement.wall_time else '-')
+    waste = (f'{measurement.waste:.2f}'
+             if measurement.waste is not None else '-')
+
+    return (f"{measurement.instance:<14}{measurement.method.value:<24}"
+            f"{measurement.status:<14}{final:<7}"
+            f"{measurement.wall_time:>10.3f}{rss:>10}"
+            f"{evaluated_per_second:>12}{waste:>11}")
+
+
+def _read_batch_params(params_paths, input_format):
+    for params_path in params_paths:
+        if params_path == '-':
+            for i, line in enumerate(sys.stdin):
+                if not line.strip():
+                    continue
+
+                try:
+                    yield f'-:{i + 1}', codec.decode_json(line)
+
+                except Exception as e:
+                    yield f'-:{i + 1}', e
+
+            continue
+
+        path = Path(params_path)
+        if path.is_dir():
+            paths = sorted(i for i in path.iterdir()
+                           if i.suffix in _batch_params_suffixes)
+
+        elif path.exists():
+            paths = [path]
+
+        else:
+            paths = [Path(i) for i in sorted(glob.glob(params_path))]
+
+        for path in paths:
+            try:
+                yield str(path), json.decode_file(path, input_format)
+
+            except Exception as e:
+                yield str(path), e
+
+
+def _get_batch_output(name, result):
+    if isinstance(result, common.UnresolvableError):
+        return {'params': name,
+                'status': 'unresolvable'}
+
+    if isinstance(result, Exception):
+        return {'params': name,
+                'status': 'error',
+                'message': str(result) or type(result).__name__}
+
+    return {'params': name,
+            'status': 'success',
+            'result': common.result_to_json(result)}
+
+
 if __name__ == '__main__':
     sys.argv[0] = 'opcut'
     sys.exit(main())
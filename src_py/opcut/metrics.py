@@ -0,0 +1,178 @@
+"""Metrics in Prometheus text exposition format
+
+Metrics are updated and encoded only from event loop thread so no locking
+is required. Counters and histograms are updated incrementally while values
+of metrics with `get_values` callback are obtained during encoding.
+
+"""
+
+import bisect
+import collections
+import math
+import typing
+
+
+Labels: typing.TypeAlias = tuple[str, ...]
+"""label values in order of metric's label names"""
+
+GetValuesCb: typing.TypeAlias = typing.Callable[[], dict[Labels, float]]
+
+duration_buckets: tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                                       0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+"""default histogram buckets (in seconds)"""
+
+size_buckets: tuple[float, ...] = (100, 1000, 10_000, 100_000, 1_000_000,
+                                   10_000_000)
+"""histogram buckets for sizes in bytes"""
+
+
+class Counter:
+    """Monotonically increasing value
+
+    If `get_values` is provided, values are obtained by calling
+    `get_values` during encoding (`inc` should not be used).
+
+    """
+
+    def __init__(self,
+                 name: str,
+                 description: str,
+                 label_names: Labels = (),
+                 get_values: GetValuesCb | None = None):
+        self._name = name
+        self._description = description
+        self._label_names = label_names
+        self._get_values = get_values
+        self._values = collections.defaultdict(int)
+
+    def inc(self,
+            labels: Labels = (),
+            value: float = 1):
+        """Increment value associated with labels"""
+        self._values[labels] += value
+
+    def encode(self) -> str:
+        """Encode metric"""
+        values = self._get_values() if self._get_values else self._values
+        return ''.join([
+            _encode_header(self._name, self._description, 'counter'),
+            *(_encode_sample(self._name, self._label_names, labels, value)
+              for labels, value in values.items())])
+
+
+class Gauge:
+    """Value obtained by calling `get_values` during encoding"""
+
+    def __init__(self,
+                 name: str,
+                 description: str,
+                 get_values: GetValuesCb,
+                 label_names: Labels = ()):
+        self._name = name
+        self._description = description
+        self._label_names = label_names
+        self._get_values = get_values
+
+    def encode(self) -> str:
+        """Encode metric"""
+        return ''.join([
+            _encode_header(self._name, self._description, 'gauge'),
+            *(_encode_sample(self._name, self._label_names, labels, value)
+              for labels, value in self._get_values().items())])
+
+
+class Histogram:
+    """Distribution of observed values"""
+
+    def __init__(self,
+                 name: str,
+                 description: str,
+                 label_names: Labels = (),
+                 buckets: typing.Iterable[float] = duration_buckets):
+        self._name = name
+        self._description = description
+        self._label_names = label_names
+        self._buckets = sorted(buckets)
+        self._values = {}
+
+    def observe(self,
+                value: float,
+                labels: Labels = ()):
+        """Add observed value associated with labels"""
+        values = self._values.get(labels)
+        if values is None:
+            values = self._values[labels] = _HistogramValues(
+                bucket_counts=[0] * (len(self._buckets) + 1))
+
+        # bucket counts are not cumulative until encoding
+        values.bucket_counts[bisect.bisect_left(self._buckets, value)] += 1
+        values.sum += value
+
+    def encode(self) -> str:
+        """Encode metric"""
+        label_names = (*self._label_names, 'le')
+        samples = []
+
+        for labels, values in self._values.items():
+            count = 0
+            for le, bucket_count in zip([*self._buckets, math.inf],
+                                        values.bucket_counts):
+                count += bucket_count
+                samples.append(_encode_sample(f'{self._name}_bucket',
+                                              label_names,
+                                              (*labels, _encode_value(le)),
+                                              count))
+
+            samples.append(_encode_sample(f'{self._name}_sum',
+                                          self._label_names, labels,
+                                          values.sum))
+            samples.append(_encode_sample(f'{self._name}_count',
+                                          self._label_names, labels, count))
+
+        return ''.join([
+            _encode_header(self._name, self._description, 'histogram'),
+            *samples])
+
+
+Metric: typing.TypeAlias = Counter | Gauge | Histogram
+
+
+def encode(metrics: typing.Iterable[Metric]) -> str:
+    """Encode metrics in Prometheus text exposition format"""
+    return ''.join(metric.encode() for metric in metrics)
+
+
+class _HistogramValues:
+
+    def __init__(self, bucket_counts):
+        self.bucket_counts = bucket_counts
+        self.sum = 0
+
+
+def _encode_header(name, description, metric_type):
+    return f'# HELP {name} {description}\n# TYPE {name} {metric_type}\n'
+
+
+def _encode_sample(name, label_names, labels, value):
+    if not label_names:
+        return f'{name} {_encode_value(value)}\n'
+
+    labels_str = ','.join(f'{label_name}="{_escape_label(label)}"'
+                          for label_name, label in zip(label_names, labels))
+    return f'{name}{{{labels_str}}} {_encode_value(value)}\n'
+
+
+def _encode_value(value):
+    if value == math.inf:
+        return '+Inf'
+
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+
+    return str(value)
+
+
+def _escape_label(label):
+    return (str(label).replace('\\', r'\\')
+                      .replace('"', r'\"')
+                      .replace('\n', r'\n'))
@@ -0,0 +1,317 @@
+import asyncio
+import collections
+import contextlib
+import subprocess
+import sys
+
+from hat import aio
+from hat import json
+
+from opcut import common
+import opcut.worker
+
+
+class WorkerError(Exception):
+    """Exception raised when worker fails to execute request"""
+
+
+async def create_pool(size: int,
+                      max_jobs: int | None = None
+                      ) -> 'Pool':
+    """Create worker process pool
+
+    Pool runs at most `size` concurrent jobs. Each worker process is
+    replaced after executing `max_jobs` jobs (if `max_jobs` is ``None``,
+    workers are reused indefinitely). Worker which is interrupted during job
+    execution (e.g. because of timeout) is killed and replaced.
+
+    """
+    pool = Pool()
+    pool._size = size
+    pool._max_jobs = max_jobs
+    pool._async_group = aio.Group()
+    pool._semaphore = asyncio.Semaphore(size)
+    pool._idle_workers = collections.deque()
+    pool._idle_event = asyncio.Event()
+    pool._pending_count = 0
+    pool._active_count = 0
+    pool._spawned_count = 0
+    pool._exit_counts = collections.Counter()
+
+    pool.async_group.spawn(aio.call_on_cancel, pool._close_workers)
+
+    try:
+        for _ in range(size):
+            pool._idle_workers.append(await pool._create_worker())
+
+    except BaseException:
+        await aio.uncancellable(pool.async_close())
+        raise
+
+    return pool
+
+
+class Pool(aio.Resource):
+
+    @property
+    def async_group(self) -> aio.Group:
+        return self._async_group
+
+    @property
+    def active_count(self) -> int:
+        """Number of workers executing job"""
+        return self._active_count
+
+    @property
+    def idle_count(self) -> int:
+        """Number of workers waiting for job"""
+        return len(self._idle_workers)
+
+    @property
+    def spawned_count(self) -> int:
+        """Number of spawned worker processes"""
+        return self._spawned_count
+
+    @property
+    def exit_counts(self) -> dict[int, int]:
+        """Number of exited worker processes per exit code"""
+        return dict(self._exit_counts)
+
+    async def calculate(self,
+                        method: common.Method,
+                        params: json.Data,
+                        timeout: float | None = None,
+                        threads: int | None = None,
+                        beam_width: int = 10,
+                        progress_cb: common.ProgressCb | None = None,
+                        progress_interval: float = 0.2
+                        ) -> json.Data:
+        """Calculate result
+
+        Argument `params` and returned result are json serializable data
+        specified by ``opcut://opcut.yaml#/$defs/params`` and
+        ``opcut://opcut.yaml#/$defs/result``. Arguments `timeout`,
+        `threads` and `beam_width` are passed to
+        `opcut.calculate.calculate`.
+
+        If `progress_cb` is provided, it is called at most once per
+        `progress_interval` seconds during calculation.
+
+        """
+        header = {'action': 'calculate',
+                  'method': method.value,
+                  'params': params,
+                  'timeout': timeout,
+                  'threads': threads,
+                  'beam_width': beam_width}
+        if progress_cb:
+            header['progress_interval'] = progress_interval
+
+        header, _ = await self._execute(header, progress_cb=progress_cb)
+        return header['result']
+
+    async def generate(self,
+                       output_format: common.OutputFormat,
+                       panel_id: str | None,
+                       result: json.Data
+                       ) -> bytes:
+        """Generate output
+
+        Argument `result` is json serializable data specified by
+        ``opcut://opcut.yaml#/$defs/result``.
+
+        """
+        _, payload = await self._execute({'action': 'generate',
+                                          'output_format': output_format.value,
+                                          'panel': panel_id,
+                                          'result': result})
+        return payload
+
+    async def _execute(self, header, payload=b'', progress_cb=None):
+        async with self._semaphore:
+            if not self.is_open:
+                raise Exception('pool is not open')
+
+            worker = await self._get_worker()
+            self._active_count += 1
+
+            try:
+                header, payload = await worker.execute(header, payload,
+                                                       progress_cb)
+
+            except BaseException:
+                worker.close()
+                raise
+
+            finally:
+                self._active_count -= 1
+                self._put_worker(worker)
+
+        status = header.get('status')
+
+        if status == 'success':
+            return header, payload
+
+        if status == 'unresolvable':
+            raise common.UnresolvableError()
+
+        raise WorkerError(header.get('message') or 'Internal error')
+
+    async def _get_worker(self):
+        # replacement worker which is being created is preferred to creating
+        # new worker
+        while True:
+            while self._idle_workers:
+                worker = self._idle_workers.popleft()
+                if worker.is_open:
+                    return worker
+
+            if not self._pending_count:
+                break
+
+            self._idle_event.clear()
+            await self._idle_event.wait()
+
+        worker = await self._create_worker()
+        if not self.is_open:
+            await aio.uncancellable(worker.async_close())
+            raise Exception('pool is not open')
+
+        return worker
+
+    def _put_worker(self, worker):
+        if not self.is_open:
+            worker.close()
+            return
+
+        if (worker.is_open and
+                (self._max_jobs is None or worker.jobs < self._max_jobs)):
+            self._idle_workers.append(worker)
+            return
+
+        worker.close()
+        self._pending_count += 1
+        self.async_group.spawn(self._add_idle_worker)
+
+    async def _add_idle_worker(self):
+        try:
+            worker = await self._create_worker()
+
+        finally:
+            self._pending_count -= 1
+            self._idle_event.set()
+
+        if (self.is_open and
+                len(self._idle_workers) + self._active_count < self._size):
+            self._idle_workers.append(worker)
+
+        else:
+            await aio.uncancellable(worker.async_close())
+
+    async def _create_worker(self):
+        worker = await _create_worker(self._on_worker_exit)
+        self._spawned_count += 1
+        return worker
+
+    def _on_worker_exit(self, returncode):
+        self._exit_counts[returncode] += 1
+
+    async def _close_workers(self):
+        while self._idle_workers:
+            worker = self._idle_workers.popleft()
+            await aio.uncancellable(worker.async_close())
+
+
+async def _create_worker(exit_cb):
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, '-m', 'opcut.worker',
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE)
+
+    worker = _Worker()
+    worker._process = process
+    worker._exit_cb = exit_cb
+    worker._exit_reported = False
+    worker._jobs = 0
+    worker._async_group = aio.Group()
+
+    worker.async_group.spawn(aio.call_on_cancel, worker._terminate)
+    worker.async_group.spawn(worker._wait_loop)
+
+    return worker
+
+
+class _Worker(aio.Resource):
+
+    @property
+    def async_group(self):
+        return self._async_group
+
+    @property
+    def jobs(self):
+        return self._jobs
+
+    async def execute(self, header, payload, progress_cb=None):
+        if not self.is_open:
+            raise Exception('worker is not open')
+
+        self._jobs += 1
+
+        stdin = self._process.stdin
+        stdin.write(opcut.worker.encode_message(header, payload))
+        await stdin.drain()
+
+        while True:
+            header, payload = await self._read_message()
+            if header.get('status') != 'progress':
+                return header, payload
+
+            if progress_cb:
+                progress_cb(header['placed'], header['evaluated'],
+                            header['fitness'])
+
+    async def _read_message(self):
+        stdout = self._process.stdout
+
+        try:
+            prefix = await stdout.readexactly(
+                opcut.worker.message_prefix_size)
+            header_size, payload_size = opcut.worker.decode_message_prefix(
+                prefix)
+            header = opcut.worker.decode_message_header(
+                await stdout.readexactly(header_size))
+            payload = await stdout.readexactly(payload_size)
+
+        except asyncio.IncompleteReadError:
+            self.close()
+            raise Exception('worker terminated')
+
+        return header, payload
+
+    async def _wait_loop(self):
+        try:
+            await self._process.wait()
+            self._report_exit()
+
+        finally:
+            self.close()
+
+    async def _terminate(self):
+        # worker which closed stdout is already exiting - signaling it could
+        # reap process before its exit status is reported
+        if self._process.stdout.at_eof():
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._process.wait(), 1)
+
+        if self._process.returncode is None:
+            self._process.terminate()
+
+        await self._process.wait()
+        self._report_exit()
+
+    def _report_exit(self):
+        if self._exit_reported:
+            return
+
+        self._exit_reported = True
+        self._exit_cb(self._process.returncode)
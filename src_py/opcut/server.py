@@ -1,39 +1,96 @@
+from pathlib import Path
 import asyncio
 import contextlib
 import importlib.resources
-import subprocess
-import sys
+import time
 
 from hat import aio
-from hat import json
 import aiohttp.web
 
+from opcut import codec
 from opcut import common
+import opcut.cache
+import opcut.jobs
+import opcut.metrics
+import opcut.pool
 
 
 async def create(host: str,
                  port: int,
-                 timeout: float
+                 timeout: float,
+                 workers: int,
+                 worker_max_jobs: int | None = None,
+                 concurrency: int | None = None,
+                 queue_size: int = 100,
+                 threads: int | None = None,
+                 history_size: int = 1000,
+                 history_max_size: int = 100 * 1024 * 1024,
+                 cache_dir: Path | None = None,
+                 cache_max_size: int = 100 * 1024 * 1024
                  ) -> 'Server':
     server = Server()
     server._timeout = timeout
     server._async_group = aio.Group()
-    server._validator = json.DefaultSchemaValidator(common.json_schema_repo)
+    server._cache = (opcut.cache.create_result_cache(cache_dir,
+                                                     cache_max_size)
+                     if cache_dir else None)
+    server._inflight_jobs = {}
+    server._requests_in_flight = 0
+    server._generate_timeouts = 0
+    server._requests = opcut.metrics.Counter(
+        'opcut_http_requests_total', 'number of HTTP requests',
+        ('path', 'method', 'output_format', 'status'))
+    server._request_durations = opcut.metrics.Histogram(
+        'opcut_http_request_duration_seconds', 'HTTP request duration',
+        ('path', 'method', 'output_format'))
+    server._request_sizes = opcut.metrics.Histogram(
+        'opcut_http_request_size_bytes', 'HTTP request body size',
+        ('path', ), opcut.metrics.size_buckets)
+    server._response_sizes = opcut.metrics.Histogram(
+        'opcut_http_response_size_bytes', 'HTTP response body size',
+        ('path', ), opcut.metrics.size_buckets)
 
     try:
+        server._pool = await opcut.pool.create_pool(size=workers,
+                                                    max_jobs=worker_max_jobs)
+        server.async_group.spawn(aio.call_on_cancel, server._pool.async_close)
+
+        server._jobs = await opcut.jobs.create_job_queue(
+            pool=server._pool,
+            timeout=timeout,
+            concurrency=concurrency or workers,
+            queue_size=queue_size,
+            history_size=history_size,
+            history_max_size=history_max_size,
+            threads=threads,
+            cache=server._cache)
+        server.async_group.spawn(aio.call_on_cancel, server._jobs.async_close)
+
         exit_stack = contextlib.ExitStack()
         static_dir = exit_stack.enter_context(
             importlib.resources.path(__package__, 'ui'))
         server.async_group.spawn(aio.call_on_cancel, exit_stack.close)
 
-        app = aiohttp.web.Application()
+        app = aiohttp.web.Application(middlewares=[server._metrics_middleware])
+        app.on_response_prepare.append(server._on_response_prepare)
         app.add_routes([
             aiohttp.web.get('/', server._root_handler),
             aiohttp.web.post('/calculate', server._calculate_handler),
+            aiohttp.web.post('/calculate/stream',
+                             server._calculate_stream_handler),
             aiohttp.web.post('/generate', server._generate_handler),
+            aiohttp.web.post('/jobs', server._submit_job_handler),
+            aiohttp.web.get('/jobs/{job_id}', server._get_job_handler),
+            aiohttp.web.get('/jobs/{job_id}/result',
+                            server._get_job_result_handler),
+            aiohttp.web.delete('/jobs/{job_id}', server._cancel_job_handler),
+            aiohttp.web.get('/cache', server._get_cache_handler),
+            aiohttp.web.get('/metrics', server._get_metrics_handler),
             aiohttp.web.static('/', static_dir)])
 
-        runner = aiohttp.web.AppRunner(app)
+        # handlers are cancelled when client disconnects (releasing shared
+        # calculation jobs)
+        runner = aiohttp.web.AppRunner(app, handler_cancellation=True)
         await runner.setup()
         server.async_group.spawn(aio.call_on_cancel, runner.cleanup)
 
@@ -57,52 +114,334 @@ class Server(aio.Resource):
     def async_group(self):
         return self._async_group
 
+    @aiohttp.web.middleware
+    async def _metrics_middleware(self, request, handler):
+        # metrics are updated only from event loop thread (without locking)
+        start = time.monotonic()
+        response = None
+        self._requests_in_flight += 1
+
+        try:
+            response = await handler(request)
+            return response
+
+        finally:
+            self._requests_in_flight -= 1
+
+            path, method, output_format = _get_request_labels(request)
+            self._request_durations.observe(time.monotonic() - start,
+                                            (path, method, output_format))
+            self._request_sizes.observe(request.content_length or 0,
+                                        (path, ))
+
+            # streamed responses are prepared and written by handler
+            if (response is not None and response.prepared and
+                    response.content_length is None):
+                self._response_sizes.observe(response.body_length, (path, ))
+
+    async def _on_response_prepare(self, request, response):
+        # final status is known only once response is prepared (e.g. file
+        # responses and exceptions are prepared after middleware returns)
+        path, method, output_format = _get_request_labels(request)
+        self._requests.inc((path, method, output_format,
+                            str(response.status)))
+
+        if response.content_length is not None:
+            self._response_sizes.observe(response.content_length, (path, ))
+
     async def _root_handler(self, request):
         raise aiohttp.web.HTTPFound('/index.html')
 
     async def _calculate_handler(self, request):
         try:
-            data = await request.json()
-            self._validator.validate('opcut://opcut.yaml#/$defs/params', data)
+            data = await _read_params(request)
+
+            method = common.Method(request.query['method'])
+            beam_width = _get_beam_width(request)
 
         except Exception:
             return aiohttp.web.Response(status=400,
                                         text="Invalid request")
 
-        method = common.Method(request.query['method'])
-        params = common.params_from_json(data)
+        try:
+            key, job = self._acquire_job(method, data, beam_width)
+
+        except opcut.jobs.QueueFullError:
+            return _queue_full_response()
 
         try:
-            result = await asyncio.wait_for(_calculate(method, params),
-                                            self._timeout)
-            return aiohttp.web.json_response(result)
+            result = await self._jobs.wait_result(job.id)
+            return _result_response(request, result,
+                                    headers={'Result-Id': job.id})
 
-        except asyncio.TimeoutError:
-            return aiohttp.web.Response(status=400,
-                                        text='Request timeout')
+        except (common.UnresolvableError, opcut.jobs.JobFailedError) as e:
+            return _job_error_response(e)
+
+        finally:
+            self._release_job(key, job.id)
+
+    async def _calculate_stream_handler(self, request):
+        try:
+            data = await _read_params(request)
+
+            method = common.Method(request.query['method'])
+            beam_width = _get_beam_width(request)
 
-        except common.UnresolvableError:
+        except Exception:
             return aiohttp.web.Response(status=400,
-                                        text='Result is not solvable')
+                                        text="Invalid request")
 
-    async def _generate_handler(self, request):
         try:
-            data = await request.json()
-            self._validator.validate('opcut://opcut.yaml#/$defs/result', data)
+            key, job = self._acquire_job(method, data, beam_width)
+
+        except opcut.jobs.QueueFullError:
+            return _queue_full_response()
+
+        events = aio.Queue()
+
+        # progress callback is registered before first await (job can be
+        # removed from job history while response is prepared)
+        progress_cb_handle = self._jobs.register_progress_cb(
+            job.id,
+            lambda progress: events.put_nowait(
+                ('progress', progress._asdict())))
+
+        async def wait_result():
+            try:
+                result = await self._jobs.wait_result(job.id)
+                events.put_nowait(('result', result))
+
+            except (common.UnresolvableError,
+                    opcut.jobs.JobFailedError) as e:
+                events.put_nowait(
+                    ('error', {'message': opcut.jobs.get_error_message(e)}))
+
+            except ValueError:
+                events.put_nowait(('error', {'message': 'Job not found'}))
+
+        response = aiohttp.web.StreamResponse(
+            headers={'Content-Type': 'text/event-stream',
+                     'Cache-Control': 'no-cache'})
+
+        # job is released when client disconnects (handler is cancelled or
+        # writing of progress or keepalive event fails)
+        try:
+            await response.prepare(request)
+            await _write_event(response, 'job',
+                               opcut.jobs.job_info_to_json(job))
+
+            async with self.async_group.create_subgroup() as group:
+                group.spawn(wait_result)
+
+                while True:
+                    try:
+                        event, event_data = await asyncio.wait_for(
+                            events.get(), _keepalive_interval)
+
+                    except asyncio.TimeoutError:
+                        await response.write(b': keepalive\n\n')
+                        continue
+
+                    await _write_event(response, event, event_data)
+                    if event != 'progress':
+                        break
+
+            await response.write_eof()
+            return response
+
+        except ConnectionResetError:
+            return response
+
+        finally:
+            if progress_cb_handle:
+                progress_cb_handle.cancel()
+
+            self._release_job(key, job.id)
+
+    async def _submit_job_handler(self, request):
+        try:
+            data = await _read_params(request)
+            method = common.Method(request.query['method'])
+            beam_width = _get_beam_width(request)
 
         except Exception:
             return aiohttp.web.Response(status=400,
                                         text="Invalid request")
 
+        try:
+            job = self._jobs.submit(method, data, beam_width)
+
+        except opcut.jobs.QueueFullError:
+            return _queue_full_response()
+
+        return _json_response(
+            opcut.jobs.job_info_to_json(job),
+            status=202,
+            headers={'Location': f'jobs/{job.id}'})
+
+    async def _get_job_handler(self, request):
+        job = self._jobs.get_info(request.match_info['job_id'])
+        if not job:
+            return _job_not_found_response()
+
+        return _json_response(opcut.jobs.job_info_to_json(job))
+
+    async def _get_job_result_handler(self, request):
+        job = self._jobs.get_info(request.match_info['job_id'])
+        if not job:
+            return _job_not_found_response()
+
+        if job.status == opcut.jobs.JobStatus.DONE:
+            return _result_response(request,
+                                    self._jobs.get_result(job.id),
+                                    headers={'Result-Id': job.id})
+
+        if job.status in (opcut.jobs.JobStatus.QUEUED,
+                          opcut.jobs.JobStatus.RUNNING):
+            return aiohttp.web.Response(status=409,
+                                        text='Job not completed')
+
+        return _job_error_response(self._jobs.get_error(job.id))
+
+    async def _cancel_job_handler(self, request):
+        job = self._jobs.cancel(request.match_info['job_id'])
+        if not job:
+            return _job_not_found_response()
+
+        return _json_response(opcut.jobs.job_info_to_json(job))
+
+    async def _get_cache_handler(self, request):
+        if not self._cache:
+            return aiohttp.web.Response(status=404,
+                                        text='Cache not enabled')
+
+        return _json_response(self._cache.stats._asdict())
+
+    async def _get_metrics_handler(self, request):
+        metrics = [
+            self._requests,
+            self._request_durations,
+            self._request_sizes,
+            self._response_sizes,
+            opcut.metrics.Gauge(
+                'opcut_http_requests_in_flight',
+                'number of HTTP requests in progress',
+                lambda: {(): self._requests_in_flight}),
+            opcut.metrics.Gauge(
+                'opcut_calculations_queued',
+                'number of calculations waiting for execution',
+                lambda: {(): self._jobs.queued_count}),
+            opcut.metrics.Gauge(
+                'opcut_calculations_running',
+                'number of running calculations',
+                lambda: {(): self._jobs.running_count}),
+            opcut.metrics.Counter(
+                'opcut_calculations_total',
+                'number of completed calculations',
+                ('method', 'outcome'),
+                lambda: {(method.value, outcome): count
+                         for (method, outcome), count
+                         in self._jobs.completed_counts.items()}),
+            opcut.metrics.Counter(
+                'opcut_timeouts_total',
+                'number of timed out calculations and generations',
+                ('operation', ),
+                self._get_timeout_counts),
+            opcut.metrics.Gauge(
+                'opcut_workers',
+                'number of worker processes',
+                lambda: {('active', ): self._pool.active_count,
+                         ('idle', ): self._pool.idle_count},
+                ('state', )),
+            opcut.metrics.Counter(
+                'opcut_worker_spawns_total',
+                'number of spawned worker processes',
+                get_values=lambda: {(): self._pool.spawned_count}),
+            opcut.metrics.Counter(
+                'opcut_worker_exits_total',
+                'number of exited worker processes',
+                ('code', ),
+                lambda: {(str(code), ): count
+                         for code, count in self._pool.exit_counts.items()})]
+
+        if self._cache:
+            metrics.append(opcut.metrics.Counter(
+                'opcut_cache_requests_total',
+                'number of result cache lookups',
+                ('result', ),
+                lambda: {('hit', ): self._cache.stats.hits,
+                         ('miss', ): self._cache.stats.misses}))
+
+        return aiohttp.web.Response(
+            body=opcut.metrics.encode(metrics).encode('utf-8'),
+            headers={'Content-Type': _metrics_content_type})
+
+    def _get_timeout_counts(self):
+        calculate_timeouts = sum(
+            count
+            for (_, outcome), count in self._jobs.completed_counts.items()
+            if outcome == 'timeout')
+
+        return {('calculate', ): calculate_timeouts,
+                ('generate', ): self._generate_timeouts}
+
+    def _acquire_job(self, method, data, beam_width):
+        # identical calculation requests share single queued or running
+        # job which is cancelled once all requests are released
+        key = opcut.cache.get_key(method, common.params_from_json(data),
+                                  beam_width)
+
+        inflight_job = self._inflight_jobs.get(key)
+        if inflight_job:
+            job = self._jobs.get_info(inflight_job.job_id)
+            if job and job.status in (opcut.jobs.JobStatus.QUEUED,
+                                      opcut.jobs.JobStatus.RUNNING):
+                inflight_job.refcount += 1
+                return key, job
+
+        job = self._jobs.submit(method, data, beam_width)
+        self._inflight_jobs[key] = _InflightJob(job.id)
+        return key, job
+
+    def _release_job(self, key, job_id):
+        inflight_job = self._inflight_jobs.get(key)
+        if inflight_job and inflight_job.job_id == job_id:
+            inflight_job.refcount -= 1
+            if inflight_job.refcount > 0:
+                return
+
+            del self._inflight_jobs[key]
+
+        self._jobs.cancel(job_id)
+
+    async def _generate_handler(self, request):
+        result_id = request.query.get('result_id')
+
+        if result_id is not None:
+            # results of completed jobs are already valid
+            data = self._jobs.get_result(result_id)
+            if data is None:
+                return aiohttp.web.Response(status=404,
+                                            text='Result not found')
+
+        else:
+            try:
+                data = await _read_result(request)
+
+            except Exception:
+                return aiohttp.web.Response(status=400,
+                                            text="Invalid request")
+
         output_format = common.OutputFormat(request.query['output_format'])
         panel = request.query.get('panel')
-        result = common.result_from_json(data)
 
         try:
             output = await asyncio.wait_for(
-                _generate(output_format, panel, result), self._timeout)
+                self._pool.generate(output_format, panel, data),
+                self._timeout)
 
         except asyncio.TimeoutError:
+            self._generate_timeouts += 1
             return aiohttp.web.Response(status=400,
                                         text='Request timeout')
 
@@ -119,59 +458,136 @@ class Server(aio.Resource):
                                     content_type=content_type)
 
 
-async def _calculate(method, params):
-    args = [sys.executable, '-m', 'opcut', 'calculate',
-            '--method', method.value]
-    stdint_data = json.encode(common.params_to_json(params)).encode('utf-8')
+_keepalive_interval = 5
 
-    p = await asyncio.create_subprocess_exec(*args,
-                                             stdin=subprocess.PIPE,
-                                             stdout=subprocess.PIPE,
-                                             stderr=subprocess.PIPE)
+_metrics_content_type = 'text/plain; version=0.0.4; charset=utf-8'
 
-    stderr_data = None
-    try:
-        stdout_data, stderr_data = await p.communicate(stdint_data)
+_methods = {method.value for method in common.Method}
 
-    finally:
-        if p.returncode is None:
-            p.terminate()
+_output_formats = {output_format.value
+                   for output_format in common.OutputFormat}
 
-    if p.returncode == 0:
-        return json.decode(stdout_data.decode('utf-8'))
 
-    if p.returncode == 42:
-        raise common.UnresolvableError()
+async def _write_event(response, event, data):
+    await response.write(b'event: %s\ndata: %s\n\n' % (
+        event.encode('utf-8'), codec.encode_json(data)))
 
-    if not stderr_data:
-        raise Exception()
 
-    raise Exception(stderr_data.decode('utf-8'))
+async def _read_params(request):
+    body = await request.read()
 
+    # binary params are validated by decoding
+    if request.content_type == codec.binary_content_type:
+        params = codec.decode_params(body, codec.Format.BINARY)
+        return common.params_to_json(params)
 
-async def _generate(output_format, panel, result):
-    args = [sys.executable, '-m', 'opcut', 'generate',
-            '--output-format', output_format.value,
-            *(['--panel', panel] if panel else [])]
-    stdint_data = json.encode(common.result_to_json(result)).encode('utf-8')
+    data = codec.decode_json(body)
+    common.validate_params(data)
+    return data
 
-    p = await asyncio.create_subprocess_exec(*args,
-                                             stdin=subprocess.PIPE,
-                                             stdout=subprocess.PIPE,
-                                             stderr=subprocess.PIPE)
 
-    stderr_data = None
-    try:
-        stdout_data, stderr_data = await p.communicate(stdint_data)
+async def _read_result(request):
+    body = await request.read()
+
+    # binary result is validated by decoding
+    if request.content_type == codec.binary_content_type:
+        result = codec.decode_result(body, codec.Format.BINARY)
+        return common.result_to_json(result)
+
+    data = codec.decode_json(body)
+    common.validate_result(data)
+    return data
+
+
+def _json_response(data, status=200, headers=None):
+    return aiohttp.web.Response(body=codec.encode_json(data),
+                                status=status,
+                                headers=headers,
+                                content_type=codec.json_content_type)
+
+
+def _result_response(request, result, headers=None):
+    if not _accepts_binary(request):
+        return _json_response(result, headers=headers)
+
+    result = common.result_from_json(result)
+    return aiohttp.web.Response(
+        body=codec.encode_result(result, codec.Format.BINARY,
+                                 include_stats=True),
+        headers=headers,
+        content_type=codec.binary_content_type)
+
+
+class _InflightJob:
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.refcount = 1
+
+
+def _get_beam_width(request):
+    beam_width = int(request.query.get('beam_width', 10))
+    if beam_width < 1:
+        raise ValueError('invalid beam width')
+
+    return beam_width
+
+
+def _get_request_labels(request):
+    route = request.match_info.route
+    path = route.resource.canonical if route.resource else ''
+    method = _get_label(request.query.get('method'), _methods)
+    output_format = _get_label(request.query.get('output_format'),
+                               _output_formats)
+    return path, method, output_format
+
+
+def _get_label(value, values):
+    # query values are limited to known values (bounded label cardinality)
+    if value is None:
+        return ''
+
+    return value if value in values else 'invalid'
+
+
+def _accepts_binary(request):
+    # binary is used only if it is not less preferred than JSON
+    qualities = {}
+    for media_range in request.headers.get('Accept', '').split(','):
+        media_type, *media_params = (i.strip()
+                                     for i in media_range.split(';'))
+        quality = 1
+        for media_param in media_params:
+            name, _, value = media_param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+
+                except ValueError:
+                    quality = 0
+
+        qualities[media_type] = quality
+
+    binary_quality = qualities.get(codec.binary_content_type, 0)
+    json_quality = max(qualities.get(codec.json_content_type, 0),
+                       qualities.get('application/*', 0),
+                       qualities.get('*/*', 0))
+    return binary_quality > 0 and binary_quality >= json_quality
+
+
+def _job_error_response(e):
+    # internal errors are not caused by request
+    status = 500 if isinstance(e, opcut.jobs.JobInternalError) else 400
+    return aiohttp.web.Response(status=status,
+                                text=opcut.jobs.get_error_message(e))
 
-    finally:
-        if p.returncode is None:
-            p.terminate()
 
-    if p.returncode == 0:
-        return stdout_data
+def _queue_full_response():
+    return aiohttp.web.Response(status=503,
+                                text='Server is busy',
+                                headers={'Retry-After': '1'})
 
-    if not stderr_data:
-        raise Exception()
 
-    raise Exception(stderr_data.decode('utf-8'))
+def _job_not_found_response():
+    return aiohttp.web.Response(status=404,
+                                text='Job not found')
@@ -0,0 +1,138 @@
+"""Worker process
+
+Long-lived process reading requests from stdin and writing responses to
+stdout. Each message is JSON header followed by optional binary payload.
+Received data is expected to be already validated.
+
+If calculate request contains `progress_interval`, messages with
+``progress`` status are written (at most once per `progress_interval`
+seconds) before response.
+
+Generate module (and its cairo dependency) is imported on first generate
+request. Traceback of failed request is written to stderr.
+"""
+
+import struct
+import sys
+import time
+import traceback
+
+from hat import json
+
+from opcut import codec
+from opcut import common
+import opcut.calculate
+
+
+message_prefix_size: int = 8
+
+_message_prefix = struct.Struct('>II')
+
+
+def encode_message(header: json.Data,
+                   payload: bytes = b''
+                   ) -> bytes:
+    """Encode message"""
+    header_bytes = codec.encode_json(header)
+    return (_message_prefix.pack(len(header_bytes), len(payload)) +
+            header_bytes + payload)
+
+
+def decode_message_prefix(data: bytes) -> tuple[int, int]:
+    """Decode message prefix into header and payload sizes"""
+    return _message_prefix.unpack(data)
+
+
+def decode_message_header(data: bytes) -> json.Data:
+    """Decode message header"""
+    return codec.decode_json(data)
+
+
+def main():
+    stdin = sys.stdin.buffer
+    stdout = sys.stdout.buffer
+
+    while True:
+        request = _read_message(stdin)
+        if request is None:
+            break
+
+        response = _process_request(*request, stdout)
+
+        stdout.write(encode_message(*response))
+        stdout.flush()
+
+
+def _read_message(stream):
+    prefix = stream.read(message_prefix_size)
+    if len(prefix) < message_prefix_size:
+        return
+
+    header_size, payload_size = decode_message_prefix(prefix)
+    header = decode_message_header(stream.read(header_size))
+    payload = stream.read(payload_size)
+    return header, payload
+
+
+def _process_request(header, payload, stdout):
+    try:
+        if header['action'] == 'calculate':
+            method = common.Method(header['method'])
+            params = common.params_from_json(header['params'])
+            progress_interval = header.get('progress_interval')
+            result = opcut.calculate.calculate(
+                method=method,
+                params=params,
+                timeout=header.get('timeout'),
+                threads=header.get('threads'),
+                beam_width=header.get('beam_width', 10),
+                progress_cb=(_create_progress_cb(stdout, progress_interval)
+                             if progress_interval is not None else None))
+            return {'status': 'success',
+                    'result': common.result_to_json(result,
+                                                    include_stats=True)}, b''
+
+        if header['action'] == 'generate':
+            from opcut import generate
+
+            output_format = common.OutputFormat(header['output_format'])
+            result = common.result_from_json(header['result'])
+            output = generate.generate(result=result,
+                                       output_format=output_format,
+                                       panel_id=header.get('panel'))
+            return {'status': 'success'}, output
+
+        raise ValueError('unsupported action')
+
+    except common.UnresolvableError:
+        return {'status': 'unresolvable'}, b''
+
+    except Exception:
+        # traceback is written to stderr (inherited from server process)
+        # and only short message is sent to client
+        traceback.print_exc()
+        return {'status': 'error',
+                'message': 'Internal error'}, b''
+
+
+def _create_progress_cb(stdout, interval):
+    last = None
+
+    def progress_cb(placed, evaluated, fitness):
+        nonlocal last
+        now = time.monotonic()
+        if last is not None and now - last < interval:
+            return
+
+        last = now
+        stdout.write(encode_message({'status': 'progress',
+                                     'placed': placed,
+                                     'evaluated': evaluated,
+                                     'fitness': fitness}))
+        stdout.flush()
+
+    return progress_cb
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,15 @@
+from pathlib import Path
+import os
+
+import pytest
+
+import opcut
+
+
+@pytest.fixture
+def worker_env(monkeypatch):
+    # worker processes import opcut from same location as tests
+    path = str(Path(opcut.__file__).parent.parent)
+    pythonpath = os.environ.get('PYTHONPATH')
+    monkeypatch.setenv('PYTHONPATH', (os.pathsep.join([path, pythonpath])
+                                      if pythonpath else path))
@@ -0,0 +1,213 @@
+import asyncio
+import os
+
+import pytest
+
+from opcut import cache
+from opcut import calculate
+from opcut import common
+import opcut.jobs
+
+
+params = common.Params(
+    cut_width=1,
+    min_initial_usage=False,
+    panels=[common.Panel(id='p', width=100, height=100, quantity=2)],
+    items=[common.Item(id='a', width=40, height=30, can_rotate=True,
+                       quantity=3),
+           common.Item(id='b', width=60, height=60, can_rotate=False,
+                       quantity=1)])
+
+
+def create_result_json(params, final=True):
+    result = calculate.calculate(common.Method.GREEDY, params)
+    result_json = common.result_to_json(result, include_stats=True)
+    result_json['final'] = final
+    return result_json
+
+
+def set_mtime(path, mtime):
+    os.utime(path, (mtime, mtime))
+
+
+def test_get_put(tmp_path):
+    result_cache = cache.create_result_cache(tmp_path)
+    result_json = create_result_json(params)
+
+    assert result_cache.get(common.Method.GREEDY, params) is None
+
+    result_cache.put(common.Method.GREEDY, params, 10, result_json)
+    cached = result_cache.get(common.Method.GREEDY, params)
+
+    assert 'stats' not in cached
+    assert cached == {k: v for k, v in result_json.items() if k != 'stats'}
+    assert result_cache.get(common.Method.FORWARD_GREEDY, params) is None
+    assert result_cache.stats == cache.CacheStats(hits=1, misses=2)
+
+    other_cache = cache.create_result_cache(tmp_path)
+    assert other_cache.get(common.Method.GREEDY, params) == cached
+
+
+def test_non_final_not_cached(tmp_path):
+    result_cache = cache.create_result_cache(tmp_path)
+    result_json = create_result_json(params, final=False)
+
+    result_cache.put(common.Method.GREEDY, params, 10, result_json)
+
+    assert result_cache.get(common.Method.GREEDY, params) is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_invalid_file_is_miss(tmp_path):
+    result_cache = cache.create_result_cache(tmp_path)
+    key = cache.get_key(common.Method.GREEDY, params)
+    (tmp_path / f'{key}.json').write_bytes(b'{invalid')
+
+    assert result_cache.get(common.Method.GREEDY, params) is None
+    assert result_cache.stats == cache.CacheStats(hits=0, misses=1)
+
+
+@pytest.mark.parametrize('method, uses_beam_width', [
+    (common.Method.GREEDY, False),
+    (common.Method.FORWARD_GREEDY_NATIVE, False),
+    (common.Method.BEAM, True),
+    (common.Method.BEAM_NATIVE, True),
+    (common.Method.PORTFOLIO, True)])
+def test_key(method, uses_beam_width):
+    key = cache.get_key(method, params, 10)
+
+    assert key == cache.get_key(method, params, 10)
+    assert (key != cache.get_key(method, params, 5)) == uses_beam_width
+    assert key != cache.get_key(method, params._replace(cut_width=2), 10)
+    assert all(key != cache.get_key(other, params, 10)
+               for other in common.Method
+               if other != method)
+
+
+def test_eviction(tmp_path):
+    result_cache = cache.create_result_cache(tmp_path)
+    params_list = [params._replace(cut_width=i) for i in range(4)]
+    result_jsons = [create_result_json(i) for i in params_list]
+
+    result_cache.put(common.Method.GREEDY, params_list[0], 10,
+                     result_jsons[0])
+    entry_size = next(tmp_path.iterdir()).stat().st_size
+
+    result_cache = cache.create_result_cache(tmp_path,
+                                             max_size=int(3.5 * entry_size))
+
+    for i in range(1, 3):
+        result_cache.put(common.Method.GREEDY, params_list[i], 10,
+                         result_jsons[i])
+
+    for i in range(3):
+        key = cache.get_key(common.Method.GREEDY, params_list[i])
+        set_mtime(tmp_path / f'{key}.json', 1000 + i)
+
+    # access updates modification time (least recently used is evicted)
+    assert result_cache.get(common.Method.GREEDY, params_list[0]) is not None
+
+    result_cache.put(common.Method.GREEDY, params_list[3], 10,
+                     result_jsons[3])
+
+    assert result_cache.get(common.Method.GREEDY, params_list[1]) is None
+    for i in [0, 2, 3]:
+        assert result_cache.get(common.Method.GREEDY,
+                                params_list[i]) is not None
+
+
+class Pool:
+
+    def __init__(self, result_json):
+        self.result_json = result_json
+        self.calls = 0
+
+    async def calculate(self, method, params, **kwargs):
+        self.calls += 1
+        return self.result_json
+
+
+async def create_job_queue(pool, result_cache):
+    return await opcut.jobs.create_job_queue(pool=pool,
+                                             timeout=10,
+                                             concurrency=1,
+                                             queue_size=10,
+                                             cache=result_cache)
+
+
+def test_job_queue_cached_result(tmp_path):
+    result_json = create_result_json(params)
+    result_cache = cache.create_result_cache(tmp_path)
+    result_cache.put(common.Method.GREEDY, params, 10, result_json)
+    pool = Pool(None)
+
+    async def main():
+        queue = await create_job_queue(pool, result_cache)
+        try:
+            job = queue.submit(common.Method.GREEDY,
+                               common.params_to_json(params))
+            result = await queue.wait_result(job.id)
+
+            assert result == {k: v for k, v in result_json.items()
+                              if k != 'stats'}
+            assert queue.completed_counts == {
+                (common.Method.GREEDY, 'cached'): 1}
+            assert queue.queued_count == 0
+
+        finally:
+            await queue.async_close()
+
+    asyncio.run(main())
+    assert pool.calls == 0
+
+
+def test_job_queue_cache_miss(tmp_path):
+    result_json = create_result_json(params)
+    result_cache = cache.create_result_cache(tmp_path)
+    pool = Pool(result_json)
+
+    async def main():
+        queue = await create_job_queue(pool, result_cache)
+        try:
+            job = queue.submit(common.Method.GREEDY,
+                               common.params_to_json(params))
+            assert queue.queued_count == 1
+
+            result = await queue.wait_result(job.id)
+
+            assert result == result_json
+            assert queue.completed_counts == {
+                (common.Method.GREEDY, 'done'): 1}
+
+        finally:
+            await queue.async_close()
+
+    asyncio.run(main())
+    assert pool.calls == 1
+    assert result_cache.get(common.Method.GREEDY, params) is not None
+
+
+def test_job_queue_cancel_during_cache_lookup(tmp_path):
+    result_cache = cache.create_result_cache(tmp_path)
+    pool = Pool(None)
+
+    async def main():
+        queue = await create_job_queue(pool, result_cache)
+        try:
+            job = queue.submit(common.Method.GREEDY,
+                               common.params_to_json(params))
+            queue.cancel(job.id)
+
+            with pytest.raises(opcut.jobs.JobFailedError):
+                await queue.wait_result(job.id)
+
+            await asyncio.sleep(0.1)
+            assert queue.get_info(job.id).status == \
+                opcut.jobs.JobStatus.CANCELLED
+            assert queue.queued_count == 0
+
+        finally:
+            await queue.async_close()
+
+    asyncio.run(main())
+    assert pool.calls == 0
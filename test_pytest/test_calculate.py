@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+
+import pytest
+
+from opcut import calculate
+from opcut import common
+from opcut import libopcut
+
+
+params = common.Params(
+    cut_width=1,
+    min_initial_usage=True,
+    panels=[common.Panel(id='p1', width=200, height=150, quantity=2),
+            common.Panel(id='p2', width=120, height=300, quantity=1)],
+    items=[common.Item(id='a', width=70, height=40, can_rotate=True,
+                       quantity=4),
+           common.Item(id='b', width=110, height=60, can_rotate=False,
+                       quantity=2),
+           common.Item(id='c', width=30, height=90, can_rotate=True,
+                       quantity=3),
+           common.Item(id='d', width=55, height=55, can_rotate=False,
+                       quantity=1)])
+
+python_configurations = [
+    common.Configuration(method=common.Method.GREEDY,
+                         item_order=common.ItemOrder.AREA),
+    common.Configuration(method=common.Method.GREEDY,
+                         item_order=common.ItemOrder.AREA,
+                         seed=1),
+    common.Configuration(method=common.Method.BEAM,
+                         item_order=common.ItemOrder.MAX_SIDE),
+    common.Configuration(method=common.Method.FORWARD_GREEDY,
+                         item_order=common.ItemOrder.PERIMETER)]
+
+unresolvable_params = params._replace(
+    items=[*params.items,
+           common.Item(id='e', width=400, height=400, can_rotate=True,
+                       quantity=1)])
+
+
+def get_fitness(result):
+    context = calculate._create_initial_state(result.params).context
+    return calculate._fitness(context, common.result_to_table(result))
+
+
+def get_layout(result):
+    return (
+        [(i.panel.id, i.panel_index, i.item.id, i.x, i.y, i.rotate)
+         for i in result.used],
+        [(i.panel.id, i.panel_index, i.width, i.height, i.x, i.y)
+         for i in result.unused])
+
+
+@pytest.mark.parametrize('threads', [1, 3])
+def test_portfolio(threads):
+    configurations = calculate.get_portfolio_configurations()
+    results = [calculate.calculate(method=configuration.method,
+                                   params=params,
+                                   item_order=configuration.item_order,
+                                   seed=configuration.seed)
+               for configuration in configurations]
+    fitnesses = [get_fitness(result) for result in results]
+    best_index = fitnesses.index(min(fitnesses))
+
+    result = calculate.calculate(common.Method.PORTFOLIO, params,
+                                 threads=threads)
+
+    assert result.final
+    assert result.configuration == configurations[best_index]
+    assert get_layout(result) == get_layout(results[best_index])
+
+
+@pytest.mark.skipif(not libopcut.is_available(),
+                    reason='native implementation not available')
+def test_portfolio_default_threads(monkeypatch):
+    # configurations are calculated concurrently by default
+    calculate_configuration = calculate._calculate_configuration
+    lock = threading.Lock()
+    running = 0
+    max_running = 0
+
+    def on_calculate_configuration(*args, **kwargs):
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+
+        try:
+            time.sleep(0.05)
+            return calculate_configuration(*args, **kwargs)
+
+        finally:
+            with lock:
+                running -= 1
+
+    monkeypatch.setattr(os, 'cpu_count', lambda: 4)
+    monkeypatch.setattr(calculate, '_calculate_configuration',
+                        on_calculate_configuration)
+
+    result = calculate.calculate(common.Method.PORTFOLIO, params)
+
+    assert result.final
+    assert max_running == 4
+
+
+@pytest.mark.parametrize('threads', [1, 3])
+def test_portfolio_python_configurations(monkeypatch, threads):
+    # python configurations are calculated in processes if threads > 1
+    monkeypatch.setattr(calculate, 'get_portfolio_configurations',
+                        lambda: python_configurations)
+    results = [calculate.calculate(method=configuration.method,
+                                   params=params,
+                                   item_order=configuration.item_order,
+                                   seed=configuration.seed)
+               for configuration in python_configurations]
+    fitnesses = [get_fitness(result) for result in results]
+    best_index = fitnesses.index(min(fitnesses))
+
+    result = calculate.calculate(common.Method.PORTFOLIO, params,
+                                 threads=threads)
+
+    assert result.final
+    assert result.configuration == python_configurations[best_index]
+    assert get_layout(result) == get_layout(results[best_index])
+
+
+@pytest.mark.parametrize('threads', [1, 3])
+def test_portfolio_python_configurations_cancel(monkeypatch, threads):
+    monkeypatch.setattr(calculate, 'get_portfolio_configurations',
+                        lambda: python_configurations)
+    cancel = common.CancelFlag()
+    cancel.set()
+
+    with pytest.raises(common.CancelledError):
+        calculate.calculate(common.Method.PORTFOLIO, params,
+                            threads=threads, cancel=cancel)
+
+
+@pytest.mark.parametrize('timeout', [1e-9, 1e-3])
+@pytest.mark.parametrize('threads', [1, 4])
+def test_portfolio_timeout(timeout, threads):
+    # first configuration is calculated even if deadline has already passed
+    configuration = calculate.get_portfolio_configurations()[0]
+
+    result = calculate.calculate(common.Method.PORTFOLIO, params,
+                                 timeout=timeout, threads=threads)
+
+    assert len(result.used) == sum(item.quantity for item in params.items)
+    if timeout == 1e-9:
+        assert not result.final
+        assert result.configuration == configuration
+
+
+@pytest.mark.parametrize('timeout', [None, 1e-9])
+def test_portfolio_unresolvable(timeout):
+    with pytest.raises(common.UnresolvableError):
+        calculate.calculate(common.Method.PORTFOLIO, unresolvable_params,
+                            timeout=timeout)
+
+
+@pytest.mark.parametrize('threads', [0, -1])
+@pytest.mark.parametrize('method', list(common.Method))
+def test_invalid_threads(method, threads):
+    if method in calculate._native_methods and not libopcut.is_available():
+        pytest.skip('native implementation not available')
+
+    with pytest.raises(ValueError):
+        calculate.calculate(method, params, threads=threads)
+
+
+@pytest.mark.parametrize('beam_width', [0, -1])
+@pytest.mark.parametrize('method', [common.Method.BEAM,
+                                    common.Method.BEAM_NATIVE,
+                                    common.Method.PORTFOLIO])
+def test_invalid_beam_width(method, beam_width):
+    with pytest.raises(ValueError):
+        calculate.calculate(method, params, beam_width=beam_width)
@@ -0,0 +1,166 @@
+from pathlib import Path
+import pytest
+
+from opcut import calculate
+from opcut import codec
+from opcut import common
+
+
+params = common.Params(
+    cut_width=0.5,
+    min_initial_usage=True,
+    panels=[common.Panel(id='p1', width=200, height=150.5, quantity=2),
+            common.Panel(id='pč', width=120, height=300.25, quantity=1)],
+    items=[common.Item(id='a', width=70, height=40.5, can_rotate=True,
+                       quantity=3),
+           common.Item(id='b', width=110, height=60.25, can_rotate=False,
+                       quantity=1),
+           common.Item(id='ž', width=30, height=90.5, can_rotate=True,
+                       quantity=2)])
+
+
+def create_result(method=common.Method.GREEDY, final=True):
+    result = calculate.calculate(method, params)
+    return result._replace(final=final)
+
+
+def get_value_types(params):
+    return ([type(params.cut_width)] +
+            [(type(i.width), type(i.height)) for i in params.panels] +
+            [(type(i.width), type(i.height)) for i in params.items])
+
+
+@pytest.mark.parametrize('format', list(codec.Format))
+def test_params(format):
+    data = codec.encode_params(params, format)
+    decoded = codec.decode_params(data, format)
+
+    # binary columns keep int and float values if column values share type
+    assert decoded == params
+    assert get_value_types(decoded) == get_value_types(params)
+
+
+@pytest.mark.parametrize('format, method', [
+    (codec.Format.JSON, common.Method.GREEDY),
+    (codec.Format.JSON, common.Method.PORTFOLIO),
+    (codec.Format.YAML, common.Method.PORTFOLIO),
+    (codec.Format.TOML, common.Method.GREEDY),
+    (codec.Format.BINARY, common.Method.GREEDY),
+    (codec.Format.BINARY, common.Method.PORTFOLIO)])
+@pytest.mark.parametrize('final', [True, False])
+@pytest.mark.parametrize('include_stats', [True, False])
+def test_result(format, method, final, include_stats):
+    # portfolio result includes configuration without cuts
+    result = create_result(method, final)
+
+    data = codec.encode_result(result, format, include_stats)
+    decoded = codec.decode_result(data, format)
+
+    assert (common.result_to_json(decoded, include_stats) ==
+            common.result_to_json(result, include_stats))
+    assert decoded.final == final
+    assert decoded.configuration == result.configuration
+    assert decoded.cuts == result.cuts
+    assert (decoded.stats is not None) == include_stats
+
+
+def test_result_without_cuts():
+    result = create_result()._replace(cuts=None)
+
+    data = codec.encode_result(result, codec.Format.BINARY)
+    decoded = codec.decode_result(data, codec.Format.BINARY)
+
+    assert decoded.cuts is None
+    assert (common.result_to_json(decoded) ==
+            common.result_to_json(result))
+
+
+@pytest.mark.parametrize('value', [2 ** 31, -2 ** 40, 2 ** 62, 0.1, 1e300])
+def test_binary_number_exact(value):
+    value_params = params._replace(cut_width=value)
+
+    data = codec.encode_params(value_params, codec.Format.BINARY)
+    decoded = codec.decode_params(data, codec.Format.BINARY)
+
+    assert decoded.cut_width == value
+    assert type(decoded.cut_width) is type(value)
+
+
+@pytest.mark.parametrize('value', [2 ** 63, -2 ** 64, 2 ** 70])
+def test_binary_unrepresentable_int(value):
+    value_params = params._replace(cut_width=value)
+
+    with pytest.raises(ValueError, match='unsupported column values'):
+        codec.encode_params(value_params, codec.Format.BINARY)
+
+
+def test_binary_invalid_data():
+    params_data = codec.encode_params(params, codec.Format.BINARY)
+    result_data = codec.encode_result(create_result(), codec.Format.BINARY)
+
+    invalid_data = [
+        b'',
+        b'INVALID',
+        b'XXXXX' + params_data[5:],
+        params_data[:5] + bytes([99]) + params_data[6:],
+        params_data[:-1],
+        params_data + b'\x00',
+        result_data]
+
+    for data in invalid_data:
+        with pytest.raises(ValueError):
+            codec.decode_params(data, codec.Format.BINARY)
+
+    with pytest.raises(ValueError):
+        codec.decode_result(params_data, codec.Format.BINARY)
+
+
+def test_binary_invalid_result_indexes():
+    result = create_result()
+    params_data = codec.encode_params(params, codec.Format.BINARY)
+    result_data = codec.encode_result(result, codec.Format.BINARY)
+
+    # first result column (used panel indexes) follows result header
+    offset = len(params_data) + codec._result_header.size
+    assert result_data[offset:offset + 1] == b'B'
+
+    data = bytearray(result_data)
+    data[offset + 1] = len(params.panels)
+    with pytest.raises(ValueError, match='invalid used panel'):
+        codec.decode_result(bytes(data), codec.Format.BINARY)
+
+
+def test_binary_invalid_cut():
+    result = create_result()
+    cuts = [codec._cut_indexes[i] for i in result.cuts]
+    result_data = codec.encode_result(result, codec.Format.BINARY)
+
+    # cuts column is followed by extra length and extra JSON
+    cuts_column = b'B' + bytes(cuts)
+    offset = result_data.rindex(cuts_column)
+
+    data = bytearray(result_data)
+    data[offset + 1] = len(common.Cut)
+    with pytest.raises(ValueError, match='invalid cut'):
+        codec.decode_result(bytes(data), codec.Format.BINARY)
+
+
+@pytest.mark.parametrize('path, format', [
+    (Path('params.json'), codec.Format.JSON),
+    (Path('params.yaml'), codec.Format.YAML),
+    (Path('params.yml'), codec.Format.YAML),
+    (Path('params.toml'), codec.Format.TOML),
+    (Path('params.opcut'), codec.Format.BINARY)])
+def test_get_file_format(path, format):
+    assert codec.get_file_format(path) == format
+
+
+@pytest.mark.parametrize('indent', [True, False])
+def test_json(indent):
+    data = {'a': [1, 2.5, None, True], 'b': {'c': 'č'}}
+
+    encoded = codec.encode_json(data, indent)
+
+    assert codec.decode_json(encoded) == data
+    assert codec.decode_json(encoded.decode('utf-8')) == data
+    assert (b'\n  "a"' in encoded) == indent
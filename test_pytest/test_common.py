@@ -0,0 +1,90 @@
+import pytest
+
+from opcut import calculate
+from opcut import codec
+from opcut import common
+
+
+def create_params_json(item_ids):
+    return {'cut_width': 0,
+            'panels': {'p': {'width': 100, 'height': 100}},
+            'items': {'a': {'width': 10,
+                            'height': 10,
+                            'can_rotate': False,
+                            'quantity': 2},
+                      **{item_id: {'width': 20,
+                                   'height': 20,
+                                   'can_rotate': False}
+                         for item_id in item_ids}}}
+
+
+@pytest.mark.parametrize('item_id', ['a/1', 'a/2'])
+def test_instance_id_collision(item_id):
+    params_json = create_params_json([item_id])
+
+    with pytest.raises(ValueError):
+        common.validate_params(params_json)
+
+    with pytest.raises(ValueError):
+        common.params_from_json(params_json)
+
+    params = common.Params(
+        cut_width=0,
+        min_initial_usage=False,
+        panels=[common.Panel(id='p', width=100, height=100)],
+        items=[common.Item(id='a', width=10, height=10, can_rotate=False,
+                           quantity=2),
+               common.Item(id=item_id, width=20, height=20,
+                           can_rotate=False)])
+
+    with pytest.raises(ValueError):
+        common.expand_params(params)
+
+    data = codec.encode_params(params, codec.Format.BINARY)
+    with pytest.raises(ValueError):
+        codec.decode_params(data, codec.Format.BINARY)
+
+
+def test_panel_instance_id_collision():
+    params_json = create_params_json([])
+    params_json['panels'] = {'p': {'width': 100, 'height': 100,
+                                   'quantity': 3},
+                             'p/3': {'width': 50, 'height': 50}}
+
+    with pytest.raises(ValueError):
+        common.validate_params(params_json)
+
+    with pytest.raises(ValueError):
+        common.params_from_json(params_json)
+
+
+def test_instance_id_without_collision():
+    item_ids = ['a/0', 'a/3', 'a/01', 'a/1/1', 'b/1']
+    params_json = create_params_json(item_ids)
+
+    common.validate_params(params_json)
+    params = common.params_from_json(params_json)
+    result = calculate.calculate(common.Method.GREEDY, params)
+    result_json = common.result_to_json(result)
+
+    expected_ids = sorted(['a/1', 'a/2', *item_ids])
+    assert sorted(result_json['params']['items']) == expected_ids
+    assert sorted(i['item'] for i in result_json['used']) == expected_ids
+    common.validate_result(result_json)
+
+
+def test_result_unknown_stats():
+    params = common.params_from_json(create_params_json([]))
+    result = calculate.calculate(common.Method.GREEDY, params)
+    result_json = common.result_to_json(result, include_stats=True)
+    result_json['stats']['unknown'] = 1
+
+    common.validate_result(result_json)
+    decoded = common.result_from_json(result_json)
+
+    assert decoded.stats == result.stats
+
+    data = codec.encode(result_json, codec.Format.JSON)
+    decoded = codec.decode_result(data, codec.Format.JSON)
+
+    assert decoded.stats == result.stats
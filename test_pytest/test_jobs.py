@@ -0,0 +1,389 @@
+import asyncio
+import os
+
+import pytest
+
+from opcut import codec
+from opcut import common
+import opcut.jobs
+import opcut.pool
+
+
+params = common.Params(
+    cut_width=1,
+    min_initial_usage=False,
+    panels=[common.Panel(id='p', width=100, height=100, quantity=2)],
+    items=[common.Item(id='a', width=40, height=30, can_rotate=True,
+                       quantity=3)])
+
+params_json = common.params_to_json(params)
+
+
+class Call:
+
+    def __init__(self, kwargs):
+        self.kwargs = kwargs
+        self.future = asyncio.get_running_loop().create_future()
+        self.cancelled = False
+
+
+class Pool:
+    """Pool which completes calculation once call future is resolved"""
+
+    def __init__(self):
+        self.calls = []
+        self.call_queue = asyncio.Queue()
+
+    async def calculate(self, **kwargs):
+        call = Call(kwargs)
+        self.calls.append(call)
+        self.call_queue.put_nowait(call)
+
+        try:
+            return await call.future
+
+        except asyncio.CancelledError:
+            call.cancelled = True
+            raise
+
+
+class Cache:
+
+    def get(self, method, params, beam_width):
+        raise Exception('cache error')
+
+    def put(self, method, params, beam_width, result):
+        pass
+
+
+def create_result_json(i=0):
+    return {'params': params_json,
+            'used': [],
+            'unused': [],
+            'cuts': None,
+            'final': True,
+            'index': i}
+
+
+async def create_job_queue(pool, **kwargs):
+    return await opcut.jobs.create_job_queue(
+        pool=pool, **{'timeout': 10,
+                      'concurrency': 1,
+                      'queue_size': 10,
+                      **kwargs})
+
+
+def run(main):
+
+    async def wrapper():
+        pool = Pool()
+        await main(pool)
+
+    asyncio.run(wrapper())
+
+
+def test_done():
+
+    async def main(pool):
+        queue = await create_job_queue(pool)
+        try:
+            job = queue.submit(common.Method.GREEDY, params_json, 3)
+            assert job.status == opcut.jobs.JobStatus.QUEUED
+            assert job.method == common.Method.GREEDY
+
+            call = await pool.call_queue.get()
+            assert call.kwargs['method'] == common.Method.GREEDY
+            assert call.kwargs['params'] == params_json
+            assert call.kwargs['beam_width'] == 3
+            assert call.kwargs['timeout'] == 10
+            assert queue.get_info(job.id).status == \
+                opcut.jobs.JobStatus.RUNNING
+            assert queue.running_count == 1
+            assert queue.queued_count == 0
+
+            call.future.set_result(create_result_json())
+            result = await queue.wait_result(job.id)
+
+            assert result == create_result_json()
+            assert queue.get_result(job.id) == result
+            assert queue.get_error(job.id) is None
+            assert queue.get_info(job.id).status == opcut.jobs.JobStatus.DONE
+
+            # running count is updated once runner is completed
+            await asyncio.sleep(0.01)
+            assert queue.running_count == 0
+            assert queue.completed_counts == {
+                (common.Method.GREEDY, 'done'): 1}
+
+        finally:
+            await queue.async_close()
+
+    run(main)
+
+
+def test_invalid_job_id():
+
+    async def main(pool):
+        queue = await create_job_queue(pool)
+        try:
+            assert queue.get_info('invalid') is None
+            assert queue.get_result('invalid') is None
+            assert queue.cancel('invalid') is None
+            assert queue.register_progress_cb('invalid', lambda _: None) \
+                is None
+
+            with pytest.raises(ValueError):
+                await queue.wait_result('invalid')
+
+        finally:
+            await queue.async_close()
+
+    run(main)
+
+
+def test_queue_full():
+
+    async def main(pool):
+        queue = await create_job_queue(pool, concurrency=1, queue_size=1)
+        try:
+            running = queue.submit(common.Method.GREEDY, params_json)
+            await pool.call_queue.get()
+
+            queued = queue.submit(common.Method.GREEDY, params_json)
+            assert queue.queued_count == 1
+
+            with pytest.raises(opcut.jobs.QueueFullError):
+                queue.submit(common.Method.GREEDY, params_json)
+
+            queue.cancel(queued.id)
+            assert queue.queued_count == 0
+
+            queue.submit(common.Method.GREEDY, params_json)
+            assert queue.get_info(running.id).status == \
+                opcut.jobs.JobStatus.RUNNING
+
+        finally:
+            await queue.async_close()
+
+    run(main)
+
+
+def test_cancel_queued():
+
+    async def main(pool):
+        queue = await create_job_queue(pool, concurrency=1)
+        try:
+            running = queue.submit(common.Method.GREEDY, params_json)
+            call = await pool.call_queue.get()
+            queued = queue.submit(common.Method.GREEDY, params_json)
+
+            info = queue.cancel(queued.id)
+            assert info.status == opcut.jobs.JobStatus.CANCELLED
+            assert info.message == 'Job cancelled'
+
+            with pytest.raises(opcut.jobs.JobFailedError):
+                await queue.wait_result(queued.id)
+
+            # cancelled job is not executed
+            call.future.set_result(create_result_json())
+            await queue.wait_result(running.id)
+            await asyncio.sleep(0.01)
+
+            assert len(pool.calls) == 1
+            assert queue.queued_count == 0
+            assert queue.completed_counts == {
+                (common.Method.GREEDY, 'done'): 1,
+                (common.Method.GREEDY, 'cancelled'): 1}
+
+        finally:
+            await queue.async_close()
+
+    run(main)
+
+
+def test_cancel_running():
+
+    async def main(pool):
+        queue = await create_job_queue(pool)
+        try:
+            job = queue.submit(common.Method.GREEDY, params_json)
+            call = await pool.call_queue.get()
+
+            queue.cancel(job.id)
+
+            with pytest.raises(opcut.jobs.JobFailedError):
+                await queue.wait_result(job.id)
+
+            assert call.cancelled
+            assert queue.get_info(job.id).status == \
+                opcut.jobs.JobStatus.CANCELLED
+
+            await asyncio.sleep(0.01)
+            assert queue.running_count == 0
+
+            # runner continues with next job
+            job = queue.submit(common.Method.GREEDY, params_json)
+            call = await pool.call_queue.get()
+            call.future.set_result(create_result_json())
+            await queue.wait_result(job.id)
+
+        finally:
+            await queue.async_close()
+
+    run(main)
+
+
+def test_timeout():
+
+    async def main(pool):
+        queue = await create_job_queue(pool, timeout=0.01)
+        try:
+            job = queue.submit(common.Method.GREEDY, params_json)
+
+            with pytest.raises(opcut.jobs.JobFailedError,
+                               match='Request timeout'):
+                await queue.wait_result(job.id)
+
+            assert pool.calls[0].cancelled
+            assert queue.get_info(job.id).status == \
+                opcut.jobs.JobStatus.FAILED
+            assert queue.completed_counts == {
+                (common.Method.GREEDY, 'timeout'): 1}
+
+        finally:
+            await queue.async_close()
+
+    run(main)
+
+
+@pytest.mark.parametrize('error, error_cls, outcome', [
+    (common.UnresolvableError(), common.UnresolvableError, 'unresolvable'),
+    (opcut.pool.WorkerError('Internal error'), opcut.jobs.JobInternalError,
+     'failed')])
+def test_failed(error, error_cls, outcome):
+
+    async def main(pool):
+        queue = await create_job_queue(pool)
+        try:
+            job = queue.submit(common.Method.GREEDY, params_json)
+            call = await pool.call_queue.get()
+            call.future.set_exception(error)
+
+            with pytest.raises(error_cls):
+                await queue.wait_result(job.id)
+
+            assert isinstance(queue.get_error(job.id), error_cls)
+            assert queue.get_info(job.id).status == \
+                opcut.jobs.JobStatus.FAILED
+            assert queue.completed_counts == {
+                (common.Method.GREEDY, outcome): 1}
+
+        finally:
+            await queue.async_close()
+
+    run(main)
+
+
+def test_progress():
+
+    async def main(pool):
+        queue = await create_job_queue(pool)
+        try:
+            job = queue.submit(common.Method.GREEDY, params_json)
+            progress = []
+            handle = queue.register_progress_cb(job.id, progress.append)
+
+            call = await pool.call_queue.get()
+            call.kwargs['progress_cb'](1, 5, 0.5)
+
+            expected = opcut.jobs.JobProgress(placed=1,
+                                              items=3,
+                                              evaluated=5,
+                                              fitness=0.5)
+            assert progress == [expected]
+            assert queue.get_info(job.id).progress == expected
+
+            handle.cancel()
+            call.kwargs['progress_cb'](2, 10, 0.4)
+            assert progress == [expected]
+
+            call.future.set_result(create_result_json())
+            await queue.wait_result(job.id)
+
+        finally:
+            await queue.async_close()
+
+    run(main)
+
+
+@pytest.mark.parametrize('history_size, history_max_size', [
+    (2, 100 * 1024 * 1024),
+    (1000, 2)])
+def test_history(history_size, history_max_size):
+    # history is limited by number of jobs or by total size of results
+    if history_max_size == 2:
+        history_max_size = int(
+            2.5 * len(codec.encode_json(create_result_json())))
+
+    async def main(pool):
+        queue = await create_job_queue(pool,
+                                       history_size=history_size,
+                                       history_max_size=history_max_size)
+        try:
+            job_ids = []
+            for i in range(3):
+                job = queue.submit(common.Method.GREEDY, params_json)
+                call = await pool.call_queue.get()
+                call.future.set_result(create_result_json(i))
+                await queue.wait_result(job.id)
+                job_ids.append(job.id)
+
+            assert queue.get_info(job_ids[0]) is None
+            assert queue.get_result(job_ids[0]) is None
+            for i in (1, 2):
+                assert queue.get_result(job_ids[i]) == create_result_json(i)
+
+        finally:
+            await queue.async_close()
+
+    run(main)
+
+
+def test_cache_error_is_miss():
+
+    async def main(pool):
+        queue = await create_job_queue(pool, cache=Cache())
+        try:
+            # failed cache query does not leave job queued
+            job = queue.submit(common.Method.GREEDY, params_json)
+            call = await asyncio.wait_for(pool.call_queue.get(), 1)
+            call.future.set_result(create_result_json())
+
+            assert await queue.wait_result(job.id) == create_result_json()
+            assert queue.queued_count == 0
+
+        finally:
+            await queue.async_close()
+
+    run(main)
+
+
+@pytest.mark.parametrize('threads, concurrency, expected', [
+    (None, 2, 2),
+    (None, 8, 1),
+    (3, 2, 3)])
+def test_threads(monkeypatch, threads, concurrency, expected):
+    monkeypatch.setattr(os, 'cpu_count', lambda: 4)
+
+    async def main(pool):
+        queue = await create_job_queue(pool, threads=threads,
+                                       concurrency=concurrency)
+        try:
+            queue.submit(common.Method.GREEDY, params_json)
+            call = await pool.call_queue.get()
+            assert call.kwargs['threads'] == expected
+
+        finally:
+            await queue.async_close()
+
+    run(main)
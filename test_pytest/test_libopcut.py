@@ -0,0 +1,246 @@
+import array
+import collections
+import itertools
+import random
+
+import pytest
+
+from opcut import common
+from opcut import calculate
+from opcut import libopcut
+
+
+pytestmark = pytest.mark.skipif(not libopcut.is_available(),
+                                reason='native implementation not available')
+
+
+method_pairs = [(common.Method.GREEDY, common.Method.GREEDY_NATIVE),
+                (common.Method.FORWARD_GREEDY,
+                 common.Method.FORWARD_GREEDY_NATIVE),
+                (common.Method.BEAM, common.Method.BEAM_NATIVE)]
+
+
+def create_params(seed):
+    r = random.Random(seed)
+    return common.Params(
+        cut_width=r.choice([0, 1, 3]),
+        min_initial_usage=r.random() < 0.5,
+        panels=[common.Panel(id=f'p{i}',
+                             width=r.randint(100, 500),
+                             height=r.randint(100, 500),
+                             quantity=r.randint(1, 3))
+                for i in range(r.randint(1, 3))],
+        items=[common.Item(id=f'i{i}',
+                           width=r.randint(10, 120),
+                           height=r.randint(10, 120),
+                           can_rotate=r.random() < 0.5,
+                           quantity=r.randint(1, 3))
+               for i in range(r.randint(1, 10))])
+
+
+def calculate_or_none(method, params):
+    try:
+        return calculate.calculate(method, params,
+                                   item_order=common.ItemOrder.AREA)
+
+    except common.UnresolvableError:
+        return None
+
+
+def get_rects(result):
+    rects = collections.defaultdict(list)
+
+    for used in result.used:
+        width, height = used.item.width, used.item.height
+        if used.rotate:
+            assert used.item.can_rotate
+            width, height = height, width
+
+        rects[used.panel.id, used.panel_index].append(
+            (used.x, used.y, width, height))
+
+    for unused in result.unused:
+        rects[unused.panel.id, unused.panel_index].append(
+            (unused.x, unused.y, unused.width, unused.height))
+
+    return rects
+
+
+def assert_valid_result(result):
+    params = result.params
+    panels = {panel.id: panel for panel in params.panels}
+
+    assert (collections.Counter(used.item.id for used in result.used) ==
+            {item.id: item.quantity for item in params.items})
+
+    for (panel_id, panel_index), rects in get_rects(result).items():
+        panel = panels[panel_id]
+        assert 0 <= panel_index < panel.quantity
+
+        for x, y, width, height in rects:
+            assert width > 0 and height > 0
+            assert x >= 0 and x + width <= panel.width
+            assert y >= 0 and y + height <= panel.height
+
+        for (x1, y1, w1, h1), (x2, y2, w2, h2) in itertools.combinations(
+                rects, 2):
+            assert (x1 + w1 <= x2 or x2 + w2 <= x1 or
+                    y1 + h1 <= y2 or y2 + h2 <= y1)
+
+        if params.cut_width == 0:
+            area = sum(width * height for _, _, width, height in rects)
+            assert area == pytest.approx(panel.width * panel.height)
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('method, native_method', method_pairs)
+def test_python_native_equivalence(seed, method, native_method):
+    # equivalent candidates (same fitness) are resolved in different order,
+    # so layouts can differ while both results remain valid
+    params = create_params(seed)
+
+    result = calculate_or_none(method, params)
+    native_result = calculate_or_none(native_method, params)
+
+    assert (result is None) == (native_result is None)
+    if result is None:
+        return
+
+    assert_valid_result(result)
+    assert_valid_result(native_result)
+    assert result.final and native_result.final
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('method', [common.Method.GREEDY_NATIVE,
+                                    common.Method.FORWARD_GREEDY_NATIVE,
+                                    common.Method.BEAM_NATIVE])
+def test_threads(seed, method):
+    # result does not depend on number of threads
+    params = create_params(seed)
+
+    try:
+        result = libopcut.calculate(method, params, threads=1)
+
+    except common.UnresolvableError:
+        for threads in [2, 8]:
+            with pytest.raises(common.UnresolvableError):
+                libopcut.calculate(method, params, threads=threads)
+        return
+
+    for threads in [2, 8]:
+        threads_result = libopcut.calculate(method, params, threads=threads)
+
+        assert threads_result.used == result.used
+        assert threads_result.unused == result.unused
+        assert threads_result.cuts == result.cuts
+        assert threads_result.final == result.final
+
+
+@pytest.mark.parametrize('threads', [0, -1])
+def test_invalid_threads(threads):
+    params = create_params(0)
+
+    with pytest.raises(ValueError):
+        libopcut.calculate(common.Method.FORWARD_GREEDY_NATIVE, params,
+                           threads=threads)
+
+
+def test_single_item():
+    params = common.Params(
+        cut_width=2,
+        min_initial_usage=False,
+        panels=[common.Panel(id='p', width=100, height=50, quantity=1)],
+        items=[common.Item(id='i', width=30, height=50, can_rotate=False,
+                           quantity=1)])
+
+    for method, native_method in method_pairs:
+        result = calculate.calculate(method, params)
+        native_result = calculate.calculate(native_method, params)
+
+        for r in [result, native_result]:
+            assert [(used.item.id, used.x, used.y, used.rotate)
+                    for used in r.used] == [('i', 0, 0, False)]
+            assert [(unused.x, unused.y, unused.width, unused.height)
+                    for unused in r.unused] == [(32, 0, 68, 50)]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_params_arrays(seed):
+    params = create_params(seed)
+
+    params_arrays = libopcut.ParamsArrays(
+        cut_width=params.cut_width,
+        min_initial_usage=params.min_initial_usage,
+        panels=libopcut.PanelArrays(
+            width=array.array('d', (i.width for i in params.panels)),
+            height=memoryview(
+                array.array('d', (i.height for i in params.panels))
+            ).toreadonly(),
+            quantity=array.array('Q', (i.quantity for i in params.panels))),
+        items=libopcut.ItemArrays(
+            width=array.array('d', (i.width for i in params.items)),
+            height=array.array('d', (i.height for i in params.items)),
+            can_rotate=memoryview(
+                bytearray(i.can_rotate for i in params.items)).cast('?'),
+            quantity=array.array('Q', (i.quantity for i in params.items))))
+
+    for method in [common.Method.GREEDY_NATIVE,
+                   common.Method.BEAM_NATIVE]:
+        try:
+            arrays = libopcut.calculate_arrays(method, params)
+
+        except common.UnresolvableError:
+            with pytest.raises(common.UnresolvableError):
+                libopcut.calculate_arrays(method, params_arrays)
+            continue
+
+        arrays_result = libopcut.calculate_arrays(method, params_arrays)
+
+        for name in libopcut.UsedArrays._fields:
+            assert (getattr(arrays.used, name).tolist() ==
+                    getattr(arrays_result.used, name).tolist())
+
+        for name in libopcut.UnusedArrays._fields:
+            assert (getattr(arrays.unused, name).tolist() ==
+                    getattr(arrays_result.unused, name).tolist())
+
+
+@pytest.mark.parametrize('panels, items', [
+    (libopcut.PanelArrays(width=array.array('d', [100]),
+                          height=array.array('d', [100]),
+                          quantity=array.array('q', [1])),
+     libopcut.ItemArrays(width=array.array('d', [10]),
+                         height=array.array('d', [10]),
+                         can_rotate=memoryview(b'\x00').cast('?'),
+                         quantity=array.array('Q', [1]))),
+    (libopcut.PanelArrays(width=array.array('d', [100]),
+                          height=array.array('d', [100]),
+                          quantity=array.array('Q', [1])),
+     libopcut.ItemArrays(width=array.array('d', [10, 20]),
+                         height=array.array('d', [10]),
+                         can_rotate=memoryview(b'\x00').cast('?'),
+                         quantity=array.array('Q', [1]))),
+    (libopcut.PanelArrays(width=array.array('d', [100]),
+                          height=array.array('d', [100]),
+                          quantity=array.array('Q', [1])),
+     libopcut.ItemArrays(width=array.array('d', [0]),
+                         height=array.array('d', [10]),
+                         can_rotate=memoryview(b'\x00').cast('?'),
+                         quantity=array.array('Q', [1]))),
+    (libopcut.PanelArrays(width=array.array('f', [100]),
+                          height=array.array('d', [100]),
+                          quantity=array.array('Q', [1])),
+     libopcut.ItemArrays(width=array.array('d', [10]),
+                         height=array.array('d', [10]),
+                         can_rotate=memoryview(b'\x00').cast('?'),
+                         quantity=array.array('Q', [1])))
+])
+def test_invalid_params_arrays(panels, items):
+    params_arrays = libopcut.ParamsArrays(cut_width=0,
+                                          min_initial_usage=False,
+                                          panels=panels,
+                                          items=items)
+
+    with pytest.raises(ValueError):
+        libopcut.calculate_arrays(common.Method.GREEDY_NATIVE, params_arrays)
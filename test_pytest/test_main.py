@@ -0,0 +1,35 @@
+import pytest
+
+import opcut.main
+
+
+@pytest.mark.parametrize('action', ['calculate',
+                                    'calculate-batch',
+                                    'benchmark'])
+def test_beam_width(action):
+    parser = opcut.main.create_argument_parser()
+
+    args = parser.parse_args([action, '--beam-width', '3'])
+    assert args.beam_width == 3
+
+    for beam_width in ['0', '-1', 'x']:
+        with pytest.raises(SystemExit):
+            parser.parse_args([action, '--beam-width', beam_width])
+
+
+@pytest.mark.parametrize('action', ['calculate',
+                                    'calculate-batch',
+                                    'benchmark',
+                                    'server'])
+def test_threads(action):
+    parser = opcut.main.create_argument_parser()
+
+    args = parser.parse_args([action])
+    assert args.threads is None
+
+    args = parser.parse_args([action, '--threads', '3'])
+    assert args.threads == 3
+
+    for threads in ['0', '-1', 'x']:
+        with pytest.raises(SystemExit):
+            parser.parse_args([action, '--threads', threads])
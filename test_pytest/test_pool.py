@@ -0,0 +1,193 @@
+import asyncio
+import io
+import signal
+
+import pytest
+
+from opcut import common
+import opcut.pool
+import opcut.worker
+
+
+pytestmark = pytest.mark.usefixtures('worker_env')
+
+params = common.Params(
+    cut_width=1,
+    min_initial_usage=False,
+    panels=[common.Panel(id='p', width=100, height=100, quantity=2)],
+    items=[common.Item(id='a', width=40, height=30, can_rotate=True,
+                       quantity=3)])
+
+unresolvable_params = params._replace(
+    items=[common.Item(id='a', width=400, height=400, can_rotate=True)])
+
+# forward greedy calculation running long enough to be interrupted
+long_params = common.Params(
+    cut_width=1,
+    min_initial_usage=False,
+    panels=[common.Panel(id='p', width=1000, height=1000, quantity=10)],
+    items=[common.Item(id=f'i{i}',
+                       width=20 + i * 7 % 90,
+                       height=20 + i * 13 % 80,
+                       can_rotate=True,
+                       quantity=1)
+           for i in range(60)])
+
+
+async def wait_until(fn, timeout=5):
+    for _ in range(int(timeout / 0.05)):
+        if fn():
+            return
+
+        await asyncio.sleep(0.05)
+
+    assert fn()
+
+
+def run(main, **kwargs):
+
+    async def wrapper():
+        pool = await opcut.pool.create_pool(**{'size': 1, **kwargs})
+        try:
+            await main(pool)
+
+        finally:
+            await pool.async_close()
+
+    asyncio.run(wrapper())
+
+
+def test_calculate():
+
+    async def main(pool):
+        progress = []
+        result_json = await pool.calculate(
+            common.Method.GREEDY, common.params_to_json(params),
+            progress_cb=lambda *args: progress.append(args),
+            progress_interval=0)
+
+        common.validate_result(result_json)
+        result = common.result_from_json(result_json)
+        assert len(result.used) == 3
+        assert result.final
+        assert result.stats is not None
+        assert [placed for placed, _, _ in progress] == [1, 2, 3]
+
+        assert pool.spawned_count == 1
+        assert pool.idle_count == 1
+        assert pool.active_count == 0
+
+    run(main)
+
+
+def test_unresolvable():
+
+    async def main(pool):
+        with pytest.raises(common.UnresolvableError):
+            await pool.calculate(common.Method.GREEDY,
+                                 common.params_to_json(unresolvable_params))
+
+        # worker is reused
+        await pool.calculate(common.Method.GREEDY,
+                             common.params_to_json(params))
+        assert pool.spawned_count == 1
+
+    run(main)
+
+
+def test_worker_error():
+
+    async def main(pool):
+        with pytest.raises(opcut.pool.WorkerError, match='Internal error'):
+            await pool.generate(common.OutputFormat.SVG, None, {})
+
+        assert pool.spawned_count == 1
+
+    run(main)
+
+
+def test_worker_crash():
+
+    async def main(pool):
+        worker = pool._idle_workers[0]
+        task = asyncio.create_task(pool.calculate(
+            common.Method.FORWARD_GREEDY,
+            common.params_to_json(long_params)))
+        await wait_until(lambda: pool.active_count == 1)
+
+        worker._process.send_signal(signal.SIGKILL)
+
+        with pytest.raises(Exception, match='worker terminated'):
+            await task
+
+        # crashed worker is replaced
+        await wait_until(lambda: pool.idle_count == 1)
+        await pool.calculate(common.Method.GREEDY,
+                             common.params_to_json(params))
+
+        assert pool.spawned_count == 2
+        assert pool.exit_counts == {-signal.SIGKILL: 1}
+
+    run(main)
+
+
+def test_cancel():
+
+    async def main(pool):
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(
+                pool.calculate(common.Method.FORWARD_GREEDY,
+                               common.params_to_json(long_params)),
+                0.2)
+
+        # interrupted worker is terminated and replaced
+        await wait_until(lambda: pool.idle_count == 1 and
+                         pool.exit_counts)
+        await pool.calculate(common.Method.GREEDY,
+                             common.params_to_json(params))
+
+        assert pool.spawned_count == 2
+        assert pool.exit_counts == {-signal.SIGTERM: 1}
+
+    run(main)
+
+
+def test_max_jobs():
+
+    async def main(pool):
+        for _ in range(3):
+            await pool.calculate(common.Method.GREEDY,
+                                 common.params_to_json(params))
+
+        # each job is executed by replacement of previous worker (initial
+        # worker and replacement after each job)
+        await wait_until(lambda: pool.idle_count == 1)
+        assert pool.spawned_count == 4
+
+    run(main, max_jobs=1)
+
+
+def test_message():
+    header = {'action': 'calculate', 'value': 'č'}
+    payload = b'\x00\x01'
+
+    data = opcut.worker.encode_message(header, payload)
+    header_size, payload_size = opcut.worker.decode_message_prefix(
+        data[:opcut.worker.message_prefix_size])
+    header_data = data[opcut.worker.message_prefix_size:
+                       opcut.worker.message_prefix_size + header_size]
+
+    assert opcut.worker.decode_message_header(header_data) == header
+    assert data[-payload_size:] == payload
+    assert len(data) == (opcut.worker.message_prefix_size + header_size +
+                         payload_size)
+
+
+def test_worker_unsupported_action(capsys):
+    header, payload = opcut.worker._process_request({'action': 'invalid'},
+                                                    b'', io.BytesIO())
+
+    # traceback is written only to stderr
+    assert header == {'status': 'error', 'message': 'Internal error'}
+    assert payload == b''
+    assert 'unsupported action' in capsys.readouterr().err
@@ -0,0 +1,192 @@
+import asyncio
+import socket
+
+import aiohttp
+import pytest
+
+from opcut import calculate
+from opcut import codec
+from opcut import common
+import opcut.jobs
+import opcut.server
+
+
+pytestmark = pytest.mark.usefixtures('worker_env')
+
+# forward greedy calculation running long enough to be interrupted
+params = common.Params(
+    cut_width=1,
+    min_initial_usage=False,
+    panels=[common.Panel(id='p', width=1000, height=1000, quantity=10)],
+    items=[common.Item(id=f'i{i}',
+                       width=20 + i * 7 % 90,
+                       height=20 + i * 13 % 80,
+                       can_rotate=True,
+                       quantity=1)
+           for i in range(60)])
+
+
+def get_unused_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def create_server(**kwargs):
+    port = get_unused_port()
+    server = await opcut.server.create(host='127.0.0.1',
+                                       port=port,
+                                       timeout=100,
+                                       workers=1,
+                                       **kwargs)
+    return server, f'http://127.0.0.1:{port}'
+
+
+async def wait_until(fn, timeout=5):
+    for _ in range(int(timeout / 0.05)):
+        if fn():
+            return
+
+        await asyncio.sleep(0.05)
+
+    assert fn()
+
+
+def get_status(server, job_id):
+    return server._jobs.get_info(job_id).status
+
+
+def test_calculate_shared_job_released_on_disconnect():
+
+    async def calculate(url):
+        async with aiohttp.ClientSession() as session:
+            async with session.post(
+                    f'{url}/calculate',
+                    params={'method': 'forward_greedy'},
+                    json=common.params_to_json(params)) as response:
+                await response.read()
+
+    async def main():
+        server, url = await create_server()
+        try:
+            task1 = asyncio.create_task(calculate(url))
+            task2 = asyncio.create_task(calculate(url))
+
+            await wait_until(lambda: any(
+                i.refcount == 2 for i in server._inflight_jobs.values()))
+
+            inflight_job, = server._inflight_jobs.values()
+            job_id = inflight_job.job_id
+            await wait_until(lambda: get_status(server, job_id) ==
+                             opcut.jobs.JobStatus.RUNNING)
+
+            # first client disconnects
+            task1.cancel()
+            await wait_until(lambda: inflight_job.refcount == 1)
+
+            await asyncio.sleep(0.2)
+            assert get_status(server, job_id) == opcut.jobs.JobStatus.RUNNING
+
+            # last client disconnects
+            task2.cancel()
+            await wait_until(lambda: get_status(server, job_id) ==
+                             opcut.jobs.JobStatus.CANCELLED)
+            assert server._inflight_jobs == {}
+
+        finally:
+            await server.async_close()
+
+    asyncio.run(main())
+
+
+small_params = common.Params(
+    cut_width=1,
+    min_initial_usage=False,
+    panels=[common.Panel(id='p', width=100, height=100, quantity=2)],
+    items=[common.Item(id='a', width=40, height=30, can_rotate=True,
+                       quantity=3)])
+
+
+async def calculate_result_id(session, url, params):
+    async with session.post(f'{url}/calculate',
+                            params={'method': 'greedy'},
+                            json=common.params_to_json(params)) as response:
+        assert response.status == 200
+        return response.headers['Result-Id']
+
+
+async def generate_status(session, url, result_id):
+    async with session.post(f'{url}/generate',
+                            params={'result_id': result_id,
+                                    'output_format': 'svg'}) as response:
+        await response.read()
+        return response.status
+
+
+def test_generate_result_id():
+    pytest.importorskip('cairo')
+
+    async def main():
+        server, url = await create_server()
+        try:
+            async with aiohttp.ClientSession() as session:
+                result_id = await calculate_result_id(session, url,
+                                                      small_params)
+
+                async with session.post(
+                        f'{url}/generate',
+                        params={'result_id': result_id,
+                                'output_format': 'svg'}) as response:
+                    assert response.status == 200
+                    assert response.content_type == 'image/svg+xml'
+                    assert await response.read()
+
+        finally:
+            await server.async_close()
+
+    asyncio.run(main())
+
+
+def test_generate_result_id_not_found():
+
+    async def main():
+        server, url = await create_server()
+        try:
+            async with aiohttp.ClientSession() as session:
+                assert await generate_status(session, url, 'invalid') == 404
+
+        finally:
+            await server.async_close()
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize('history_size', [1, 1000])
+def test_generate_result_id_removed(history_size):
+    # first result is removed from history by second result (history size
+    # or total results size is exceeded)
+    params_list = [small_params._replace(cut_width=i) for i in range(2)]
+    result = calculate.calculate(common.Method.GREEDY, params_list[0])
+    result_size = len(codec.encode_json(
+        common.result_to_json(result, include_stats=True)))
+    history_max_size = (int(1.5 * result_size) if history_size > 1
+                        else 100 * 1024 * 1024)
+
+    async def main():
+        server, url = await create_server(history_size=history_size,
+                                          history_max_size=history_max_size)
+        try:
+            async with aiohttp.ClientSession() as session:
+                result_ids = [
+                    await calculate_result_id(session, url, params)
+                    for params in params_list]
+
+                assert await generate_status(session, url,
+                                             result_ids[0]) == 404
+                assert server._jobs.get_result(result_ids[0]) is None
+                assert server._jobs.get_result(result_ids[1]) is not None
+
+        finally:
+            await server.async_close()
+
+    asyncio.run(main())